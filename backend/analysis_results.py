@@ -98,6 +98,19 @@ class VoiceMetrics(BaseModel):
     f0_std_hz: Optional[float] = None
     speech_rate_syl_per_sec: Optional[float] = None
     pause_ratio: Optional[float] = None
+    f0_backend: Optional[str] = None            # "pyin" | "yin" (VOICE_F0_BACKEND; streams always yin)
+    # Spectral feature bank (voice_features.py)
+    mfcc_mean: Optional[List[float]] = None     # 13 MFCCs over voiced frames
+    mfcc_std: Optional[List[float]] = None
+    spectral_tilt_db_per_oct: Optional[float] = None   # LTAS slope; steeper = breathier / weaker
+    cpp_db: Optional[float] = None              # Cepstral peak prominence (dysphonia marker)
+    f1_proxy_hz: Optional[float] = None         # LPC formant estimates
+    f2_proxy_hz: Optional[float] = None
+    f2_proxy_std_hz: Optional[float] = None     # Articulatory range (reduced in dysarthria)
+    voiced_fraction: Optional[float] = None
+    voiced_segment_count: Optional[int] = None
+    voiced_segment_mean_sec: Optional[float] = None
+    voiced_segment_std_sec: Optional[float] = None
 
 
 class FaceStructureMetrics(BaseModel):
@@ -181,6 +194,7 @@ class LiveMetricsPayload(BaseModel):
     status: str = "processing"          # "processing" | "test_complete" | "error"
     elapsed_sec: float = 0.0
     frames_processed: int = 0
+    frame_index: Optional[int] = None   # echo of the inbound frame_index
 
     # live metrics streamed per-frame
     heart_rate_bpm: Optional[float] = None
@@ -0,0 +1,5 @@
+"""
+benchmarks
+Micro-benchmarks for the analysis pipelines.
+Run from backend/ with `python -m benchmarks.<name>`.
+"""
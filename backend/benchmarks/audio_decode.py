@@ -0,0 +1,77 @@
+"""
+benchmarks/audio_decode.py
+Decode + resample time and peak memory of load_audio_bytes versus the legacy
+librosa.load path, for common upload formats and sample rates.
+
+Peak memory is measured with tracemalloc (NumPy buffers are traced).
+
+  python -m benchmarks.audio_decode [--seconds 30] [--repeats 3]
+"""
+
+from __future__ import annotations
+
+import argparse
+import io
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from benchmarks.hnr_scaling import synthetic_vowel
+from voice_analyzer import SAMPLE_RATE, load_audio_bytes
+
+CASES = [
+    ("WAV", "PCM_16", 48_000, 1),
+    ("WAV", "PCM_16", 44_100, 2),
+    ("WAV", "PCM_16", 22_050, 1),
+    ("FLAC", "PCM_16", 48_000, 1),
+    ("OGG", "VORBIS", 48_000, 1),
+]
+
+
+def legacy_load(audio_bytes: bytes, target_sr: int = SAMPLE_RATE) -> np.ndarray:
+    """Previous loader: librosa.load at target_sr, then a float64 copy."""
+    y, _ = librosa.load(io.BytesIO(audio_bytes), sr=target_sr, mono=True)
+    return y.astype(np.float64)
+
+
+def encode(seconds: float, fmt: str, subtype: str, sr: int, channels: int) -> bytes:
+    y = 0.3 * synthetic_vowel(seconds, sr=sr)
+    if channels > 1:
+        y = np.stack([y] * channels, axis=1)
+    buf = io.BytesIO()
+    sf.write(buf, y, sr, format=fmt, subtype=subtype)
+    return buf.getvalue()
+
+
+def measure(fn, data: bytes, repeats: int):
+    best = float("inf")
+    for _ in range(repeats):
+        t = time.perf_counter(); fn(data); best = min(best, time.perf_counter() - t)
+    tracemalloc.start()
+    fn(data)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best * 1000.0, peak / 2**20
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--seconds", type=float, default=30.0)
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'format':<18} {'in MB':>6}  {'legacy ms':>9} {'peak MB':>8}  {'fast ms':>8} {'peak MB':>8}  {'speedup':>7}")
+    for fmt, subtype, sr, ch in CASES:
+        data = encode(args.seconds, fmt, subtype, sr, ch)
+        load_audio_bytes(data); legacy_load(data)             # warm caches / lazy imports
+        lt, lm = measure(legacy_load, data, args.repeats)
+        ft, fm = measure(lambda d: load_audio_bytes(d)[0], data, args.repeats)
+        name = f"{fmt} {sr // 1000}k {'stereo' if ch > 1 else 'mono'}"
+        print(f"{name:<18} {len(data) / 2**20:6.1f}  {lt:9.1f} {lm:8.1f}  {ft:8.1f} {fm:8.1f}  {lt / ft:6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+benchmarks/f0_backends.py
+Runtime and agreement of the F0 backends (pyin vs vectorised YIN).
+
+Synthetic vowels have a known F0 contour, so both backends are scored against
+the truth (median error, gross errors > 20 %); jitter is compared between the
+backends. Recorded clips (WAV/FLAC/OGG) can be added with --files and are
+scored against pyin as the reference.
+
+  python -m benchmarks.f0_backends [--durations 2,5,10] [--files a.wav b.wav]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from voice_analyzer import (F0_HOP_LENGTH, SAMPLE_RATE, compute_jitter,
+                            extract_f0, load_audio_bytes)
+
+BACKENDS = ("pyin", "yin")
+
+
+def jittered_vowel(seconds: float, f0: float = 140.0, jitter_pct: float = 0.5,
+                   snr_db: float = 25.0, sr: int = SAMPLE_RATE,
+                   seed: int = 0):
+    """
+    Harmonic vowel whose period is perturbed cycle by cycle, with a short
+    silence in the middle. Returns (signal, true F0 per sample, NaN = silent).
+    """
+    rng = np.random.default_rng(seed)
+    n   = int(seconds * sr)
+    periods = (1.0 / f0) * (1 + jitter_pct / 100 * rng.standard_normal(int(seconds * f0 * 1.2)))
+    inst  = np.repeat(1.0 / periods, np.maximum((periods * sr).astype(int), 1))[:n]
+    inst  = np.pad(inst, (0, n - len(inst)), mode="edge")
+    ph    = 2 * np.pi * np.cumsum(inst) / sr
+    x     = sum(np.sin(k * ph) / k for k in range(1, 15))
+    x    /= x.std()
+    gap   = slice(int(0.45 * n), int(0.55 * n))
+    x[gap] = 0.0
+    truth = inst.copy(); truth[gap] = np.nan
+    return 0.3 * (x + rng.normal(0, 10 ** (-snr_db / 20), n)), truth
+
+
+def _timed(y, sr, backend):
+    t  = time.perf_counter()
+    f0 = extract_f0(y, sr, backend)
+    return f0, time.perf_counter() - t
+
+
+def _score(f0: np.ndarray, ref: np.ndarray):
+    """(median |error| %, gross error %, voicing agreement %) against ref."""
+    n = min(len(f0), len(ref))
+    f0, ref = f0[:n], ref[:n]
+    both = ~np.isnan(f0) & ~np.isnan(ref)
+    err  = np.abs(f0[both] / ref[both] - 1) * 100 if both.any() else np.array([np.nan])
+    agree = float(np.mean(np.isnan(f0) == np.isnan(ref)) * 100)
+    return float(np.median(err)), float(np.mean(err > 20)), agree
+
+
+def _row(name, dur, ref, sr, y):
+    out = {}
+    for b in BACKENDS:
+        f0, t = _timed(y, sr, b)
+        out[b] = (f0, t)
+    cells = [f"{name:<22} {dur:6.1f}"]
+    for b in BACKENDS:
+        f0, t = out[b]
+        med, gross, agree = _score(f0, ref if ref is not None else out["pyin"][0])
+        jit = compute_jitter(f0)
+        cells.append(f"{t * 1000:8.0f} {med:6.2f} {gross:6.1f} {agree:6.1f} "
+                     f"{jit if jit is not None else float('nan'):6.3f}")
+    speed = out["pyin"][1] / max(out["yin"][1], 1e-9)
+    print("  ".join(cells) + f"  {speed:6.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--durations", default="2,5,10")
+    ap.add_argument("--files", nargs="*", default=[])
+    args = ap.parse_args()
+
+    sr = SAMPLE_RATE
+    for b in BACKENDS:                      # warm-up (pyin JIT-compiles on first use)
+        extract_f0(jittered_vowel(0.5)[0], sr, b)
+    hdr = " ".join(f"{'ms':>8} {'med%':>6} {'gross':>6} {'voic%':>6} {'jit%':>6}" for _ in BACKENDS)
+    print(f"{'':<29}  {'── pyin ──':^38}  {'── yin ──':^38}")
+    print(f"{'clip':<22} {'sec':>6}  {hdr}  speedup")
+    for d in [float(x) for x in args.durations.split(",")]:
+        for f0, jit in ((110.0, 0.3), (220.0, 1.0)):
+            y, truth = jittered_vowel(d, f0=f0, jitter_pct=jit)
+            ref = truth[::F0_HOP_LENGTH]
+            _row(f"synth {f0:.0f}Hz j={jit}%", d, ref, sr, y)
+    for path in args.files:
+        y, sr_f = load_audio_bytes(Path(path).read_bytes())
+        _row(Path(path).name[:22], len(y) / sr_f, None, sr_f, y)
+    print("synthetic rows are scored against the true contour; recorded files against pyin")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+benchmarks/hnr_scaling.py
+Runtime of compute_hnr versus audio length.
+
+The windowed FFT implementation should scale linearly (constant ms per second
+of audio); the legacy full-signal np.correlate reference is O(n²) and is only
+timed on short clips.
+
+  python -m benchmarks.hnr_scaling [--durations 2,4,8,16,32] [--legacy-max 4]
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from voice_analyzer import F0_HOP_LENGTH, SAMPLE_RATE, compute_hnr
+
+
+def synthetic_vowel(seconds: float, f0: float = 150.0, snr_db: float = 20.0,
+                    sr: int = SAMPLE_RATE, seed: int = 0) -> np.ndarray:
+    """Harmonic-rich vowel with slow vibrato plus white noise at snr_db."""
+    rng = np.random.default_rng(seed)
+    t   = np.arange(int(seconds * sr)) / sr
+    ph  = 2 * np.pi * np.cumsum(f0 * (1 + 0.005 * np.sin(2 * np.pi * 3 * t))) / sr
+    x   = sum(np.sin(k * ph) / k for k in range(1, 15))
+    x  /= x.std()
+    return x + rng.normal(0, 10 ** (-snr_db / 20), len(x))
+
+
+def legacy_hnr(y: np.ndarray, sr: int, mean_f0: float) -> float:
+    """Previous implementation: one full-signal autocorrelation (O(n²))."""
+    y_norm = y - np.mean(y)
+    acf    = np.correlate(y_norm, y_norm, mode="full")
+    acf    = acf[len(acf) // 2:]
+    acf   /= acf[0] + 1e-9
+    r = float(np.clip(acf[int(sr / mean_f0)], -1.0, 1.0 - 1e-6))
+    return 10.0 * np.log10(r / (1.0 - r))
+
+
+def _best_of(fn, repeats: int) -> float:
+    best = float("inf")
+    for _ in range(repeats):
+        t = time.perf_counter(); fn(); best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--durations", default="2,4,8,16,32")
+    ap.add_argument("--legacy-max", type=float, default=4.0,
+                    help="longest clip (s) to time with the O(n²) reference")
+    ap.add_argument("--repeats", type=int, default=3)
+    args = ap.parse_args()
+
+    sr = SAMPLE_RATE
+    print(f"{'sec':>5} {'samples':>9} {'hnr ms':>9} {'ms/s':>7} {'hnr dB':>7} {'legacy ms':>10}")
+    for d in [float(x) for x in args.durations.split(",")]:
+        y  = synthetic_vowel(d)
+        f0 = np.full(len(y) // F0_HOP_LENGTH + 1, 150.0)
+        t  = _best_of(lambda: compute_hnr(y, sr, f0), args.repeats)
+        legacy = (f"{_best_of(lambda: legacy_hnr(y, sr, 150.0), 1) * 1000:10.1f}"
+                  if d <= args.legacy_max else f"{'—':>10}")
+        per_s = t * 1000 / d
+        print(f"{d:5.0f} {len(y):9d} {t * 1000:9.1f} {per_s:7.2f} "
+              f"{compute_hnr(y, sr, f0):7.2f} {legacy}")
+    print("linear scaling ⇔ ms/s roughly constant across durations")
+
+
+if __name__ == "__main__":
+    main()
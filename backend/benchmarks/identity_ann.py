@@ -0,0 +1,114 @@
+"""
+benchmarks/identity_ann.py
+IVF identity index versus the exact matrix scan.
+
+For each store size: single-query latency of the exact scan and of the IVF
+index per nprobe; recall@1 of the IVF top hit against exact search over
+queries whose exact best match clears MATCH_THRESHOLD (0.88); how many of
+those the index scored below the threshold (IdentityManager re-checks them
+exactly, so they cost a scan rather than a duplicate identity); and the share
+of all queries that take that exact re-check path.
+
+Synthetic stores model landmark embeddings as one mean face plus per-identity
+and per-capture deviations (same person ≈ 0.95 cosine, strangers ≈ 0.8);
+--store evaluates a real identity store instead — an IDENTITY_STORE_DIR
+directory or a legacy IDENTITY_STORE_PATH JSON (queries are its rows plus
+capture noise).
+
+  python -m benchmarks.identity_ann [--sizes 1000,10000,50000,100000] [--nprobe 1,4,8,16]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from identity_index import IVFIndex
+from identity_manager import EMB_DIM, MATCH_THRESHOLD
+from identity_store import IdentityStore
+
+ID_SPREAD      = 0.043          # per-dim identity deviation → stranger cosine ≈ 0.8
+CAPTURE_SPREAD = 0.012          # per-dim capture noise       → same-person cosine ≈ 0.95
+
+
+def _unit(x: np.ndarray) -> np.ndarray:
+    return (x / np.linalg.norm(x, axis=-1, keepdims=True)).astype(np.float32)
+
+
+def synthetic_store(n: int, seed: int = 0) -> np.ndarray:
+    rng  = np.random.default_rng(seed)
+    mean = _unit(rng.normal(size=EMB_DIM))
+    return _unit(mean + rng.normal(0, ID_SPREAD, (n, EMB_DIM)))
+
+
+def make_queries(store: np.ndarray, n_queries: int, new_fraction: float = 0.2,
+                 seed: int = 1) -> np.ndarray:
+    """Recaptures of enrolled rows plus a share of never-enrolled faces."""
+    rng   = np.random.default_rng(seed)
+    n_new = int(n_queries * new_fraction)
+    base  = store[rng.integers(len(store), size=n_queries - n_new)]
+    mean  = _unit(store.mean(axis=0))
+    new   = mean + rng.normal(0, ID_SPREAD, (n_new, EMB_DIM))
+    return _unit(np.concatenate([base, new]) + rng.normal(0, CAPTURE_SPREAD, (n_queries, EMB_DIM)))
+
+
+def load_store(path: str) -> np.ndarray:
+    if Path(path).is_dir():
+        store = IdentityStore(Path(path), legacy_path=None)
+        _, emb, _ = store.load(EMB_DIM)
+        store.close()
+        return _unit(emb.astype(np.float64))
+    with open(path) as f:
+        rows = [e["embedding"] for e in json.load(f).values() if "embedding" in e]
+    return _unit(np.asarray(rows, dtype=np.float64))
+
+
+def evaluate(store: np.ndarray, queries: np.ndarray, nprobes, threshold: float) -> None:
+    n = len(store)
+    t = time.perf_counter()
+    exact_top  = np.array([int(np.argmax(store @ q)) for q in queries])   # one query at a time
+    exact_ms   = (time.perf_counter() - t) * 1000 / len(queries)
+    exact_best = np.einsum("ij,ij->i", store[exact_top], queries)
+    above      = exact_best >= threshold
+
+    index = IVFIndex()
+    t = time.perf_counter(); index.build(store); build_s = time.perf_counter() - t
+    print(f"N={n:<7d} nlist={index.nlist:<4d} build {build_s * 1000:7.1f} ms   "
+          f"exact {exact_ms:6.3f} ms/query   {above.mean() * 100:5.1f}% of queries ≥ {threshold}")
+    n_above = max(int(above.sum()), 1)
+    for nprobe in nprobes:
+        t = time.perf_counter()
+        results = [index.search(q, 1, nprobe) for q in queries]
+        ann_ms  = (time.perf_counter() - t) * 1000 / len(queries)
+        top  = np.array([int(r[0]) if len(r) else -1 for r, _ in results])
+        sim  = np.array([float(s[0]) if len(s) else -1.0 for _, s in results])
+        hits = int(np.sum(above & (top == exact_top)))
+        miss = int(np.sum(above & (sim < threshold)))
+        print(f"    nprobe={nprobe:<3d} {ann_ms:6.3f} ms/query  ×{exact_ms / ann_ms:5.1f}   "
+              f"recall@1 {hits / n_above * 100:6.2f}%   missed ≥thr {miss / n_above * 100:5.2f}%   "
+              f"exact re-checks {np.mean(sim < threshold) * 100:5.1f}%")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="1000,10000,50000,100000")
+    ap.add_argument("--nprobe", default="1,4,8,16")
+    ap.add_argument("--queries", type=int, default=500)
+    ap.add_argument("--store", default=None, help="identity store dir or legacy JSON instead of synthetic rows")
+    ap.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    args = ap.parse_args()
+
+    nprobes = [int(x) for x in args.nprobe.split(",")]
+    stores  = ([load_store(args.store)] if args.store else
+               [synthetic_store(int(n)) for n in args.sizes.split(",")])
+    for store in stores:
+        evaluate(store, make_queries(store, args.queries), nprobes, args.threshold)
+    print("recall@1: IVF top hit == exact top hit, over queries whose exact best ≥ threshold")
+
+
+if __name__ == "__main__":
+    main()
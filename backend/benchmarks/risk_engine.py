@@ -0,0 +1,106 @@
+"""
+benchmarks/risk_engine.py
+The compiled risk model (risk_model.json) versus the hand-written
+stratify_risk_legacy() (benchmarks/risk_legacy.py, model version 1) over
+synthetic cohorts.
+
+Rows are first checked for exact equality: each report from engine.evaluate()
+and engine.reports() must match stratify_risk_legacy() field for field and
+bit for bit (NaN == NaN). Rows mix in-range, out-of-range, missing (absent /
+None), NaN and extreme values, blink_rate_per_min present or not, and all
+tremor severities. Then it times the legacy loop, evaluate() per report,
+engine.score() (arrays only) and engine.reports() (dicts).
+
+  python -m benchmarks.risk_engine [--sizes 100,1000,10000,100000]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from risk_engine import RiskEngine, get_risk_engine
+from benchmarks.risk_legacy import MODEL_VERSION, REFS, stratify_risk_legacy
+
+EXTRA_KEYS = ["emotional_load_baseline", "muscle_tone_imbalance_score",
+              "blink_rate_per_min", "pause_ratio", "stride_length_cm"]
+
+
+def synthetic_rows(n: int, seed: int = 0) -> List[Dict]:
+    rng  = np.random.default_rng(seed)
+    rows = []
+    for _ in range(n):
+        row: Dict = {}
+        for k, (lo, hi, _, _) in REFS.items():
+            u = rng.random()
+            if u < 0.15:
+                continue                                   # absent
+            if u < 0.2:
+                row[k] = None
+            elif u < 0.22:
+                row[k] = float("nan")
+            elif u < 0.23:
+                row[k] = float(rng.choice([np.inf, -np.inf, 0.0, -5.0]))
+            else:
+                span   = max(hi - lo, 1.0)
+                row[k] = float(rng.uniform(lo - span, hi + span))
+        for k in EXTRA_KEYS:
+            u = rng.random()
+            if u < 0.3:
+                continue
+            row[k] = (None if u < 0.35 else float("nan") if u < 0.4
+                      else float(rng.uniform(-0.5, 40.0 if k == "blink_rate_per_min" else 1.5)))
+        row["tremor_severity"] = rng.choice(["none", "mild", "moderate", "severe", None])
+        rows.append(row)
+    return rows
+
+
+def _same(a, b) -> bool:
+    if isinstance(a, dict):
+        return isinstance(b, dict) and list(a) == list(b) and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, list):
+        return isinstance(b, list) and len(a) == len(b) and all(_same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b))
+    return type(a) is type(b) and a == b
+
+
+def check(engine: RiskEngine, rows: List[Dict]) -> Tuple[int, int]:
+    """Rows whose evaluate() / reports() output differs from stratify_risk_legacy()."""
+    legacy = [stratify_risk_legacy(r) for r in rows]
+    return (sum(not _same(l, engine.evaluate(r)) for l, r in zip(legacy, rows)),
+            sum(not _same(l, e) for l, e in zip(legacy, engine.reports(rows))))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", default="100,1000,10000,100000")
+    ap.add_argument("--check", type=int, default=20000, help="rows checked for exact equality")
+    args = ap.parse_args()
+
+    engine = get_risk_engine()
+    if engine.version == MODEL_VERSION:
+        bad_eval, bad_batch = check(engine, synthetic_rows(args.check, seed=1))
+        print(f"model {engine.tag}: evaluate {args.check - bad_eval}/{args.check}, "
+              f"reports {args.check - bad_batch}/{args.check} rows identical to stratify_risk_legacy")
+    else:
+        print(f"model version {engine.version} ≠ {MODEL_VERSION}: equivalence check skipped")
+
+    for n in (int(x) for x in args.sizes.split(",")):
+        rows = synthetic_rows(n)
+        t = time.perf_counter(); [stratify_risk_legacy(r) for r in rows]; legacy = time.perf_counter() - t
+        t = time.perf_counter(); [engine.evaluate(r) for r in rows];     single = time.perf_counter() - t
+        t = time.perf_counter(); table = engine.table(rows);         build  = time.perf_counter() - t
+        t = time.perf_counter(); engine.score(*table);               score  = time.perf_counter() - t
+        t = time.perf_counter(); engine.reports(rows);               dicts  = time.perf_counter() - t
+        print(f"N={n:<7d} legacy {legacy / n * 1e6:6.1f} µs/report   evaluate {single / n * 1e6:6.1f} µs/report "
+              f"(×{legacy / single:4.1f})   table {build * 1e3:8.1f} ms   "
+              f"score {score * 1e3:7.1f} ms (×{legacy / score:6.0f})   reports {dicts * 1e3:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+clock.py
+Injectable time sources for the analyzers and the WebSocket session loop.
+
+WallClock reads time.time() (live sessions). FrameClock is driven purely by the
+frames' timestamp_ms, so recorded sessions can be replayed as fast as the CPU
+allows and still produce the same rates, durations and the 60 s cut-off.
+The session loop calls observe() exactly once per frame; frames without a
+timestamp advance a FrameClock by one nominal frame period, so such a session
+still reaches the cut-off. Analyzers only call stamp_ms(), which never moves
+the clock.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Optional
+
+from resampler import NOMINAL_FPS
+
+SESSION_CLOCK = os.getenv("SESSION_CLOCK", "wall")     # "wall" | "frame"
+
+
+class WallClock:
+    """Real time. Frames without a timestamp are stamped on arrival."""
+
+    def now(self) -> float:
+        return time.time()
+
+    def observe(self, timestamp_ms: Optional[float]) -> None:
+        pass
+
+    def stamp_ms(self, timestamp_ms: Optional[float]) -> Optional[float]:
+        return timestamp_ms if timestamp_ms and timestamp_ms > 0 else time.time() * 1000.0
+
+
+class FrameClock:
+    """
+    Media time: now() is the newest frame timestamp seen (seconds); an
+    unstamped frame advances it by one nominal frame period. Unstamped frames
+    are left unstamped so the resamplers space them at the nominal rate —
+    deterministic, unlike stamping them with wall time.
+    """
+
+    def __init__(self, nominal_hz: float = NOMINAL_FPS):
+        self._now    = 0.0
+        self._period = 1.0 / nominal_hz
+
+    def now(self) -> float:
+        return self._now
+
+    def observe(self, timestamp_ms: Optional[float]) -> None:
+        if timestamp_ms and timestamp_ms > 0:
+            self._now = max(self._now, timestamp_ms / 1000.0)
+        else:
+            self._now += self._period
+
+    def stamp_ms(self, timestamp_ms: Optional[float]) -> Optional[float]:
+        """Read-only: the session loop advances the clock, once per frame."""
+        return timestamp_ms if timestamp_ms and timestamp_ms > 0 else None
+
+
+def make_clock(kind: str = SESSION_CLOCK):
+    if kind == "frame":
+        return FrameClock()
+    if kind == "wall":
+        return WallClock()
+    raise ValueError(f"Unknown clock kind: {kind!r}")
@@ -4,18 +4,27 @@ Face biomarker pipeline — FaceMesh + rPPG + EAR + 3D asymmetry.
 
 CRITICAL FIX: MediaPipe FaceMesh is initialised INSIDE __init__(),
 NOT at module level. Module-level init crashed Render before port binding.
+
+The tracking landmarks also feed identity: frontal, eyes-open frames with a
+large enough face are scored and the IDENTITY_SESSION_FRAMES best are kept
+as identity_manager embeddings, so get_identity_embedding() can confirm or
+enrol the session's face without a separate static-mode FaceMesh pass.
 """
 
 from __future__ import annotations
 
 import collections
+import heapq
 import math
-import time
+import os
 from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from clock import WallClock
+from identity_manager import embed_landmarks
+from resampler import StreamResampler
 from rppg_extractor import rPPGExtractor, compute_skin_texture
 
 # ── EAR landmark indices (per spec) ──────────────────────────────────────
@@ -25,12 +34,19 @@ EAR_L = (33,  133, 160, 158, 153, 144)
 EAR_R = (362, 263, 385, 387, 373, 380)
 
 EAR_BLINK_THRESH    = 0.25
-EAR_BLINK_MIN_FRAME = 2     # consecutive sub-threshold frames = blink
-EAR_PROLONGED_FRAME = 9     # ≈300 ms at 30 fps = fatigue marker
+EAR_BLINK_MIN_FRAME = 2     # consecutive sub-threshold grid samples = blink
+EAR_PROLONGED_FRAME = 9     # ≈300 ms on the 30 Hz analysis grid = fatigue marker
 
 ASYM_PAIRS = [(234,454),(127,356),(93,323),(33,263),(70,300),(105,334)]
 TONE_PAIRS = [(61,291),(13,14)]
 
+# ── Identity frame selection ──────────────────────────────────────────────
+IDENTITY_SESSION_FRAMES     = int(os.getenv("IDENTITY_SESSION_FRAMES", "16"))   # best frames kept
+IDENTITY_SESSION_MIN_FRAMES = int(os.getenv("IDENTITY_SESSION_MIN_FRAMES", "5"))
+IDENTITY_MIN_IED_PX = 40.0      # inter-eye distance below this → face too small
+IDENTITY_MAX_YAW    = 0.15      # nose offset from the eye midline, × inter-eye distance
+IDENTITY_MAX_ROLL   = 0.2       # eye-line tilt, radians
+
 
 # ── Geometry helpers ──────────────────────────────────────────────────────
 
@@ -84,6 +100,18 @@ def emotional_load(landmarks, h: int, w: int) -> float:
     lip  = float(np.clip(1 - mh/max(mw*0.3,1e-3), 0, 1))
     return float(np.clip(0.6*brow + 0.4*lip, 0, 1))
 
+def identity_quality(landmarks, h: int, w: int, ear_avg: float) -> float:
+    """0 (unusable) … 1 (frontal, level, eyes open) for identity embedding."""
+    lm = landmarks.landmark
+    le = _px(lm,33,h,w); re = _px(lm,263,h,w); nt = _px(lm,1,h,w)
+    ied = _dist(le, re)
+    if ied < IDENTITY_MIN_IED_PX or ear_avg < EAR_BLINK_THRESH:
+        return 0.0
+    ex, ey = (re[0]-le[0])/ied, (re[1]-le[1])/ied          # unit eye axis
+    yaw  = abs((nt[0]-(le[0]+re[0])/2)*ex + (nt[1]-(le[1]+re[1])/2)*ey) / ied
+    roll = abs(math.atan2(ey, ex))
+    return max(0.0, 1 - yaw/IDENTITY_MAX_YAW) * max(0.0, 1 - roll/IDENTITY_MAX_ROLL)
+
 
 # ── FaceAnalyzer ──────────────────────────────────────────────────────────
 
@@ -91,9 +119,10 @@ class FaceAnalyzer:
     """
     Per-session face analyzer. Heavy objects (MediaPipe) created in __init__
     only when a session starts — NOT at module import time.
+    `clock` stamps frames that arrive without timestamp_ms (see clock.py).
     """
 
-    def __init__(self):
+    def __init__(self, clock=None):
         # ── Lazy import of mediapipe inside constructor ──────────────
         import mediapipe as mp
         self._fm = mp.solutions.face_mesh.FaceMesh(
@@ -104,9 +133,12 @@ class FaceAnalyzer:
             min_tracking_confidence=0.5,
         )
 
-        self.rppg = rPPGExtractor()
+        self._clock = clock or WallClock()
+        self.rppg = rPPGExtractor(clock=self._clock)
 
-        # Blink FSM
+        # Blink FSM — runs on EAR resampled to the analysis grid, so frame
+        # thresholds and blink rate follow frame timestamps, not wall-clock
+        self._ear_grid         = StreamResampler()
         self._blink_total      = 0
         self._prolonged_total  = 0
         self._blink_frames     = 0
@@ -120,13 +152,16 @@ class FaceAnalyzer:
         self._emo:    List[float] = []
         self._skin_buf: collections.deque = collections.deque(maxlen=60)
 
+        # Identity: min-heap of (quality, frame no., embedding), best frames kept
+        self._id_frames: List[Tuple[float, int, np.ndarray]] = []
+
         self._n = 0
-        self._t0 = time.time()
 
     def process_frame(self, frame: np.ndarray,
                       timestamp_ms: float = 0.0) -> Dict:
         h, w = frame.shape[:2]
         self._n += 1
+        timestamp_ms = self._clock.stamp_ms(timestamp_ms)
 
         import cv2
         rgb    = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -145,7 +180,8 @@ class FaceAnalyzer:
         er  = ear(lm, EAR_R, h, w)
         ea  = (el + er) / 2.0
         self._ear_buf.append(ea)
-        blink = self._update_blink(ea)
+        blink = self._update_blink(ea, timestamp_ms)
+        self._update_identity(lm, h, w, ea)
 
         # Skin
         skin = compute_skin_texture(frame, lm)
@@ -169,20 +205,21 @@ class FaceAnalyzer:
             skin=skin, asym=asym, tone=tone, ss=ss, emo=emo,
         )
 
-    def _update_blink(self, ea: float) -> Dict:
-        if ea < EAR_BLINK_THRESH:
-            if not self._in_blink:
-                self._in_blink = True
-            self._blink_frames += 1
-        else:
-            if self._in_blink and self._blink_frames >= EAR_BLINK_MIN_FRAME:
-                self._blink_total += 1
-                if self._blink_frames >= EAR_PROLONGED_FRAME:
-                    self._prolonged_total += 1
-            self._in_blink = False
-            self._blink_frames = 0
-
-        elapsed_min = max((time.time() - self._t0) / 60.0, 1e-3)
+    def _update_blink(self, ea: float, timestamp_ms: float) -> Dict:
+        for v in self._ear_grid.push(timestamp_ms, ea):
+            if v < EAR_BLINK_THRESH:
+                if not self._in_blink:
+                    self._in_blink = True
+                self._blink_frames += 1
+            else:
+                if self._in_blink and self._blink_frames >= EAR_BLINK_MIN_FRAME:
+                    self._blink_total += 1
+                    if self._blink_frames >= EAR_PROLONGED_FRAME:
+                        self._prolonged_total += 1
+                self._in_blink = False
+                self._blink_frames = 0
+
+        elapsed_min = max(self._ear_grid.elapsed_sec / 60.0, 1e-3)
         rate  = self._blink_total / elapsed_min
         prolong_r = self._prolonged_total / max(self._blink_total, 1)
         fatigue   = float(np.clip(0.4*min(rate/30,1) + 0.6*prolong_r, 0, 1))
@@ -191,6 +228,26 @@ class FaceAnalyzer:
                 "blink_rate_per_min": rate,
                 "fatigue_score": fatigue}
 
+    def _update_identity(self, lm, h: int, w: int, ea: float):
+        q = identity_quality(lm, h, w, ea)
+        if q <= 0.0:
+            return
+        if len(self._id_frames) < IDENTITY_SESSION_FRAMES:
+            heapq.heappush(self._id_frames, (q, self._n, embed_landmarks(lm, h, w)))
+        elif q > self._id_frames[0][0]:
+            heapq.heapreplace(self._id_frames, (q, self._n, embed_landmarks(lm, h, w)))
+
+    def get_identity_embedding(self) -> Optional[np.ndarray]:
+        """Mean embedding of the best tracked frames; None below IDENTITY_SESSION_MIN_FRAMES."""
+        if len(self._id_frames) < IDENTITY_SESSION_MIN_FRAMES:
+            return None
+        mean = np.mean([e for _, _, e in self._id_frames], axis=0)
+        return mean / (np.linalg.norm(mean) + 1e-9)
+
+    @property
+    def identity_frames(self) -> int:
+        return len(self._id_frames)
+
     def _out(self, found=False, rppg=None, el=0.0, er=0.0, ea=0.0,
              blink=None, skin=None, asym=None, tone=0.0, ss=0.0, emo=0.0) -> Dict:
         rppg  = rppg  or {}
@@ -239,7 +296,7 @@ class FaceAnalyzer:
 
     def get_final_summary(self) -> Dict:
         snap = self.rppg._snapshot()
-        elapsed_min = max((time.time()-self._t0)/60.0, 1e-3)
+        elapsed_min = max(self._ear_grid.elapsed_sec/60.0, 1e-3)
         hydration = float(np.mean(self._skin_buf)) if self._skin_buf else None
         return {
             **snap,
@@ -263,10 +320,17 @@ class FaceAnalyzer:
         self._in_blink = False
         self._ear_buf.clear(); self._asym.clear(); self._muscle.clear()
         self._stress.clear(); self._emo.clear(); self._skin_buf.clear()
-        self._n = 0; self._t0 = time.time()
+        self._id_frames.clear()
+        self._ear_grid.reset(); self._n = 0
 
-    def __del__(self):
+    def close(self):
+        """Release the MediaPipe graph (idempotent)."""
+        fm, self._fm = getattr(self, "_fm", None), None
         try:
-            self._fm.close()
+            if fm is not None:
+                fm.close()
         except Exception:
             pass
+
+    def __del__(self):
+        self.close()
@@ -17,6 +17,9 @@ import cv2
 import numpy as np
 from scipy import signal as sp_signal
 
+from clock import WallClock
+from resampler import ANALYSIS_RATE_HZ, UniformResampler, butter_ba
+
 # Pose landmark indices
 LM_L_EYE=2; LM_R_EYE=5
 LM_L_SH=11; LM_R_SH=12
@@ -59,33 +62,40 @@ def analyze_posture(lm, h: int, w: int) -> Dict:
 
 # ── Tremor ────────────────────────────────────────────────────────────────
 
+MIN_SPAN_SEC = 2.0      # ≈60 frames at 30 fps before the first estimate
+
+
 class TremorDetector:
     BUF = 300
     def __init__(self, fps=30.0):
-        self.fps = fps
-        self._lx: collections.deque = collections.deque(maxlen=self.BUF)
-        self._ly: collections.deque = collections.deque(maxlen=self.BUF)
-        self._rx: collections.deque = collections.deque(maxlen=self.BUF)
-        self._ry: collections.deque = collections.deque(maxlen=self.BUF)
+        self.fps = ANALYSIS_RATE_HZ
+        self._wrists = UniformResampler(4, rate_hz=ANALYSIS_RATE_HZ,
+                                        window_sec=self.BUF/fps, nominal_hz=fps)
         self._n=0; self._cached={}
 
-    def update(self, lm, h, w):
+    @property
+    def input_hz(self) -> float:
+        return self._wrists.input_rate_hz
+
+    def update(self, lm, h, w, timestamp_ms: Optional[float] = None):
         pts=lm.landmark
-        self._lx.append(pts[LM_L_WRIST].x*w); self._ly.append(pts[LM_L_WRIST].y*h)
-        self._rx.append(pts[LM_R_WRIST].x*w); self._ry.append(pts[LM_R_WRIST].y*h)
+        self._wrists.push(timestamp_ms,
+                          pts[LM_L_WRIST].x*w, pts[LM_L_WRIST].y*h,
+                          pts[LM_R_WRIST].x*w, pts[LM_R_WRIST].y*h)
         self._n+=1
         if self._n%30==0: self._recompute()
 
     def _recompute(self):
-        if len(self._lx)<60: return
+        if self._wrists.span_sec<MIN_SPAN_SEC: return
+        _, series=self._wrists.resample()
+        b,a=butter_ba(2,2.0/(self.fps/2),"high")
+        fx=np.fft.rfftfreq(series.shape[1],1/self.fps)
+        m=(fx>=2)&(fx<=12)
         freqs,amps=[],[]
-        for buf in [self._lx,self._ly,self._rx,self._ry]:
-            arr=sp_signal.detrend(np.array(buf))
-            b,a=sp_signal.butter(2,2.0/(self.fps/2),btype="high")
+        for buf in series:
+            arr=sp_signal.detrend(buf)
             f=sp_signal.filtfilt(b,a,arr)
-            fx=np.fft.rfftfreq(len(f),1/self.fps)
             pw=np.abs(np.fft.rfft(f))**2
-            m=(fx>=2)&(fx<=12)
             if np.any(m):
                 freqs.append(float(fx[m][np.argmax(pw[m])]))
                 amps.append(float(np.sqrt(np.mean(f**2))))
@@ -104,26 +114,28 @@ class TremorDetector:
 class GaitAnalyzer:
     BUF=300
     def __init__(self,fps=30.0):
-        self.fps=fps
-        self._lay: collections.deque = collections.deque(maxlen=self.BUF)
-        self._ray: collections.deque = collections.deque(maxlen=self.BUF)
-        self._lax: collections.deque = collections.deque(maxlen=self.BUF)
-        self._rax: collections.deque = collections.deque(maxlen=self.BUF)
-        self._hy:  collections.deque = collections.deque(maxlen=self.BUF)
+        self.fps=ANALYSIS_RATE_HZ
+        # Channels: left/right ankle y, left/right ankle x, hip mid y
+        self._legs = UniformResampler(5, rate_hz=ANALYSIS_RATE_HZ,
+                                      window_sec=self.BUF/fps, nominal_hz=fps)
         self._n=0; self._cached={}
 
-    def update(self,lm,h,w):
+    @property
+    def input_hz(self) -> float:
+        return self._legs.input_rate_hz
+
+    def update(self,lm,h,w,timestamp_ms: Optional[float] = None):
         pts=lm.landmark
-        self._lay.append(pts[LM_L_ANKLE].y*h); self._ray.append(pts[LM_R_ANKLE].y*h)
-        self._lax.append(pts[LM_L_ANKLE].x*w); self._rax.append(pts[LM_R_ANKLE].x*w)
-        self._hy.append((pts[LM_L_HIP].y+pts[LM_R_HIP].y)/2*h)
+        self._legs.push(timestamp_ms,
+                        pts[LM_L_ANKLE].y*h, pts[LM_R_ANKLE].y*h,
+                        pts[LM_L_ANKLE].x*w, pts[LM_R_ANKLE].x*w,
+                        (pts[LM_L_HIP].y+pts[LM_R_HIP].y)/2*h)
         self._n+=1
         if self._n%30==0: self._recompute(h,w)
 
     def _recompute(self,h,w):
-        if len(self._lay)<60: return
-        la=np.array(self._lay); ra=np.array(self._ray)
-        lax=np.array(self._lax); rax=np.array(self._rax)
+        if self._legs.span_sec<MIN_SPAN_SEC: return
+        _, (la,ra,lax,rax,hy)=self._legs.resample()
         def steps(y):
             f=sp_signal.savgol_filter(y,11,3)
             p,_=sp_signal.find_peaks(-f,distance=int(self.fps*0.3))
@@ -139,7 +151,6 @@ class GaitAnalyzer:
         if len(ls)>=2 and len(rs)>=2:
             li=np.diff(ls)/self.fps; ri=np.diff(rs)/self.fps
             sym=float(min(np.mean(li),np.mean(ri))/max(np.mean(li),np.mean(ri))*100)
-        hy=np.array(self._hy)
         hvar=float(np.var(sp_signal.detrend(hy))) if len(hy)>10 else 0
         bal=float(np.clip(1-hvar/(h*0.02)**2,0,1))
         vel=float(stride*cadence/60) if cadence>0 else None
@@ -155,50 +166,150 @@ class GaitAnalyzer:
 
 # ── BodyAnalyzer ──────────────────────────────────────────────────────────
 
+# Latency-budget mode: Pose complexity and frame decimation adapt to the
+# measured per-frame cost. Tremor (2-12 Hz band) must stay above Nyquist.
+TREMOR_MIN_HZ      = 24.0
+GAIT_TARGET_HZ     = 15.0
+POSTURE_TARGET_HZ  = 5.0
+BUDGET_EVAL_FRAMES = 30       # pose frames between budget decisions
+MAX_COMPLEXITY     = 2
+
+
 class BodyAnalyzer:
     """
     Lazy MediaPipe Pose init inside __init__ — safe for cloud import.
+
+    With latency_budget_ms set, the analyzer times its own Pose calls and
+    trades model complexity (0/1/2) and frame decimation against the budget.
+    Posture and gait are sampled at a few Hz; tremor keeps ≥ TREMOR_MIN_HZ.
+    Latency is always measured in CPU time; `clock` only stamps frames.
     """
-    def __init__(self, fps: float = 30.0):
+    def __init__(self, fps: float = 30.0, model_complexity: int = 1,
+                 latency_budget_ms: Optional[float] = None, clock=None):
+        self._fps        = fps
+        self._clock      = clock or WallClock()
+        self._budget_ms  = latency_budget_ms
+        self._complexity = model_complexity
+        self._pose       = self._make_pose(model_complexity)
+        self._tremor  = TremorDetector(fps=fps)
+        self._gait    = GaitAnalyzer(fps=fps)
+        self._posture_hist: List[Dict] = []
+        self._posture_avg: Dict = {}
+        self._n = 0
+
+        # Budget bookkeeping
+        self._pose_n     = 0
+        self._cost_ms: Optional[float] = None      # EMA of Pose.process cost
+        self._level_cost: Dict[int, float] = {}    # last known cost per complexity
+        self._in_ts: collections.deque = collections.deque(maxlen=60)
+        self._pose_stride = self._posture_stride = self._gait_stride = 1
+        self._last: Dict = {"landmarks_found": False}
+
+    @staticmethod
+    def _make_pose(complexity: int):
         import mediapipe as mp
-        self._pose = mp.solutions.pose.Pose(
+        return mp.solutions.pose.Pose(
             static_image_mode=False,
-            model_complexity=1,
+            model_complexity=complexity,
             smooth_landmarks=True,
             enable_segmentation=False,
             min_detection_confidence=0.5,
             min_tracking_confidence=0.5,
         )
-        self._tremor  = TremorDetector(fps=fps)
-        self._gait    = GaitAnalyzer(fps=fps)
-        self._posture_hist: List[Dict] = []
-        self._n = 0
 
     def process_frame(self, frame: np.ndarray,
                       timestamp_ms: float = 0.0) -> Dict:
         h, w = frame.shape[:2]
         self._n += 1
+        timestamp_ms = self._clock.stamp_ms(timestamp_ms)
+        if timestamp_ms: self._in_ts.append(timestamp_ms)
+
+        # Decimated frame: reuse the previous result, skip the model entirely
+        if (self._n - 1) % self._pose_stride:
+            return {**self._last, "frames_processed": self._n, **self._rates()}
+
         rgb    = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        t0     = time.perf_counter()
         result = self._pose.process(rgb)
+        self._observe_cost((time.perf_counter() - t0) * 1000.0)
+
         if not result.pose_landmarks:
-            return {"landmarks_found": False, "frames_processed": self._n}
+            self._last = {"landmarks_found": False}
+            return {"landmarks_found": False, "frames_processed": self._n, **self._rates()}
         lm = result.pose_landmarks
-        posture = analyze_posture(lm, h, w)
-        self._posture_hist.append(posture)
-        if len(self._posture_hist) > 300:
-            self._posture_hist = self._posture_hist[-300:]
-        self._tremor.update(lm, h, w)
-        self._gait.update(lm, h, w)
+        k  = self._pose_n
+        if k % self._posture_stride == 0 or not self._posture_hist:
+            self._posture_hist.append(analyze_posture(lm, h, w))
+            if len(self._posture_hist) > 300:
+                self._posture_hist = self._posture_hist[-300:]
+            self._posture_avg = {f: float(np.mean([p[f] for p in self._posture_hist]))
+                                 for f in ("cervical_score", "thoracic_score", "pelvic_score")}
+        self._tremor.update(lm, h, w, timestamp_ms)
+        if k % self._gait_stride == 0:
+            self._gait.update(lm, h, w, timestamp_ms)
         tm = self._tremor.get(); gm = self._gait.get()
-        cs=np.mean([p["cervical_score"]  for p in self._posture_hist])
-        ts=np.mean([p["thoracic_score"]  for p in self._posture_hist])
-        ps=np.mean([p["pelvic_score"]    for p in self._posture_hist])
-        return {
-            "landmarks_found":True,"frames_processed":self._n,
-            **posture,
-            "cervical_score":float(cs),"thoracic_score":float(ts),"pelvic_score":float(ps),
+        self._last = {
+            "landmarks_found":True,
+            **self._posture_hist[-1], **self._posture_avg,
             **tm, **gm,
         }
+        return {**self._last, "frames_processed": self._n, **self._rates()}
+
+    # ── Latency budget ────────────────────────────────────────────────────
+
+    def _input_hz(self) -> float:
+        if len(self._in_ts) < 2: return self._fps
+        dt=float(np.median(np.diff(np.asarray(self._in_ts))))/1000.0
+        return 1.0/dt if dt>0 else self._fps
+
+    def _observe_cost(self, ms: float):
+        self._pose_n += 1
+        self._cost_ms = ms if self._cost_ms is None else 0.9*self._cost_ms + 0.1*ms
+        if self._budget_ms and self._pose_n % BUDGET_EVAL_FRAMES == 0:
+            self._rebalance()
+
+    def _rebalance(self):
+        cost, budget = self._cost_ms, self._budget_ms
+        self._level_cost[self._complexity] = cost
+        in_hz = self._input_hz()
+        if cost > budget:
+            # Cheaper model first; decimate only while tremor stays above Nyquist
+            downgraded = self._complexity > 0 and self._switch_complexity(self._complexity - 1)
+            if not downgraded and in_hz / (self._pose_stride + 1) >= TREMOR_MIN_HZ:
+                self._pose_stride += 1
+        elif cost < 0.5 * budget:
+            nxt = self._complexity + 1
+            if self._pose_stride > 1:
+                self._pose_stride -= 1
+            elif nxt <= MAX_COMPLEXITY and self._level_cost.get(nxt, 0.0) < budget:
+                self._switch_complexity(nxt)
+        pose_hz = in_hz / self._pose_stride
+        self._posture_stride = max(1, int(round(pose_hz / POSTURE_TARGET_HZ)))
+        self._gait_stride    = max(1, int(round(pose_hz / GAIT_TARGET_HZ)))
+
+    def _switch_complexity(self, level: int) -> bool:
+        try:
+            pose = self._make_pose(level)
+        except Exception:
+            # Model asset unavailable (e.g. offline download) — never retry it
+            self._level_cost[level] = float("inf")
+            return False
+        try: self._pose.close()
+        except Exception: pass
+        self._pose, self._complexity, self._cost_ms = pose, level, None
+        return True
+
+    def _rates(self) -> Dict:
+        pose_hz = self._input_hz() / self._pose_stride
+        return {
+            "pose_model_complexity": self._complexity,
+            "pose_latency_ms":       self._cost_ms,
+            "pose_rate_hz":          pose_hz,
+            "tremor_sample_hz":      self._tremor.input_hz,
+            "gait_sample_hz":        self._gait.input_hz,
+            "analysis_rate_hz":      ANALYSIS_RATE_HZ,
+            "posture_sample_hz":     pose_hz / self._posture_stride,
+        }
 
     def get_final_summary(self) -> Dict:
         if not self._posture_hist: return {}
@@ -208,13 +319,22 @@ class BodyAnalyzer:
             "cervical_score":        float(np.mean([p["cervical_score"]         for p in self._posture_hist])),
             "thoracic_score":        float(np.mean([p["thoracic_score"]         for p in self._posture_hist])),
             "pelvic_score":          float(np.mean([p["pelvic_score"]           for p in self._posture_hist])),
-            **self._tremor.get(), **self._gait.get(),
+            **self._tremor.get(), **self._gait.get(), **self._rates(),
         }
 
     def reset(self):
-        self._tremor=TremorDetector(); self._gait=GaitAnalyzer()
-        self._posture_hist.clear(); self._n=0
+        self._tremor=TremorDetector(fps=self._fps); self._gait=GaitAnalyzer(fps=self._fps)
+        self._posture_hist.clear(); self._posture_avg={}; self._n=0
+        self._pose_n=0; self._cost_ms=None; self._in_ts.clear()
+        self._pose_stride=self._posture_stride=self._gait_stride=1
+        self._last={"landmarks_found": False}
 
-    def __del__(self):
-        try: self._pose.close()
+    def close(self):
+        """Release the MediaPipe graph (idempotent)."""
+        pose, self._pose = getattr(self, "_pose", None), None
+        try:
+            if pose is not None: pose.close()
         except Exception: pass
+
+    def __del__(self):
+        self.close()
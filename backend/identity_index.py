@@ -0,0 +1,160 @@
+"""
+identity_index.py
+Approximate nearest-neighbour search over identity embeddings (pure numpy).
+
+IVF (inverted file) index: a k-means coarse quantiser splits the unit-norm
+embedding rows into ~√N lists; a query scores itself against the centroids,
+then exactly against the rows of the `nprobe` closest lists only. With N rows
+that is O(√N + nprobe·N/nlist) dot products instead of O(N).
+
+Each list keeps its rows' vectors contiguously (IVF-flat), so a probe is a few
+dense matrix-vector products rather than a scattered gather from the caller's
+matrix; the price is a second float32 copy of the embeddings. update() mirrors
+IdentityManager's in-place centroid updates and moves a row if its nearest
+list changed. Rows added after a build go to their nearest list; once the
+store has grown REBUILD_GROWTH× since the last k-means, the caller rebuilds.
+
+  IDENTITY_ANN_MIN_SIZE  stores smaller than this use the exact scan (default 20000; 0 → never ANN)
+  IDENTITY_ANN_NPROBE    lists probed per query                            (default 8)
+
+benchmarks/identity_ann.py reports recall@1 versus exact search and latency.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+IDENTITY_ANN_MIN_SIZE = int(os.getenv("IDENTITY_ANN_MIN_SIZE", "20000"))
+IDENTITY_ANN_NPROBE   = int(os.getenv("IDENTITY_ANN_NPROBE", "8"))
+KMEANS_ITERS          = 10
+KMEANS_SAMPLE_PER_LIST = 64      # training rows per list (k-means runs on a sample)
+REBUILD_GROWTH        = 2.0      # rebuild once N doubles since the last build
+
+
+class IVFIndex:
+    def __init__(self, nprobe: int = IDENTITY_ANN_NPROBE):
+        self.nprobe     = nprobe
+        self.centroids: Optional[np.ndarray] = None     # (nlist, D) float32
+        self._half_sq:  Optional[np.ndarray] = None     # ‖c‖² / 2 per centroid
+        self._ids:      List[np.ndarray] = []           # row ids per list (with spare capacity)
+        self._vecs:     List[np.ndarray] = []           # matching vectors per list
+        self._fill:     np.ndarray = np.zeros(0, dtype=np.int64)
+        self._assign:   np.ndarray = np.zeros(0, dtype=np.int64)   # list of each row
+        self._pos:      np.ndarray = np.zeros(0, dtype=np.int64)   # slot of each row in its list
+        self.built_size = 0
+
+    @property
+    def nlist(self) -> int:
+        return 0 if self.centroids is None else len(self.centroids)
+
+    def __len__(self) -> int:
+        return int(self._fill.sum())
+
+    def needs_rebuild(self, n_rows: int) -> bool:
+        return self.centroids is None or n_rows >= REBUILD_GROWTH * self.built_size
+
+    # ── Build ──────────────────────────────────────────────────────────────
+
+    def build(self, emb: np.ndarray, nlist: Optional[int] = None, seed: int = 0):
+        """k-means over the (N, D) unit rows in `emb`, then assign every row."""
+        n = len(emb)
+        if n == 0:
+            raise ValueError("cannot build an index over no rows")
+        nlist = min(nlist or max(int(np.sqrt(n)), 1), n)
+        rng   = np.random.default_rng(seed)
+        train = emb[rng.choice(n, min(n, nlist * KMEANS_SAMPLE_PER_LIST), replace=False)]
+        cent  = train[rng.choice(len(train), nlist, replace=False)].astype(np.float32)
+
+        for _ in range(KMEANS_ITERS):
+            lab    = self._nearest(train, cent)
+            counts = np.bincount(lab, minlength=nlist)
+            sums   = np.zeros_like(cent)
+            np.add.at(sums, lab, train)
+            empty  = counts == 0
+            cent[~empty] = sums[~empty] / counts[~empty, None]
+            if empty.any():                       # reseed dead lists on random rows
+                cent[empty] = train[rng.choice(len(train), int(empty.sum()), replace=False)]
+
+        dim = emb.shape[1]
+        self.centroids = cent
+        self._half_sq  = 0.5 * np.einsum("ij,ij->i", cent, cent)
+        self._ids      = [np.empty(0, dtype=np.int64) for _ in range(nlist)]
+        self._vecs     = [np.empty((0, dim), dtype=np.float32) for _ in range(nlist)]
+        self._fill     = np.zeros(nlist, dtype=np.int64)
+        self._assign   = np.zeros(0, dtype=np.int64)
+        self._pos      = np.zeros(0, dtype=np.int64)
+        self.built_size = n
+        self.add(np.arange(n), emb)
+
+    def _nearest(self, x: np.ndarray, cent: Optional[np.ndarray] = None) -> np.ndarray:
+        """Closest centroid (L2, which for unit rows is also highest cosine)."""
+        if cent is None:
+            return np.argmax(x @ self.centroids.T - self._half_sq, axis=1)
+        return np.argmax(x @ cent.T - 0.5 * np.einsum("ij,ij->i", cent, cent), axis=1)
+
+    # ── Incremental maintenance ────────────────────────────────────────────
+
+    def add(self, rows: np.ndarray, vecs: np.ndarray):
+        """Insert new rows whose vectors are `vecs`."""
+        rows = np.atleast_1d(rows)
+        vecs = np.atleast_2d(vecs)
+        lab  = self._nearest(vecs)
+        need = int(rows.max()) + 1
+        if need > len(self._assign):
+            size = max(need, 2 * len(self._assign))
+            self._assign = np.concatenate([self._assign, np.full(size - len(self._assign), -1)])
+            self._pos    = np.concatenate([self._pos, np.full(size - len(self._pos), -1)])
+        for l in np.unique(lab):
+            sel = lab == l
+            self._append(int(l), rows[sel], vecs[sel])
+
+    def update(self, row: int, vec: np.ndarray):
+        """Row's vector changed in place: refresh the copy, moving lists if needed."""
+        new = int(self._nearest(vec[None, :])[0])
+        old, pos = int(self._assign[row]), int(self._pos[row])
+        if new == old:
+            self._vecs[old][pos] = vec
+            return
+        last = int(self._fill[old]) - 1                # swap-remove from the old list
+        moved = int(self._ids[old][last])
+        self._ids[old][pos]  = moved
+        self._vecs[old][pos] = self._vecs[old][last]
+        self._pos[moved] = pos
+        self._fill[old]  = last
+        self._append(new, np.array([row]), vec[None, :])
+
+    def _append(self, l: int, rows: np.ndarray, vecs: np.ndarray):
+        fill = int(self._fill[l])
+        if fill + len(rows) > len(self._ids[l]):
+            cap = max(fill + len(rows), 2 * len(self._ids[l]), 8)
+            ids = np.empty(cap, dtype=np.int64)
+            vec = np.empty((cap, vecs.shape[1]), dtype=np.float32)
+            ids[:fill], vec[:fill] = self._ids[l][:fill], self._vecs[l][:fill]
+            self._ids[l], self._vecs[l] = ids, vec
+        self._ids[l][fill : fill + len(rows)]  = rows
+        self._vecs[l][fill : fill + len(rows)] = vecs
+        self._assign[rows] = l
+        self._pos[rows]    = np.arange(fill, fill + len(rows))
+        self._fill[l]      = fill + len(rows)
+
+    # ── Query ──────────────────────────────────────────────────────────────
+
+    def search(self, q: np.ndarray, k: int = 1,
+               nprobe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(rows, cosine sims) of the top-k candidates, best first; q is unit-norm float32."""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        scores = self.centroids @ q - self._half_sq
+        probe  = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        sims   = np.concatenate([self._vecs[l][: self._fill[l]] @ q for l in probe])
+        if len(sims) == 0:
+            return np.empty(0, dtype=np.int64), sims
+        if k == 1:
+            top = np.array([int(np.argmax(sims))])
+        else:
+            top = np.argpartition(-sims, min(k, len(sims)) - 1)[:k]
+            top = top[np.argsort(-sims[top], kind="stable")]
+        cand = np.concatenate([self._ids[l][: self._fill[l]] for l in probe])
+        return cand[top], sims[top]
@@ -4,19 +4,45 @@ Face identity via normalised MediaPipe landmark embedding.
 
 CRITICAL FIX: FaceMesh created inside extract_embedding() on first call,
 NOT at module level.
+
+A static-mode FaceMesh graph must not run two frames at once, so
+extract_embedding() leases one from a pool of up to IDENTITY_FACEMESH_POOL
+graphs (created on demand) and callers may run it from worker threads
+(/identity/match uses asyncio.to_thread). Matching itself stays on the
+event loop: match_embedding() is one matrix-vector product.
+
+Embeddings live in one contiguous (N, D) float32 matrix of unit rows with a
+parallel id list, so a match is a single matrix-vector product + argmax and
+centroid updates are written in place. Persistence is identity_store.py: a
+memory-mapped snapshot plus an append-only log, one line per change. While
+the server runs (start() / stop() from the lifespan) changes are only marked
+dirty and a background task writes them in batches, so request handlers never
+touch the disk. Stores of IDENTITY_ANN_MIN_SIZE rows and up are searched through an IVF index (identity_index.py); a query the index
+scores below the threshold is re-checked exactly before a new identity is
+enrolled, so ANN misses cannot create duplicates. The index's k-means runs
+in a thread (at start() and whenever the store has doubled); until it is
+ready, queries keep using the previous index or the exact scan.
 """
 
 from __future__ import annotations
 
-import json, math, os, time, uuid
+import asyncio, math, os, queue, threading, time, uuid
+from contextlib import contextmanager
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 
+from identity_index import IDENTITY_ANN_MIN_SIZE, IVFIndex
+from identity_store import (
+    IDENTITY_FLUSH_INTERVAL_SEC, IDENTITY_FLUSH_MAX_DIRTY, IDENTITY_STORE_DIR,
+    LEGACY_STORE_PATH, IdentityStore,
+)
+
 MATCH_THRESHOLD = 0.88
-PERSIST_PATH = Path(os.getenv("IDENTITY_STORE_PATH", "/tmp/neuro_vitals_ids.json"))
+PERSIST_PATH = LEGACY_STORE_PATH            # pre-log JSON store, migrated on first start
+IDENTITY_FACEMESH_POOL = int(os.getenv("IDENTITY_FACEMESH_POOL", str(min(4, os.cpu_count() or 1))))
 
 # 68-point subset of MediaPipe 468 landmarks
 KEY_LM = list(dict.fromkeys([
@@ -27,23 +53,54 @@ KEY_LM = list(dict.fromkeys([
     373,380,61,185,40,39,37,0,267,270,409,291,84,17,314,405,
 ]))
 
-# Module-level lazy singleton for the FaceMesh used in identity
-_fm_identity = None
+class _FaceMeshPool:
+    """Static-mode FaceMesh graphs leased one per call; grows lazily up to `size`."""
+
+    def __init__(self, size: int):
+        self.size     = max(size, 1)
+        self._free: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock    = threading.Lock()
 
-def _get_fm():
-    global _fm_identity
-    if _fm_identity is None:
+    @contextmanager
+    def lease(self):
+        try:
+            fm = self._free.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                grow = self._created < self.size
+                if grow:
+                    self._created += 1
+            if not grow:
+                fm = self._free.get()                 # pool exhausted → wait for a lease
+            else:
+                try:
+                    fm = self._new()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+        try:
+            yield fm
+        finally:
+            self._free.put(fm)
+
+    @staticmethod
+    def _new():
         import mediapipe as mp
-        _fm_identity = mp.solutions.face_mesh.FaceMesh(
+        return mp.solutions.face_mesh.FaceMesh(
             static_image_mode=True,
             max_num_faces=1,
             refine_landmarks=False,
             min_detection_confidence=0.5,
         )
-    return _fm_identity
 
 
-def _embed(landmarks, h: int, w: int) -> np.ndarray:
+_fm_pool = _FaceMeshPool(IDENTITY_FACEMESH_POOL)
+
+
+def embed_landmarks(landmarks, h: int, w: int) -> np.ndarray:
+    """Identity embedding of one FaceMesh result (static or tracking, 468 or 478 points)."""
     lm  = landmarks.landmark
     pts = np.array([[lm[i].x*w, lm[i].y*h] for i in KEY_LM], dtype=np.float64)
     nose = np.array([lm[1].x*w, lm[1].y*h])
@@ -63,53 +120,178 @@ def cosine_sim(a: np.ndarray, b: np.ndarray) -> float:
 def extract_embedding(frame_bgr: np.ndarray) -> Optional[np.ndarray]:
     h, w = frame_bgr.shape[:2]
     rgb  = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-    res  = _get_fm().process(rgb)
+    with _fm_pool.lease() as fm:
+        res = fm.process(rgb)
     if not res.multi_face_landmarks:
         return None
-    return _embed(res.multi_face_landmarks[0], h, w)
+    return embed_landmarks(res.multi_face_landmarks[0], h, w)
+
+
+EMB_DIM = 2 * len(KEY_LM)
 
 
 class IdentityManager:
-    def __init__(self, path: Path = PERSIST_PATH):
-        self._path  = path
-        self._store: Dict[str, Dict] = {}
+    def __init__(self, path: Path = IDENTITY_STORE_DIR, legacy_path: Optional[Path] = PERSIST_PATH):
+        self._db    = IdentityStore(path, legacy_path)
+        self._persist = False                         # False → store unreadable, in-memory only
+        self._store: Dict[str, Dict] = {}             # face_id → metadata (no embedding)
+        self._emb   = np.zeros((64, EMB_DIM), dtype=np.float32)
+        self._ids:  List[str] = []                    # row i of _emb belongs to _ids[i]
+        self._row:  Dict[str, int] = {}
+        self._index: Optional[IVFIndex] = None
+        self._building: Optional[asyncio.Task] = None   # background IVF rebuild
+        self._build_dirty: set = set()                # rows updated while it runs
+        self._task:  Optional[asyncio.Task] = None
+        self._wake:  Optional[asyncio.Event] = None
+        self._stopping = False
+        self._flushes = 0
+        self._flush_errors = 0
         self._load()
 
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def search(self, emb: np.ndarray, k: int = 1, exact: bool = False) -> List[Tuple[str, float]]:
+        """Top-k (face_id, cosine similarity), best first; ANN on large stores unless exact."""
+        n = len(self._ids)
+        if n == 0:
+            return []
+        q = (emb / (np.linalg.norm(emb) + 1e-9)).astype(np.float32)
+        if not exact and IDENTITY_ANN_MIN_SIZE and n >= IDENTITY_ANN_MIN_SIZE:
+            if self._index is None or self._index.needs_rebuild(n):
+                self._rebuild_index()
+            if self._index is not None:
+                rows, sims = self._index.search(q, k)
+                return [(self._ids[i], float(s)) for i, s in zip(rows, sims)]
+        sims = self._emb[:n] @ q
+        if k == 1:
+            top = [int(np.argmax(sims))]
+        else:
+            top = np.argpartition(-sims, min(k, n) - 1)[:k]
+            top = top[np.argsort(-sims[top], kind="stable")]
+        return [(self._ids[i], float(sims[i])) for i in top]
+
+    def _rebuild_index(self):
+        """Build the IVF index in a thread; without a running loop (tools), inline."""
+        if self._building is not None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            index = IVFIndex()
+            index.build(self._emb[:len(self._ids)])
+            self._index = index
+            return
+        self._building = loop.create_task(self._build_index())
+
+    async def _build_index(self):
+        n = len(self._ids)
+        self._build_dirty.clear()
+        try:
+            index = IVFIndex()
+            await asyncio.to_thread(index.build, self._emb[:n].copy())
+            # Catch up with what changed on the loop meanwhile, then swap it in
+            m = len(self._ids)
+            if m > n:
+                index.add(np.arange(n, m), self._emb[n:m])
+            for row in self._build_dirty:
+                if row < n:
+                    index.update(row, self._emb[row])
+            self._index = index
+        except Exception as e:
+            print(f"⚠️  identity index build failed: {e}")
+        finally:
+            self._build_dirty.clear()
+            self._building = None
+
+    def _append_row(self, fid: str, emb: np.ndarray):
+        n = len(self._ids)
+        if n == len(self._emb):
+            grown = np.zeros((2 * n, EMB_DIM), dtype=np.float32)
+            grown[:n] = self._emb
+            self._emb = grown
+        self._emb[n] = emb / (np.linalg.norm(emb) + 1e-9)
+        self._ids.append(fid)
+        self._row[fid] = n
+        if self._index is not None:
+            self._index.add(np.array([n]), self._emb[n])
+
     def match_or_create(self, frame_bgr: np.ndarray,
                         threshold: float = MATCH_THRESHOLD) -> Dict:
-        emb = extract_embedding(frame_bgr)
+        return self.match_embedding(extract_embedding(frame_bgr), threshold)
+
+    def match_embedding(self, emb: Optional[np.ndarray],
+                        threshold: float = MATCH_THRESHOLD) -> Dict:
+        """Match (or enrol) an extract_embedding() result; call from one thread only."""
         if emb is None:
             return {"face_id": None, "status": "no_face_detected", "confidence": 0.0}
 
-        best_id, best_sim = None, -1.0
-        for fid, entry in self._store.items():
-            s = cosine_sim(emb, np.array(entry["embedding"]))
-            if s > best_sim:
-                best_sim = s; best_id = fid
+        best = self.search(emb)
+        if self._index is not None and (not best or best[0][1] < threshold):
+            best = self.search(emb, exact=True)
+        best_id, best_sim = best[0] if best else (None, -1.0)
 
         if best_sim >= threshold and best_id:
-            e = self._store[best_id]
-            n = e["seen_count"]
-            me = (np.array(e["embedding"])*n + emb)/(n+1)
-            me /= np.linalg.norm(me)+1e-9
-            e["embedding"]  = me.tolist()
-            e["seen_count"] = n+1
-            e["last_seen"]  = time.time()
-            self._save()
+            self._observe(best_id, emb)
             return {"face_id": best_id, "status": "matched", "confidence": best_sim}
 
         fid = str(uuid.uuid4())
-        self._store[fid] = {"embedding": emb.tolist(), "seen_count": 1,
+        self._store[fid] = {"seen_count": 1,
                             "created_at": time.time(), "last_seen": time.time(), "profile": {}}
-        self._save()
+        self._append_row(fid, emb)
+        self._persist_op(self._db.append_identity, fid, self._emb[self._row[fid]], self._store[fid])
         return {"face_id": fid, "status": "new_identity", "confidence": 0.75}
 
+    def resolve(self, face_id: Optional[str]) -> Optional[str]:
+        """Surviving face id for one merged away by tools/dedup_identities.py."""
+        return self._db.aliases.get(face_id, face_id) if face_id else face_id
+
+    def confirm_embedding(self, face_id: Optional[str], emb: Optional[np.ndarray],
+                          threshold: float = MATCH_THRESHOLD) -> Dict:
+        """
+        Session-end identity check with FaceAnalyzer.get_identity_embedding().
+        A landing identity the session face agrees with is "confirmed" and its
+        centroid absorbs the session mean; one it disagrees with is left
+        untouched ("mismatch"). Without a landing identity this is
+        match_embedding(): the session face is matched or enrolled.
+        """
+        face_id = self.resolve(face_id)
+        if emb is None:
+            return {"face_id": face_id, "status": "insufficient_frames", "confidence": 0.0}
+        if face_id is None or face_id not in self._row:
+            return self.match_embedding(emb, threshold)
+        q   = emb / (np.linalg.norm(emb) + 1e-9)
+        sim = float(self._emb[self._row[face_id]] @ q)
+        if sim < threshold:
+            return {"face_id": face_id, "status": "mismatch", "confidence": sim}
+        self._observe(face_id, emb)
+        return {"face_id": face_id, "status": "confirmed", "confidence": sim}
+
+    def _observe(self, fid: str, emb: np.ndarray):
+        """Fold one more sighting into the identity's centroid (in place)."""
+        e   = self._store[fid]
+        n   = e["seen_count"]
+        row = self._emb[self._row[fid]]
+        row *= n
+        row += emb
+        row /= np.linalg.norm(row)+1e-9
+        if self._index is not None:
+            self._index.update(self._row[fid], row)
+        if self._building is not None:
+            self._build_dirty.add(self._row[fid])
+        e["seen_count"] = n+1
+        e["last_seen"]  = time.time()
+        self._persist_op(self._db.update_embedding, fid, row, n+1, e["last_seen"])
+
     def update_profile(self, face_id: str, data: Dict) -> bool:
+        face_id = self.resolve(face_id)
         if face_id not in self._store: return False
         self._store[face_id]["profile"].update(data)
-        self._save(); return True
+        self._persist_op(self._db.update_profile, face_id, self._store[face_id]["profile"])
+        return True
 
     def get_profile(self, face_id: str) -> Optional[Dict]:
+        face_id = self.resolve(face_id)
         e = self._store.get(face_id)
         if e is None: return None
         return {"face_id": face_id, "created_at": e["created_at"],
@@ -117,18 +299,85 @@ class IdentityManager:
 
     def _load(self):
         try:
-            if self._path.exists():
-                self._store = json.loads(self._path.read_text())
+            ids, emb, records = self._db.load(EMB_DIM)
         except Exception:
-            self._store = {}
+            return                                    # unreadable store → in-memory only
+        for i, fid in enumerate(ids):
+            self._store[fid] = records[fid]
+            self._append_row(fid, emb[i])
+        self._persist = True
 
-    def _save(self):
+    def _persist_op(self, op, *args):
+        if not self._persist:
+            return
         try:
-            self._path.parent.mkdir(parents=True, exist_ok=True)
-            self._path.write_text(json.dumps(self._store))
+            op(*args)
+            if self._task is not None:
+                if self._db.dirty >= IDENTITY_FLUSH_MAX_DIRTY:
+                    self._wake.set()
+            elif self._db.needs_compaction():
+                self._db.compact(self._ids, self._emb[:len(self._ids)], self._store)
         except Exception:
             pass
 
+    # ── Background flush ───────────────────────────────────────────────────
+
+    def start(self):
+        """Build the ANN index off the loop; buffer store writes and flush them from a task."""
+        if IDENTITY_ANN_MIN_SIZE and len(self._ids) >= IDENTITY_ANN_MIN_SIZE:
+            self._rebuild_index()
+        if self._task is None and self._persist:
+            self._db.buffered = True
+            self._wake = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Let the flusher finish its batch (never cut a compaction short), then write the rest."""
+        if self._building is not None:
+            await self._building
+        if self._task is not None:
+            self._stopping = True
+            self._wake.set()
+            await self._task
+            self._task, self._stopping = None, False
+            await self.flush()
+            self._db.buffered = False
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), IDENTITY_FLUSH_INTERVAL_SEC)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self):
+        """Append dirty records; compact off the loop when the log is long enough."""
+        try:
+            if self._db.dirty:
+                await self._db.flush_async()
+                self._flushes += 1
+            if self._db.needs_compaction():
+                n = len(self._ids)
+                records = {fid: {**e, "profile": dict(e.get("profile", {}))}
+                           for fid, e in self._store.items()}
+                await asyncio.to_thread(self._db.compact, self._ids[:n],
+                                        self._emb[:n].copy(), records)
+        except Exception:
+            self._flush_errors += 1
+
+    def stats(self) -> Dict:
+        return {
+            "identities":   len(self._ids),
+            "persistent":   self._persist,
+            "generation":   self._db.generation,
+            "log_records":  self._db.log_records,
+            "dirty":        self._db.dirty,
+            "flushes":      self._flushes,
+            "flush_errors": self._flush_errors,
+        }
+
 
 _manager: Optional[IdentityManager] = None
 
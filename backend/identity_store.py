@@ -0,0 +1,262 @@
+"""
+identity_store.py
+Crash-safe persistence for IdentityManager: memory-mapped snapshot + append-only log.
+
+The legacy store rewrote one JSON document (embeddings as float lists) on every
+match; this keeps writes O(1) and startup a memcpy.
+
+Directory layout (IDENTITY_STORE_DIR)
+─────────────────────────────────────
+  meta.json        manifest: generation, snapshot / log file names, face ids in
+                   row order, per-identity records (seen_count, timestamps, profile)
+                   and aliases (merged face id → surviving id, tools/dedup_identities.py)
+  emb-<gen>.npy    (N, D) float32 unit rows, row i ↔ ids[i]; loaded with mmap
+  log-<gen>.jsonl  one JSON object per change since the snapshot:
+                     {"op": "add",     "id", "emb", "record"}
+                     {"op": "update",  "id", "emb", "seen_count", "last_seen"}
+                     {"op": "profile", "id", "profile"}
+                   "emb" is base64 of the float32 row.
+
+Every write is one appended line. With `buffered` set (IdentityManager.start()
+does so while the server runs) writes only mark the record dirty; the manager's
+background task appends the dirty batch with aiofiles every
+IDENTITY_FLUSH_INTERVAL_SEC, or sooner once IDENTITY_FLUSH_MAX_DIRTY records
+are waiting. Repeated updates of one identity coalesce into a single line per
+batch (later values win on replay). Replay ignores a torn final line (crash
+mid-append) and the log is truncated back to the last complete record.
+After IDENTITY_COMPACT_EVERY log records the caller compacts: a new snapshot
+and an empty log are written under the next generation, then meta.json is
+swapped in with os.replace — the commit point — and the old generation is
+deleted. A crash at any step leaves either the old or the new generation
+intact.
+
+On first start with no meta.json, a legacy IDENTITY_STORE_PATH JSON file is
+migrated into a first snapshot (the JSON file itself is left untouched).
+
+  IDENTITY_STORE_DIR      store directory   (default: IDENTITY_STORE_PATH with a .store suffix)
+  IDENTITY_COMPACT_EVERY  log records between compactions            (default 5000)
+  IDENTITY_FSYNC          "1" → fsync every append (survives power loss, slower)
+  IDENTITY_FLUSH_INTERVAL_SEC  max delay before a dirty record is written  (default 1.0)
+  IDENTITY_FLUSH_MAX_DIRTY     dirty records that trigger an early flush    (default 256)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import aiofiles
+import numpy as np
+
+LEGACY_STORE_PATH      = Path(os.getenv("IDENTITY_STORE_PATH", "/tmp/neuro_vitals_ids.json"))
+IDENTITY_STORE_DIR     = Path(os.getenv("IDENTITY_STORE_DIR", str(LEGACY_STORE_PATH.with_suffix(".store"))))
+IDENTITY_COMPACT_EVERY = int(os.getenv("IDENTITY_COMPACT_EVERY", "5000"))
+IDENTITY_FSYNC         = os.getenv("IDENTITY_FSYNC", "0") == "1"
+IDENTITY_FLUSH_INTERVAL_SEC = float(os.getenv("IDENTITY_FLUSH_INTERVAL_SEC", "1.0"))
+IDENTITY_FLUSH_MAX_DIRTY    = int(os.getenv("IDENTITY_FLUSH_MAX_DIRTY", "256"))
+
+STORE_VERSION = 1
+META_NAME     = "meta.json"
+
+
+def _b64(row: np.ndarray) -> str:
+    return base64.b64encode(np.ascontiguousarray(row, dtype="<f4").tobytes()).decode()
+
+
+def _unb64(s: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(s), dtype="<f4")
+
+
+class IdentityStore:
+    def __init__(self, directory: Path = IDENTITY_STORE_DIR,
+                 legacy_path: Optional[Path] = LEGACY_STORE_PATH,
+                 compact_every: int = IDENTITY_COMPACT_EVERY, fsync: bool = IDENTITY_FSYNC):
+        self.dir           = Path(directory)
+        self.legacy_path   = Path(legacy_path) if legacy_path else None
+        self.compact_every = compact_every
+        self.fsync         = fsync
+        self.generation    = 0
+        self.log_records   = 0
+        self.aliases: Dict[str, str] = {}
+        self.buffered      = False                  # True → writes wait for flush_async()
+        self._dirty: Dict[Tuple[str, str], Dict] = {}   # (op, face id) → latest record
+        self._log          = None
+        self._log_path: Optional[Path] = None
+
+    # ── Load ───────────────────────────────────────────────────────────────
+
+    def load(self, dim: int) -> Tuple[List[str], np.ndarray, Dict[str, Dict]]:
+        """(face ids in row order, (N, dim) float32 rows, records) — snapshot + log replay."""
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.dir / META_NAME
+        if not meta_path.exists():
+            ids, emb, records = self._read_legacy(dim)
+            self._write_generation(1, ids, emb, records)
+            return ids, emb, records
+
+        meta = json.loads(meta_path.read_text())
+        self.generation = meta["generation"]
+        ids     = list(meta["ids"])
+        records = meta["records"]
+        self.aliases = meta.get("aliases", {})
+        snap    = np.load(self.dir / meta["emb"], mmap_mode="r")
+        extra: List[np.ndarray] = []
+        row_of  = {fid: i for i, fid in enumerate(ids)}
+        updates: Dict[int, np.ndarray] = {}
+
+        log_path = self.dir / meta["log"]
+        good_end = 0
+        with open(log_path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break                                    # torn tail from a crash
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    break
+                good_end += len(line)
+                self.log_records += 1
+                self._apply(rec, ids, row_of, records, extra, updates, dim)
+        if good_end < log_path.stat().st_size:
+            with open(log_path, "r+b") as f:
+                f.truncate(good_end)
+
+        emb = np.array(snap, dtype=np.float32).reshape(-1, dim)     # one memcpy out of the mmap
+        if extra:
+            emb = np.concatenate([emb, np.stack(extra)])
+        for i, row in updates.items():
+            emb[i] = row
+        self._log, self._log_path = open(log_path, "ab"), log_path
+        return ids, emb, records
+
+    @staticmethod
+    def _apply(rec: Dict, ids: List[str], row_of: Dict[str, int], records: Dict[str, Dict],
+               extra: List[np.ndarray], updates: Dict[int, np.ndarray], dim: int):
+        op, fid = rec.get("op"), rec.get("id")
+        if op == "add" and fid not in row_of:
+            row_of[fid] = len(ids)
+            ids.append(fid)
+            extra.append(_unb64(rec["emb"]).reshape(dim))
+            records[fid] = rec["record"]
+        elif op == "update" and fid in row_of:
+            row = row_of[fid]
+            updates[row] = _unb64(rec["emb"]).reshape(dim)
+            records[fid]["seen_count"] = rec["seen_count"]
+            records[fid]["last_seen"]  = rec["last_seen"]
+        elif op == "profile" and fid in records:
+            records[fid]["profile"] = rec["profile"]
+
+    def _read_legacy(self, dim: int) -> Tuple[List[str], np.ndarray, Dict[str, Dict]]:
+        ids, rows, records = [], [], {}
+        try:
+            raw = json.loads(self.legacy_path.read_text()) if self.legacy_path else {}
+        except (OSError, ValueError):
+            raw = {}
+        for fid, entry in raw.items():
+            emb = np.asarray(entry.pop("embedding", ()), dtype=np.float32)
+            if emb.shape != (dim,):
+                continue
+            ids.append(fid); rows.append(emb / (np.linalg.norm(emb) + 1e-9)); records[fid] = entry
+        emb = np.stack(rows).astype(np.float32) if rows else np.zeros((0, dim), dtype=np.float32)
+        return ids, emb, records
+
+    # ── Writes (one log line each, or one dirty entry when buffered) ───────
+
+    def append_identity(self, fid: str, emb: np.ndarray, record: Dict):
+        self._append({"op": "add", "id": fid, "emb": _b64(emb), "record": record})
+
+    def update_embedding(self, fid: str, emb: np.ndarray, seen_count: int, last_seen: float):
+        self._append({"op": "update", "id": fid, "emb": _b64(emb),
+                      "seen_count": seen_count, "last_seen": last_seen})
+
+    def update_profile(self, fid: str, profile: Dict):
+        self._append({"op": "profile", "id": fid, "profile": profile})
+
+    def _append(self, rec: Dict):
+        if self.buffered:
+            self._dirty[(rec["op"], rec["id"])] = rec
+            return
+        self._write_sync([rec])
+
+    @property
+    def dirty(self) -> int:
+        return len(self._dirty)
+
+    @staticmethod
+    def _encode(recs: List[Dict]) -> bytes:
+        return b"".join(json.dumps(r, separators=(",", ":")).encode() + b"\n" for r in recs)
+
+    def _write_sync(self, recs: List[Dict]):
+        self._log.write(self._encode(recs))
+        self._log.flush()
+        if self.fsync:
+            os.fsync(self._log.fileno())
+        self.log_records += len(recs)
+
+    def flush(self):
+        """Write every dirty record now (blocking)."""
+        recs, self._dirty = list(self._dirty.values()), {}
+        if recs:
+            self._write_sync(recs)
+
+    async def flush_async(self):
+        """Append the dirty batch without blocking the event loop."""
+        taken, self._dirty = self._dirty, {}
+        if not taken:
+            return
+        try:
+            async with aiofiles.open(self._log_path, "ab") as f:
+                await f.write(self._encode(list(taken.values())))
+                await f.flush()
+                if self.fsync:
+                    await asyncio.to_thread(os.fsync, f.fileno())
+        except Exception:
+            self._dirty = {**taken, **self._dirty}      # retry next flush; newer values win
+            raise
+        self.log_records += len(taken)
+
+    # ── Compaction ─────────────────────────────────────────────────────────
+
+    def needs_compaction(self) -> bool:
+        return self.log_records + len(self._dirty) >= self.compact_every
+
+    def compact(self, ids: List[str], emb: np.ndarray, records: Dict[str, Dict]):
+        """
+        Fold the log into a new snapshot generation. Dirty records stay queued:
+        replayed on top of a snapshot that already holds them, they change nothing.
+        """
+        old = self.generation
+        self._write_generation(old + 1, ids, emb, records)
+        for name in (f"emb-{old}.npy", f"log-{old}.jsonl"):
+            try:
+                (self.dir / name).unlink()
+            except OSError:
+                pass
+
+    def _write_generation(self, gen: int, ids: List[str], emb: np.ndarray, records: Dict[str, Dict]):
+        emb_name, log_name = f"emb-{gen}.npy", f"log-{gen}.jsonl"
+        with open(self.dir / emb_name, "wb") as f:
+            np.save(f, np.ascontiguousarray(emb, dtype=np.float32))
+            f.flush(); os.fsync(f.fileno())
+        open(self.dir / log_name, "wb").close()
+        meta = {"version": STORE_VERSION, "generation": gen, "emb": emb_name, "log": log_name,
+                "ids": list(ids), "records": records, "aliases": self.aliases}
+        tmp = self.dir / (META_NAME + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f, separators=(",", ":"))
+            f.flush(); os.fsync(f.fileno())
+        os.replace(tmp, self.dir / META_NAME)                 # commit point
+        if self._log is not None:
+            self._log.close()
+        self._log, self._log_path = open(self.dir / log_name, "ab"), self.dir / log_name
+        self.generation, self.log_records = gen, 0
+
+    def close(self):
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
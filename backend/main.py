@@ -12,6 +12,10 @@ REST
   POST /api/v1/identity/{face_id}/profile  Save intake form data
   GET  /api/v1/identity/{face_id}/profile  Fetch stored user profile
   POST /api/v1/voice/analyze          Full voice biomarker extraction
+  POST /api/v1/voice/analyze-bulk     Many recordings (files or .zip) → NDJSON results
+  GET  /api/v1/voice/jobs/{job_id}    Poll an async voice analysis job
+  GET  /api/v1/voice/jobs/stats       Voice worker pool queue depth / latency
+  WS   /api/v1/voice/stream           Incremental voice biomarkers from PCM chunks
   GET  /api/v1/session/{session_id}/results  Final session report
   POST /api/v1/session/{session_id}/risk     Trigger / refresh risk report
   GET  /health                        Liveness probe
@@ -30,17 +34,25 @@ from __future__ import annotations
 
 import asyncio
 import base64
+import collections
+import hashlib
 import json
+import os
+import tempfile
 import time
 import traceback
 import uuid
+import zipfile
 from contextlib import asynccontextmanager
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
+import aiofiles
 import cv2
 import numpy as np
 from fastapi import (
     FastAPI,
+    File,
+    Form,
     HTTPException,
     Request,
     UploadFile,
@@ -49,7 +61,7 @@ from fastapi import (
     status,
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel
 
 from analysis_results import (
@@ -60,11 +72,17 @@ from analysis_results import (
     SessionResults,
     UserProfile,
 )
+from clock import make_clock
 from face_analyzer import FaceAnalyzer
 from gait_analyzer import BodyAnalyzer
-from identity_manager import get_identity_manager
+from identity_manager import extract_embedding, get_identity_manager
+from risk_engine import get_risk_engine
 from risk_stratifier import stratify_risk
-from voice_analyzer import analyze_voice
+from runtime_monitor import get_runtime_monitor
+from stream_recorder import RecordingWebSocket, open_session_recorder
+from voice_cache import get_voice_cache
+from voice_jobs import get_voice_jobs, public_job
+from voice_stream import StreamingVoiceAnalyzer
 
 
 # ─────────────────────────────────────────────
@@ -74,6 +92,20 @@ from voice_analyzer import analyze_voice
 SESSION_STORE: Dict[str, Dict] = {}
 MAX_SESSION_DURATION = 65          # seconds (hard limit, slightly > 60 s for cleanup)
 MAX_SESSIONS         = 100         # evict oldest when full
+# Per-frame Pose budget in ms; unset/0 keeps fixed complexity, no decimation
+BODY_LATENCY_BUDGET_MS = float(os.getenv("BODY_LATENCY_BUDGET_MS", "0")) or None
+# Voice uploads larger than this are spooled to disk and analysed in blocks
+VOICE_SPOOL_MIN_BYTES  = int(os.getenv("VOICE_SPOOL_MIN_BYTES", str(8 * 2**20)))
+UPLOAD_CHUNK_BYTES     = 2**20
+VOICE_BULK_MAX_FILES   = int(os.getenv("VOICE_BULK_MAX_FILES", "200"))
+VOICE_BULK_MAX_MEMBER_BYTES = 256 * 2**20   # larger archive members are rejected (zip bombs)
+
+def _close_analyzers(session: Dict):
+    """Release MediaPipe graphs now rather than at interpreter shutdown."""
+    for key in ("face_analyzer", "body_analyzer"):
+        if session.get(key) is not None:
+            session[key].close()
+
 
 def _evict_old_sessions():
     if len(SESSION_STORE) < MAX_SESSIONS:
@@ -83,16 +115,23 @@ def _evict_old_sessions():
         SESSION_STORE.pop(sid, None)
 
 
-def _new_session(session_id: str, modules: list[str], face_id: Optional[str]) -> Dict:
+def _new_session(session_id: str, modules: list[str], face_id: Optional[str],
+                 clock=None) -> Dict:
     _evict_old_sessions()
+    # Session time source (SESSION_CLOCK); "frame" follows frame timestamps
+    clock = clock or make_clock()
     session = {
         "session_id":    session_id,
         "face_id":       face_id,
         "created_at":    time.time(),
         "modules":       modules,
-        "face_analyzer": FaceAnalyzer()   if "face"    in modules else None,
-        "body_analyzer": BodyAnalyzer()   if "body"    in modules else None,
+        "clock":         clock,
+        "face_analyzer": FaceAnalyzer(clock=clock) if "face" in modules else None,
+        "body_analyzer": BodyAnalyzer(latency_budget_ms=BODY_LATENCY_BUDGET_MS, clock=clock)
+                         if "body" in modules else None,
         "biomarkers":    {},              # flat dict, updated incrementally
+        "biomarker_version": 0,           # bumped by _merge_biomarkers on every update
+        "memo":          {},              # name → (_version, value), see _memo
         "frame_count":   0,
         "completed":     False,
     }
@@ -106,10 +145,19 @@ def _new_session(session_id: str, modules: list[str], face_id: Optional[str]) ->
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Pre-warm identity manager (loads JSON store once)
-    _ = get_identity_manager()
+    # Pre-warm identity manager (loads the store once) and start its flusher
+    get_identity_manager().start()
+    monitor = get_runtime_monitor()
+    monitor.start()
+    get_voice_jobs().start()
     print("✅  Neuro-Vitals backend ready")
     yield
+    await monitor.stop()
+    get_voice_jobs().stop()
+    await get_voice_cache().flush()                 # pending disk-tier writes
+    await get_identity_manager().stop()             # forced flush of dirty identities
+    for session in SESSION_STORE.values():
+        _close_analyzers(session)
     print("🛑  Shutting down")
 
 
@@ -184,7 +232,11 @@ async def analyze_stream(websocket: WebSocket):
     await websocket.accept()
     session_id    = None
     session       = None
-    start_time    = time.time()
+
+    # Optional capture for offline replay (STREAM_RECORD_DIR)
+    recorder = open_session_recorder()
+    if recorder is not None:
+        websocket = RecordingWebSocket(websocket, recorder)
 
     try:
         # ── Receive first message to initialise session ─────────────
@@ -201,12 +253,17 @@ async def analyze_stream(websocket: WebSocket):
             session_id = session_id or str(uuid.uuid4())
             session    = _new_session(session_id, modules, face_id=None)
 
+        # Session time starts at the first frame (media time for FrameClock)
+        clock = session["clock"]
+        clock.observe(payload.get("timestamp_ms"))
+        start_time = clock.now()
+
         # Process the first frame immediately (don't waste it)
         await _process_and_reply(websocket, payload, session, start_time)
 
         # ── Main streaming loop ──────────────────────────────────────
         while True:
-            elapsed = time.time() - start_time
+            elapsed = clock.now() - start_time
 
             # ── 60-second auto-close ────────────────────────────────
             if elapsed >= 60.0:
@@ -214,17 +271,19 @@ async def analyze_stream(websocket: WebSocket):
                 await websocket.send_json(final)
                 break
 
+            # Receive timeout is real network time, whatever the session clock
             try:
                 raw = await asyncio.wait_for(
                     websocket.receive_text(),
                     timeout=MAX_SESSION_DURATION - elapsed + 5.0,
                 )
             except asyncio.TimeoutError:
-                final = _build_final_payload(session, time.time() - start_time)
+                final = _build_final_payload(session, clock.now() - start_time)
                 await websocket.send_json(final)
                 break
 
             payload = json.loads(raw)
+            clock.observe(payload.get("timestamp_ms"))
             await _process_and_reply(websocket, payload, session, start_time)
 
     except WebSocketDisconnect:
@@ -250,8 +309,12 @@ async def _process_and_reply(
     session: Dict,
     start_time: float,
 ):
-    """Decode frame, run analyser, send live metrics."""
-    elapsed = time.time() - start_time
+    """
+    Decode frame, run analyser, send live metrics. The caller has already
+    advanced the session clock for this frame (once per frame).
+    """
+    clock   = session["clock"]
+    elapsed = clock.now() - start_time
     frame   = decode_frame(payload.get("frame_b64", ""))
     ts_ms   = float(payload.get("timestamp_ms", elapsed * 1000))
     module  = payload.get("module", "face")
@@ -261,6 +324,7 @@ async def _process_and_reply(
             "session_id": session["session_id"],
             "status":     "processing",
             "elapsed_sec": elapsed,
+            "frame_index": payload.get("frame_index"),
             "warning":    "frame_decode_failed",
         })
         return
@@ -275,8 +339,7 @@ async def _process_and_reply(
         metrics = session["body_analyzer"].process_frame(frame, ts_ms)
 
     # ── Merge metrics into flat biomarker dict ────────────────────
-    session["biomarkers"].update({k: v for k, v in metrics.items()
-                                  if v is not None and not isinstance(v, (list, dict, bool))})
+    _merge_biomarkers(session, _scalar_metrics(metrics))
 
     # ── Build live payload ────────────────────────────────────────
     live: Dict = {
@@ -284,6 +347,7 @@ async def _process_and_reply(
         "status":                 "processing",
         "elapsed_sec":            round(elapsed, 2),
         "frames_processed":       session["frame_count"],
+        "frame_index":            payload.get("frame_index"),
 
         # Cardio
         "heart_rate_bpm":         metrics.get("heart_rate_bpm"),
@@ -337,20 +401,76 @@ def _quality_warning(m: Dict) -> Optional[str]:
     return None
 
 
+# ─────────────────────────────────────────────
+#  Biomarker versioning + memoised reports
+# ─────────────────────────────────────────────
+# Every write to session["biomarkers"] goes through _merge_biomarkers, which
+# bumps session["biomarker_version"]. Analyzer state only changes in
+# _process_and_reply, which merges (and bumps) on every processed frame, so a
+# report derived from the biomarkers and final summaries is valid for exactly
+# one version. Polling endpoints reuse it and answer If-None-Match with 304.
+# The risk model's tag is part of the version too, so a hot reload of
+# risk_model.json (risk_engine.get_risk_engine) invalidates both.
+
+def _merge_biomarkers(session: Dict, values: Dict):
+    session["biomarkers"].update(values)
+    session["biomarker_version"] += 1
+
+
+def _scalar_metrics(metrics: Dict) -> Dict:
+    """The flat biomarker dict holds scalars only (no None, vectors, nested dicts or flags)."""
+    return {k: v for k, v in metrics.items()
+            if v is not None and not isinstance(v, (list, dict, bool))}
+
+
+def _version(session: Dict) -> str:
+    return f'{session["biomarker_version"]}.{get_risk_engine().tag}'
+
+
+def _memo(session: Dict, name: str, compute):
+    """compute() once per biomarker version and risk model."""
+    version = _version(session)
+    hit = session["memo"].get(name)
+    if hit is None or hit[0] != version:
+        hit = session["memo"][name] = (version, compute())
+    return hit[1]
+
+
+def _live_risk(session: Dict) -> Dict:
+    """Risk report over the merged biomarkers as they stand."""
+    return _memo(session, "risk", lambda: stratify_risk(session["biomarkers"].copy()))
+
+
+def _final_biomarkers(session: Dict) -> Tuple[Dict, Dict]:
+    """(biomarkers + both analysers' final summaries, their risk report); shared, do not mutate."""
+    def compute():
+        biomarkers = session["biomarkers"].copy()
+        if session.get("face_analyzer"):
+            biomarkers.update(session["face_analyzer"].get_final_summary())
+        if session.get("body_analyzer"):
+            biomarkers.update(session["body_analyzer"].get_final_summary())
+        return biomarkers, stratify_risk(biomarkers)
+    return _memo(session, "final", compute)
+
+
+def _etag(session: Dict, scope: str, extra: str = "") -> str:
+    return f'W/"{scope}-{_version(session)}{extra}"'
+
+
+def _not_modified(request: Request, etag: str) -> Optional[Response]:
+    """304 when the client already holds this version."""
+    sent = request.headers.get("if-none-match", "")
+    if etag in (t.strip() for t in sent.split(",")) or sent.strip() == "*":
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+
 def _build_final_payload(session: Dict, elapsed: float) -> Dict:
     """Build the test_complete payload, run risk stratification."""
-    biomarkers = session["biomarkers"].copy()
-
-    # Final summaries from analysers
-    if session.get("face_analyzer"):
-        face_final = session["face_analyzer"].get_final_summary()
-        biomarkers.update(face_final)
-    if session.get("body_analyzer"):
-        body_final = session["body_analyzer"].get_final_summary()
-        biomarkers.update(body_final)
+    # Final summaries from analysers + risk stratification (memoised per version)
+    biomarkers, risk = _final_biomarkers(session)
 
-    # Risk stratification
-    risk = stratify_risk(biomarkers)
+    identity = _confirm_session_identity(session)
 
     payload = {
         "session_id":    session["session_id"],
@@ -359,6 +479,7 @@ def _build_final_payload(session: Dict, elapsed: float) -> Dict:
         "frames_processed": session["frame_count"],
         "biomarkers":    _sanitise(biomarkers),
         "risk_report":   risk,
+        "identity":      identity,
         # Pulse wave for final chart
         "pulse_wave_samples": biomarkers.get("pulse_wave_samples", []),
     }
@@ -367,6 +488,23 @@ def _build_final_payload(session: Dict, elapsed: float) -> Dict:
     return _sanitise(payload)
 
 
+def _confirm_session_identity(session: Dict) -> Optional[Dict]:
+    """
+    Confirm the landing identity (or enrol one if the landing frame had no
+    face) from the face analyzer's best tracked frames. Runs once per session.
+    """
+    fa = session.get("face_analyzer")
+    if fa is None:
+        return None
+    if "identity" not in session:
+        result = get_identity_manager().confirm_embedding(session.get("face_id"),
+                                                          fa.get_identity_embedding())
+        if session.get("face_id") is None and result.get("face_id"):
+            session["face_id"] = result["face_id"]
+        session["identity"] = {**result, "frames_used": fa.identity_frames}
+    return session["identity"]
+
+
 def _sanitise(obj):
     """Recursively convert numpy types / NaN / Inf to JSON-safe Python types."""
     if isinstance(obj, dict):
@@ -407,7 +545,8 @@ async def identity_match(req: IdentityMatchRequest):
         raise HTTPException(status_code=400, detail="Cannot decode frame")
 
     mgr    = get_identity_manager()
-    result = mgr.match_or_create(frame)
+    emb    = await asyncio.to_thread(extract_embedding, frame)   # FaceMesh off the loop
+    result = mgr.match_embedding(emb)
 
     # Pre-create a session so the client can start immediately
     session_id = str(uuid.uuid4())
@@ -449,29 +588,317 @@ async def get_profile(face_id: str):
 async def voice_analyze(
     audio: UploadFile,
     session_id: Optional[str] = None,
+    mode: str = "sync",
 ):
     """
     Accept an audio file upload (WAV / OGG / FLAC / MP3).
-    Returns full voice biomarker report.
+    Analysis runs in the voice worker pool, off the event loop.
+    mode=sync   waits and returns the full voice biomarker report.
+    mode=async  returns 202 with a job_id to poll at /api/v1/voice/jobs/{job_id}.
+    Repeat uploads of the same clip are served from voice_cache (the job is
+    already "done"); a retry while the first upload is still running joins it.
     Optionally merges results into a running session for risk stratification.
     """
+    if mode not in ("sync", "async"):
+        raise HTTPException(status_code=400, detail="mode must be 'sync' or 'async'")
     try:
-        audio_bytes = await audio.read()
+        audio_src, digest = await _receive_audio(audio)
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Cannot read audio: {e}")
 
-    metrics = analyze_voice(audio_bytes)
+    jobs = get_voice_jobs()
+    job  = _start_voice_job(audio_src, digest, session_id)
+    if job is None:
+        raise HTTPException(status_code=503, detail="Voice analysis queue is full, retry later",
+                            headers={"Retry-After": "5"})
+
+    if mode == "async":
+        return JSONResponse(status_code=202, content={
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "poll":   f"/api/v1/voice/jobs/{job['job_id']}",
+        })
+
+    await jobs.wait(job)
+    if job["status"] == "timeout":
+        raise HTTPException(status_code=504, detail=f"Voice analysis {job['detail']}")
+    if job["status"] != "done":
+        raise HTTPException(status_code=422, detail=job["detail"])
+    return _sanitise(job["result"])
+
+
+def _start_voice_job(audio_src, digest: str, session_id: Optional[str]) -> Optional[Dict]:
+    """Cached result as a finished job, else a pool job; None when the queue is full."""
+    jobs  = get_voice_jobs()
+    cache = get_voice_cache()
+    key   = cache.key(digest, chunked=isinstance(audio_src, str))
+    cached = cache.get(key)
+    if cached is not None:
+        if isinstance(audio_src, str):
+            os.unlink(audio_src)
+        _merge_voice_metrics(session_id, cached)
+        return jobs.resolved(cached)
+
+    def on_result(metrics: Dict):
+        cache.put(key, metrics)
+        _merge_voice_metrics(session_id, metrics)
+    return jobs.submit(audio_src, on_result=on_result, key=key)
+
+
+@app.post("/api/v1/voice/analyze-bulk")
+async def voice_analyze_bulk(
+    files: List[UploadFile] = File(default=[]),
+    archive: Optional[UploadFile] = File(default=None),
+    manifest: Optional[str] = Form(default=None),
+):
+    """
+    Analyse a batch of recordings: any number of `files` and/or one .zip
+    `archive`. `manifest` is an optional JSON object mapping file name (archive
+    member path) → session_id; those results are merged into the session.
+
+    Files are fed to the voice worker pool a few at a time (the pool's free
+    slots, at most 2 × workers) and results stream back as NDJSON lines in
+    completion order, followed by one {"summary": ...} line.
+    """
+    try:
+        sessions = json.loads(manifest) if manifest else {}
+        if not isinstance(sessions, dict):
+            raise ValueError("expected an object")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest: {e}")
+
+    items = [(f.filename or f"file_{i}", _upload_reader(f)) for i, f in enumerate(files)]
+    zf = None
+    if archive is not None:
+        try:
+            zf = zipfile.ZipFile(archive.file)
+        except zipfile.BadZipFile:
+            raise HTTPException(status_code=400, detail="archive must be a .zip file")
+        items += [(info.filename, _member_reader(zf, info)) for info in zf.infolist()
+                  if not info.is_dir() and not _is_archive_noise(info.filename)]
+    if not items:
+        raise HTTPException(status_code=400, detail="No audio files supplied")
+    if len(items) > VOICE_BULK_MAX_FILES:
+        raise HTTPException(status_code=413,
+                            detail=f"At most {VOICE_BULK_MAX_FILES} files per bulk request")
+
+    return StreamingResponse(_bulk_results(items, sessions, zf),
+                             media_type="application/x-ndjson")
+
+
+async def _bulk_results(items, sessions: Dict[str, str], zf: Optional[zipfile.ZipFile]):
+    jobs    = get_voice_jobs()
+    t0      = time.perf_counter()
+    limit   = 2 * jobs.workers
+    pending: Dict[asyncio.Task, tuple] = {}
+    counts  = collections.Counter()
+
+    def line(name: str, sid: Optional[str], job: Dict) -> str:
+        counts[job["status"]] += 1
+        counts["cached"] += bool(job["cached"])
+        row = {"file": name, "session_id": sid, "job_id": job["job_id"],
+               "status": job["status"], "cached": job["cached"], "run_ms": job["run_ms"]}
+        if job["status"] == "done":
+            row["result"] = job["result"]
+        else:
+            row["detail"] = job["detail"]
+        return json.dumps(_sanitise(row)) + "\n"
+
+    async def drain(block: bool):
+        if not pending:
+            await asyncio.sleep(0.2)            # pool busy with other clients
+            return []
+        done, _ = await asyncio.wait(pending, timeout=None if block else 0,
+                                     return_when=asyncio.FIRST_COMPLETED)
+        return [line(*pending.pop(t), t.result()) for t in done]
+
+    try:
+        for name, read in items:
+            sid = sessions.get(name)
+            # Spool first: other clients can take the freed slots while we read
+            try:
+                src, digest = await read()
+            except Exception as e:
+                counts["failed"] += 1
+                yield json.dumps({"file": name, "session_id": sid, "status": "failed",
+                                  "detail": f"Cannot read audio: {e}"}) + "\n"
+                continue
+            while len(pending) >= limit or not jobs.has_capacity():
+                for row in await drain(block=True):
+                    yield row
+            # No await between the capacity check and the submit
+            job = _start_voice_job(src, digest, sid)
+            if job is None:
+                counts["rejected"] += 1
+                yield json.dumps({"file": name, "session_id": sid, "status": "rejected",
+                                  "detail": "Voice analysis queue is full"}) + "\n"
+                continue
+            pending[asyncio.ensure_future(jobs.wait(job))] = (name, sid)
+            for row in await drain(block=False):
+                yield row
+        while pending:
+            for row in await drain(block=True):
+                yield row
+    finally:
+        if zf is not None:
+            zf.close()
 
-    if "error" in metrics:
-        raise HTTPException(status_code=422, detail=metrics["error"])
+    yield json.dumps({"summary": {
+        "files":      len(items),
+        **{k: counts[k] for k in ("done", "failed", "timeout", "rejected", "cached")},
+        "elapsed_ms": (time.perf_counter() - t0) * 1000.0,
+    }}) + "\n"
 
-    # Merge into session if provided
+
+def _upload_reader(upload: UploadFile):
+    return lambda: _receive_audio(upload)
+
+
+def _member_reader(zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+    return lambda: asyncio.to_thread(_read_member, zf, info)
+
+
+def _is_archive_noise(name: str) -> bool:
+    base = os.path.basename(name)
+    return name.startswith("__MACOSX/") or base.startswith(".")
+
+
+def _read_member(zf: zipfile.ZipFile, info: zipfile.ZipInfo):
+    """_receive_audio for an archive member (runs in a thread; zip reads block)."""
+    if info.file_size > VOICE_BULK_MAX_MEMBER_BYTES:
+        raise ValueError(f"member larger than {VOICE_BULK_MAX_MEMBER_BYTES >> 20} MiB")
+    if info.file_size <= VOICE_SPOOL_MIN_BYTES:
+        data = zf.read(info)
+        return data, hashlib.sha256(data).hexdigest()
+    hasher = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix="voice_", suffix=os.path.splitext(info.filename)[1][:8])
+    try:
+        with os.fdopen(fd, "wb") as out, zf.open(info) as src:
+            while chunk := src.read(UPLOAD_CHUNK_BYTES):
+                hasher.update(chunk)
+                out.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, hasher.hexdigest()
+
+
+async def _receive_audio(audio: UploadFile):
+    """
+    (source, sha256 hex). The source is the upload bytes, or for uploads above
+    VOICE_SPOOL_MIN_BYTES the path of a temp copy: those are decoded block by
+    block in the worker instead of whole.
+    """
+    head   = await audio.read(VOICE_SPOOL_MIN_BYTES + 1)
+    hasher = hashlib.sha256(head)
+    if len(head) <= VOICE_SPOOL_MIN_BYTES:
+        return head, hasher.hexdigest()
+    suffix = os.path.splitext(audio.filename or "")[1][:8]
+    fd, path = tempfile.mkstemp(prefix="voice_", suffix=suffix)
+    os.close(fd)
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            await f.write(head)
+            while chunk := await audio.read(UPLOAD_CHUNK_BYTES):
+                hasher.update(chunk)
+                await f.write(chunk)
+    except Exception:
+        os.unlink(path)
+        raise
+    return path, hasher.hexdigest()
+
+
+@app.get("/api/v1/voice/jobs/stats")
+async def voice_job_stats():
+    """Worker pool capacity: queue depth, outcomes, latency percentiles."""
+    return _sanitise({**get_voice_jobs().stats(), "cache": get_voice_cache().stats()})
+
+
+@app.get("/api/v1/voice/jobs/{job_id}")
+async def voice_job(job_id: str):
+    """Status of an async voice job; `result` is set once status is "done"."""
+    job = get_voice_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _sanitise(public_job(job))
+
+
+def _merge_voice_metrics(session_id: Optional[str], metrics: Dict):
+    """Merge voice biomarkers into a running session, if one was given."""
     if session_id and session_id in SESSION_STORE:
-        SESSION_STORE[session_id]["biomarkers"].update(
-            {k: v for k, v in metrics.items() if v is not None}
-        )
+        _merge_biomarkers(SESSION_STORE[session_id], _scalar_metrics(metrics))
 
-    return _sanitise(metrics)
+
+"""
+Voice streaming protocol
+────────────────────────
+  1. Client opens WS /api/v1/voice/stream and sends a JSON text message:
+       {"session_id": "...", "sample_rate": 48000, "format": "s16le", "channels": 1}
+     format is "s16le" (default) or "f32le"; session_id is optional.
+  2. Server replies {"status": "ready"}.
+  3. Client sends raw PCM as binary messages while the user speaks; each is
+     answered with {"status": "live", "duration_sec", "f0_hz", "pause_ratio", "mpt_sec"}.
+  4. Client sends {"event": "end"}; server replies
+       {"status": "voice_complete", "metrics": {...}, "finalize_ms": ...}
+     (metrics as POST /api/v1/voice/analyze) and closes.
+"""
+
+@app.websocket("/api/v1/voice/stream")
+async def voice_stream(websocket: WebSocket):
+    await websocket.accept()
+    try:
+        raw  = await asyncio.wait_for(websocket.receive_text(), timeout=10.0)
+        init = json.loads(raw)
+        session_id = init.get("session_id")
+        try:
+            analyzer = StreamingVoiceAnalyzer(
+                int(init.get("sample_rate", 0)),
+                init.get("format", "s16le"),
+                int(init.get("channels", 1)),
+            )
+        except (TypeError, ValueError) as e:
+            await websocket.send_json({"status": "error", "detail": str(e)})
+            return
+        await websocket.send_json({"status": "ready", "session_id": session_id})
+
+        while True:
+            msg = await asyncio.wait_for(websocket.receive(), timeout=MAX_SESSION_DURATION)
+            if msg["type"] == "websocket.disconnect":
+                return
+            if msg.get("bytes") is not None:
+                live = analyzer.push(msg["bytes"])
+                await websocket.send_json(_sanitise({"status": "live", **live}))
+                continue
+            if json.loads(msg.get("text") or "{}").get("event") != "end":
+                continue
+
+            t0 = time.perf_counter()
+            metrics = analyzer.finish()
+            finalize_ms = (time.perf_counter() - t0) * 1000.0
+            if "error" in metrics:
+                await websocket.send_json({"status": "error", "detail": metrics["error"]})
+                return
+            _merge_voice_metrics(session_id, metrics)
+            await websocket.send_json(_sanitise({
+                "status":      "voice_complete",
+                "session_id":  session_id,
+                "metrics":     metrics,
+                "finalize_ms": finalize_ms,
+            }))
+            return
+
+    except (WebSocketDisconnect, asyncio.TimeoutError):
+        pass
+    except Exception as e:
+        try:
+            await websocket.send_json({"status": "error", "detail": str(e)})
+        except Exception:
+            pass
+    finally:
+        try:
+            await websocket.close()
+        except Exception:
+            pass
 
 
 # ─────────────────────────────────────────────
@@ -479,28 +906,34 @@ async def voice_analyze(
 # ─────────────────────────────────────────────
 
 @app.get("/api/v1/session/{session_id}/results")
-async def get_session_results(session_id: str):
+async def get_session_results(session_id: str, request: Request):
     """
     Retrieve the final session report (biomarkers + risk signals).
     Available after the WebSocket closes with "test_complete".
+    Carries an ETag; If-None-Match with the current one answers 304.
     """
     session = SESSION_STORE.get(session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
+    etag = _etag(session, "final" if "final_results" in session else "live")
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
+
     if "final_results" in session:
-        return session["final_results"]
+        content = _memo(session, "final_results", lambda: _sanitise(session["final_results"]))
+        return JSONResponse(content, headers={"ETag": etag})
 
     # Session still running – return current snapshot
-    biomarkers = session["biomarkers"].copy()
-    risk       = stratify_risk(biomarkers)
-    return _sanitise({
+    content = _memo(session, "results", lambda: _sanitise({
         "session_id":      session_id,
         "status":          "in_progress",
         "frames_processed": session["frame_count"],
-        "biomarkers":      biomarkers,
-        "risk_report":     risk,
-    })
+        "biomarkers":      session["biomarkers"].copy(),
+        "risk_report":     _live_risk(session),
+    }))
+    return JSONResponse(content, headers={"ETag": etag})
 
 
 @app.post("/api/v1/session/{session_id}/risk")
@@ -508,20 +941,15 @@ async def refresh_risk(session_id: str):
     """
     Trigger a fresh risk stratification using current biomarkers.
     Useful after voice analysis is merged into a face session.
+    Recomputed only when the biomarker version changed since the last call.
     """
     session = SESSION_STORE.get(session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    biomarkers = session["biomarkers"].copy()
-
-    if session.get("face_analyzer"):
-        biomarkers.update(session["face_analyzer"].get_final_summary())
-    if session.get("body_analyzer"):
-        biomarkers.update(session["body_analyzer"].get_final_summary())
-
-    risk = stratify_risk(biomarkers)
-    return _sanitise({"session_id": session_id, "risk_report": risk})
+    _, risk = _final_biomarkers(session)
+    return JSONResponse(_sanitise({"session_id": session_id, "risk_report": risk}),
+                        headers={"ETag": _etag(session, "risk")})
 
 
 # ─────────────────────────────────────────────
@@ -529,29 +957,33 @@ async def refresh_risk(session_id: str):
 # ─────────────────────────────────────────────
 
 @app.get("/api/v1/session/{session_id}/ai-summary")
-async def ai_summary(session_id: str):
+async def ai_summary(session_id: str, request: Request):
     """
     Returns a structured payload for the frontend's AI summary panel.
     The frontend calls the Anthropic API directly (client-side) using this
     structured data as context.  The backend does NOT call the AI.
+    The ETag covers the biomarker version and the stored profile.
     """
     session = SESSION_STORE.get(session_id)
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    biomarkers = session.get("biomarkers", {})
-    risk       = stratify_risk(biomarkers)
     profile    = {}
     if session.get("face_id"):
         profile = get_identity_manager().get_profile(session["face_id"]) or {}
+    profile_tag = hashlib.sha1(json.dumps(profile, sort_keys=True, default=str).encode()).hexdigest()[:12]
+    etag = _etag(session, "summary", "-" + profile_tag)
+    cached = _not_modified(request, etag)
+    if cached is not None:
+        return cached
 
-    return _sanitise({
+    return JSONResponse(_sanitise({
         "session_id":  session_id,
         "profile":     profile,
-        "biomarkers":  biomarkers,
-        "risk_report": risk,
+        "biomarkers":  session.get("biomarkers", {}),
+        "risk_report": _live_risk(session),
         "summary_schema_version": "2.0",
-    })
+    }), headers={"ETag": etag})
 
 
 # ─────────────────────────────────────────────
@@ -565,6 +997,10 @@ async def health():
         "version":      "2.0.0",
         "active_sessions": len(SESSION_STORE),
         "timestamp":    time.time(),
+        "runtime":      get_runtime_monitor().snapshot(),
+        "voice_jobs":   get_voice_jobs().stats(),
+        "voice_cache":  get_voice_cache().stats(),
+        "identity_store": get_identity_manager().stats(),
     }
 
 
@@ -0,0 +1,145 @@
+"""
+resampler.py
+Timestamp-driven uniform resampling shared by all time-series analyzers.
+
+Browser frame delivery is jittery, so per-frame samples arrive on an irregular
+clock. Every analyzer maps its (timestamp_ms, value) samples onto one fixed
+analysis-rate grid: filter designs are cached once for that rate and the DSP
+downstream always sees predictable array sizes.
+"""
+
+from __future__ import annotations
+
+import collections
+import functools
+from typing import Optional, Tuple, Union
+
+import numpy as np
+from scipy import signal as sp_signal
+
+# ── Constants ──────────────────────────────────────────────────────────────
+ANALYSIS_RATE_HZ = 30.0     # shared uniform grid for all per-frame DSP
+NOMINAL_FPS      = 30.0     # used to stamp samples that arrive without a timestamp
+
+
+# ── Cached filter designs ─────────────────────────────────────────────────
+
+@functools.lru_cache(maxsize=64)
+def butter_ba(order: int, wn: Union[float, Tuple[float, float]],
+              btype: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Butterworth (b, a) for a normalised cutoff; designed once per grid rate."""
+    return sp_signal.butter(order, wn, btype=btype)
+
+
+def _measured_rate(ts: np.ndarray, default: float) -> float:
+    """Median-interval input rate (Hz) from timestamps in ms."""
+    if len(ts) < 2:
+        return default
+    dt = float(np.median(np.diff(ts))) / 1000.0
+    return float(np.clip(1.0 / dt, 1.0, 240.0)) if dt > 0 else default
+
+
+# ── Windowed resampler ────────────────────────────────────────────────────
+
+class UniformResampler:
+    """
+    Sliding window of irregular multi-channel samples, resampled on demand.
+    resample() returns the most recent `window_sec` on a uniform grid at
+    `rate_hz` ending at the newest sample — a fixed length once the window fills.
+    """
+
+    def __init__(self, channels: int, rate_hz: float = ANALYSIS_RATE_HZ,
+                 window_sec: float = 10.0, nominal_hz: float = NOMINAL_FPS):
+        self.rate_hz    = rate_hz
+        self.window_sec = window_sec
+        self._nominal   = nominal_hz
+        # Pruned by time in push(); maxlen is only a guard against bad stamps
+        cap = int(window_sec * 240) + 2
+        self._ts:   collections.deque = collections.deque(maxlen=cap)
+        self._vals: collections.deque = collections.deque(maxlen=cap)
+        self._channels  = channels
+
+    def push(self, timestamp_ms: Optional[float], *values: float) -> bool:
+        """Append one sample; missing stamps are synthesised, stale ones dropped."""
+        last = self._ts[-1] if self._ts else None
+        if not timestamp_ms or timestamp_ms <= 0:
+            timestamp_ms = (last + 1000.0 / self._nominal) if last is not None else 1.0
+        elif last is not None and timestamp_ms <= last:
+            return False
+        self._ts.append(float(timestamp_ms))
+        self._vals.append(values)
+        # Keep one sample beyond the window so the grid start is interpolated
+        horizon = timestamp_ms - self.window_sec * 1000.0
+        while len(self._ts) > 2 and self._ts[1] <= horizon:
+            self._ts.popleft(); self._vals.popleft()
+        return True
+
+    def __len__(self) -> int:
+        return len(self._ts)
+
+    @property
+    def span_sec(self) -> float:
+        return (self._ts[-1] - self._ts[0]) / 1000.0 if len(self._ts) >= 2 else 0.0
+
+    @property
+    def input_rate_hz(self) -> float:
+        return _measured_rate(np.fromiter(self._ts, float), self._nominal)
+
+    def resample(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(grid timestamps in ms, values with shape (channels, n))."""
+        if not self._ts:
+            return np.empty(0), np.empty((self._channels, 0))
+        ts   = np.fromiter(self._ts, float)
+        vals = np.asarray(self._vals, dtype=float).T
+        span = min(self.span_sec, self.window_sec)
+        n    = int(span * self.rate_hz) + 1
+        grid = ts[-1] - (np.arange(n)[::-1] * 1000.0 / self.rate_hz)
+        return grid, np.vstack([np.interp(grid, ts, ch) for ch in vals])
+
+    def clear(self):
+        self._ts.clear(); self._vals.clear()
+
+
+# ── Streaming resampler ───────────────────────────────────────────────────
+
+class StreamResampler:
+    """
+    Online single-channel resampler for per-sample state machines (e.g. blinks).
+    push() returns the grid values completed since the previous sample, so
+    frame-count thresholds keep their meaning at the fixed analysis rate.
+    """
+
+    def __init__(self, rate_hz: float = ANALYSIS_RATE_HZ,
+                 nominal_hz: float = NOMINAL_FPS):
+        self.rate_hz  = rate_hz
+        self._nominal = nominal_hz
+        self._t0: Optional[float]   = None
+        self._last_t: Optional[float] = None
+        self._last_v = 0.0
+        self._k = 0                   # next grid index
+
+    def push(self, timestamp_ms: Optional[float], value: float) -> np.ndarray:
+        if not timestamp_ms or timestamp_ms <= 0:
+            timestamp_ms = (self._last_t + 1000.0 / self._nominal
+                            if self._last_t is not None else 1.0)
+        if self._last_t is None:
+            self._t0, self._last_t, self._last_v = timestamp_ms, timestamp_ms, value
+            self._k = 1
+            return np.array([value])
+        if timestamp_ms <= self._last_t:
+            return np.empty(0)
+        step = 1000.0 / self.rate_hz
+        k_end = int((timestamp_ms - self._t0) / step) + 1
+        grid  = self._t0 + np.arange(self._k, k_end) * step
+        out   = np.interp(grid, [self._last_t, timestamp_ms], [self._last_v, value])
+        self._k = max(self._k, k_end)
+        self._last_t, self._last_v = timestamp_ms, value
+        return out
+
+    @property
+    def elapsed_sec(self) -> float:
+        return (self._last_t - self._t0) / 1000.0 if self._t0 is not None else 0.0
+
+    def reset(self):
+        self._t0 = self._last_t = None
+        self._last_v = 0.0; self._k = 0
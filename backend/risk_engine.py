@@ -0,0 +1,430 @@
+"""
+risk_engine.py
+Risk stratification compiled from the declarative model in risk_model.json.
+
+The model file declares the reference ranges, every domain's keys, weights
+and contributing biomarkers, the blink-rate rule and the floor rules
+(SpO2 < 90, tremor severity). RiskEngine compiles it once into per-position
+tuples and index arrays and offers two evaluators over the same compiled
+model:
+
+  evaluate(biomarkers)       one flat dict → stratify_risk() report (scalar, no numpy)
+  score(X, present, labels)  (N sessions × biomarkers) table → arrays, one pass;
+                             reports(rows) turns that back into report dicts
+
+get_risk_engine() re-reads RISK_MODEL_PATH when its mtime changes (checked
+at most every RISK_MODEL_CHECK_SEC), so edits apply without restarting
+workers. A file that fails to load or validate is reported and the previous
+model stays in service.
+
+For model version 1 the results are bit-identical to the original hand-written
+per-domain functions (kept as a reference in benchmarks/risk_legacy.py),
+including how that model behaves:
+
+  • keys absent from refs (stride_length_cm, pause_ratio, blink_rate_per_min)
+    never count as available; they only add a "<key>_missing" flag
+  • with "non_ref": "half", keys absent from refs score clip(v, 0, 1) / 2
+    whenever not None (psychometric)
+  • with the blink key present, a domain's "blink_variant" applies: a fixed
+    blink term leads, and the variant's weights pair with the first
+    len(weights) availability entries, so the blink term takes the first
+    weight in the denominator and the last key's weight is never counted
+    (documented in risk_model.json's description)
+  • NaN is missing for ref keys but present wherever the legacy code tests
+    `is not None` (data completeness, the blink branch, "half" keys)
+  • every sum runs left to right in the legacy order, so floats match
+
+  RISK_MODEL_PATH        model file            (default: risk_model.json next to this module)
+  RISK_MODEL_CHECK_SEC   mtime check interval  (default 2.0)
+
+benchmarks/risk_engine.py checks the equivalence and times every path.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RISK_MODEL_PATH      = Path(os.getenv("RISK_MODEL_PATH", str(Path(__file__).with_name("risk_model.json"))))
+RISK_MODEL_CHECK_SEC = float(os.getenv("RISK_MODEL_CHECK_SEC", "2.0"))
+
+# Position kinds inside a domain
+KIND_REF, KIND_HALF, KIND_NONE, KIND_BLINK = range(4)
+
+LEVELS = ("unknown", "low", "moderate", "high")            # risk_level codes
+FLOOR_TESTS = ("below", "equals")
+
+
+def load_model(path: Path = RISK_MODEL_PATH) -> Dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def _clip(x: float, lo: float, hi: float) -> float:
+    """float(np.clip(x, lo, hi)) for a Python float, NaN included."""
+    return min(max(x, lo), hi)
+
+
+class _Variant:
+    """One domain layout compiled to per-position arrays and tuples."""
+
+    def __init__(self, positions: List[Tuple], den_w: Sequence[float]):
+        self.col     = np.array([p[1] for p in positions], dtype=np.int64)
+        self.kind    = np.array([p[2] for p in positions], dtype=np.int64)
+        self.score_w = np.array([p[3] for p in positions], dtype=np.float64)
+        # weights zip with availability: positions past len(den_w) add no weight
+        den = list(den_w[: len(positions)]) + [None] * max(len(positions) - len(den_w), 0)
+        self.den_w   = np.array([0.0 if d is None else d for d in den])
+        self.flags   = [p[4] for p in positions]
+        # scalar path: (key, kind, weight, denominator weight or None, flag, ref index)
+        self.steps   = [(p[0], p[2], p[3], d, p[4], p[5]) for p, d in zip(positions, den)]
+
+
+class RiskEngine:
+    def __init__(self, model: Dict):
+        self.model   = model
+        self.version = model.get("version")
+        self.tag     = hashlib.sha1(json.dumps(model, sort_keys=True).encode()).hexdigest()[:12]
+
+        refs = model["refs"]
+        self.refs = refs
+        ref_keys  = list(refs)
+        blink     = model["blink"]
+        self.blink_key   = blink["key"]
+        self.blink_range = (blink["min"], blink["max"])
+        self.blink_score = blink["score"] * blink["weight"]
+
+        self.domains = model["domains"]
+        extra = sorted({k for d in self.domains
+                        for k in d["keys"] + d.get("blink_variant", {}).get("keys", [])
+                        if k not in refs} | {self.blink_key})
+        self.columns = ref_keys + extra
+        self._col    = {k: i for i, k in enumerate(self.columns)}
+        self._n_ref  = len(ref_keys)
+
+        lo  = np.array([refs[k]["min"] for k in ref_keys], dtype=np.float64)
+        hi  = np.array([refs[k]["max"] for k in ref_keys], dtype=np.float64)
+        self._lo, self._hi = lo, hi
+        self._lower_bad = np.array([refs[k]["lower_is_worse"] for k in ref_keys], dtype=bool)
+        self._upper_bad = np.array([refs[k]["higher_is_worse"] for k in ref_keys], dtype=bool)
+        self._lo_den = np.maximum(lo - (lo - lo * 0.5), 1e-6)   # same float ops as the legacy scorer
+        self._hi_den = np.maximum(hi * 1.5 - hi, 1e-6)
+        # scalar path: (lo, lo denominator, hi, hi denominator, lower bad, upper bad) per ref
+        self._ref_steps = [(refs[k]["min"], max(refs[k]["min"] - (refs[k]["min"] - refs[k]["min"] * 0.5), 1e-6),
+                            refs[k]["max"], max(refs[k]["max"] * 1.5 - refs[k]["max"], 1e-6),
+                            refs[k]["lower_is_worse"], refs[k]["higher_is_worse"]) for k in ref_keys]
+
+        self.critical = list(model["critical_keys"])
+        self._critical = np.array([self._col[k] for k in self.critical])
+        self.labels   = sorted({f["key"] for d in self.domains for f in d.get("floors", ())
+                                if f["test"] == "equals"})
+        for d in self.domains:
+            for f in d.get("floors", ()):
+                if f["test"] not in FLOOR_TESTS:
+                    raise ValueError(f"{d['domain']}: unknown floor test {f['test']!r}")
+                if f["test"] == "below" and f["key"] not in self._col:
+                    self._add_column(f["key"])
+
+        self._plain   = [self._compile(d, d["keys"], d["weights"]) for d in self.domains]
+        self._blinked = [self._compile(d, d["blink_variant"]["keys"], d["blink_variant"]["weights"],
+                                       lead_blink=True) if "blink_variant" in d else None
+                         for d in self.domains]
+        # uncertainty flag per "missing" column: plain layout, then the blink layout
+        self.flag_names = [[f for v in (p, b) if v is not None for f in v.flags]
+                           for p, b in zip(self._plain, self._blinked)]
+
+    def _add_column(self, key: str):
+        self._col[key] = len(self.columns)
+        self.columns.append(key)
+
+    def _compile(self, d: Dict, keys: List[str], weights: List[float],
+                 lead_blink: bool = False) -> _Variant:
+        if len(keys) != len(weights):
+            raise ValueError(f"{d['domain']}: {len(keys)} keys but {len(weights)} weights")
+        positions = []
+        if lead_blink:
+            positions.append((self.blink_key, self._col[self.blink_key], KIND_BLINK, 1.0, "", -1))
+        for k, w in zip(keys, weights):
+            if k in self.refs:
+                kind = KIND_REF
+            else:
+                kind = KIND_HALF if d.get("non_ref") == "half" else KIND_NONE
+            positions.append((k, self._col[k], kind, w, f"{k}_missing",
+                              self._col[k] if kind == KIND_REF else -1))
+        return _Variant(positions, weights)
+
+    # ── One report (scalar) ────────────────────────────────────────────────
+
+    def evaluate(self, biomarkers: Dict) -> Dict:
+        """stratify_risk() report for one flat biomarker dict."""
+        get      = biomarkers.get
+        signals  = []
+        probs    = []
+        has_blink = get(self.blink_key) is not None
+        for d, plain, blinked in zip(self.domains, self._plain, self._blinked):
+            var = blinked if blinked is not None and has_blink else plain
+            num = den = 0.0
+            cnt, flags = 0, []
+            for key, kind, w, dw, flag, ref in var.steps:
+                if kind == KIND_REF:
+                    v = get(key)
+                    if v is None or math.isnan(v):
+                        s, ok = 0.0, False
+                    else:
+                        lo, lo_den, hi, hi_den, lower_bad, upper_bad = self._ref_steps[ref]
+                        s = 0.0
+                        if lower_bad and v < lo:
+                            s = max(s, (lo - v) / lo_den)
+                        if upper_bad and v > hi:
+                            s = max(s, (v - hi) / hi_den)
+                        s, ok = float(_clip(s, 0.0, 1.0)), True
+                    s *= w
+                elif kind == KIND_HALF:
+                    v  = get(key)
+                    ok = v is not None
+                    s  = (float(_clip(v, 0, 1)) * 0.5 if ok else 0.0) * w
+                elif kind == KIND_BLINK:
+                    br = get(key)
+                    s  = self.blink_score if (br < self.blink_range[0] or br > self.blink_range[1]) else 0.0
+                    ok = True
+                else:
+                    s, ok = 0.0 * w, False
+                num += s
+                if ok:
+                    cnt += 1
+                    if dw is not None:
+                        den += dw
+                elif kind != KIND_BLINK:
+                    flags.append(flag)
+
+            if cnt == 0:
+                signals.append({
+                    "domain": d["domain"], "label": d["label"], "risk_level": "unknown",
+                    "probability": 0.0, "confidence_score": 0.0,
+                    "uncertainty_flags": flags + ["insufficient_data"],
+                    "contributing_biomarkers": [],
+                })
+                continue
+
+            completeness = cnt / len(var.steps)
+            raw = num / max(den, 1e-6)
+            for f in d.get("floors", ()):
+                v = get(f["key"])
+                if f["test"] == "equals":
+                    hit = v == f["value"]
+                else:
+                    hit = v is not None and v < f["value"]
+                if hit:
+                    raw = max(raw, f["floor"])
+                    if f["flag"]:
+                        flags.append(f["flag"])
+
+            prob = float(_clip(raw, 0.0, 1.0))
+            probs.append(prob)
+            signals.append({
+                "domain":                  d["domain"],
+                "label":                   d["label"],
+                "risk_level":              "low" if raw < 0.30 else "moderate" if raw < 0.60 else "high",
+                "probability":             prob,
+                "confidence_score":        float(_clip(completeness * (1.0 - raw * 0.1), 0.0, 1.0)),
+                "uncertainty_flags":       flags,
+                "contributing_biomarkers": list(d["contributing"]),
+            })
+
+        completeness = sum(1 for k in self.critical if get(k) is not None) / len(self.critical)
+        if probs:
+            acc = 0.0
+            for p in probs:
+                acc += p
+            base     = (1.0 - acc / len(probs)) * 100.0
+            wellness = float(_clip(base * (0.5 + 0.5 * completeness), 0.0, 100.0))
+        else:
+            wellness = 50.0
+        return {
+            "signals":                signals,
+            "overall_wellness_score": wellness,
+            "data_completeness_pct":  completeness * 100.0,
+        }
+
+    # ── Input table ────────────────────────────────────────────────────────
+
+    def table(self, rows: Sequence[Dict]) -> Tuple[np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """(X float64 with NaN for missing, present = value is not None, categorical label columns)."""
+        n, c = len(rows), len(self.columns)
+        X       = np.full((n, c), np.nan)
+        present = np.zeros((n, c), dtype=bool)
+        labels  = {k: np.empty(n, dtype=object) for k in self.labels}
+        for i, row in enumerate(rows):
+            for j, k in enumerate(self.columns):
+                v = row.get(k)
+                if v is not None:
+                    X[i, j] = v
+                    present[i, j] = True
+            for k, col in labels.items():
+                col[i] = row.get(k)
+        return X, present, labels
+
+    # ── Cohort scoring ─────────────────────────────────────────────────────
+
+    def score(self, X: np.ndarray, present: np.ndarray,
+              labels: Optional[Dict[str, np.ndarray]] = None) -> Dict[str, np.ndarray]:
+        """
+        Score every row. Returns (N, domains) arrays probability, confidence,
+        level (LEVELS codes) and known; (N,) wellness and completeness_pct;
+        and per domain an (N, flags) "missing" mask over flag_names[j] and an
+        (N, floors) "floor_hits" mask over that domain's floors.
+        """
+        n = len(X)
+        labels = labels or {}
+        with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+            v     = X[:, : self._n_ref]
+            avail = present[:, : self._n_ref] & ~np.isnan(v)
+            low   = np.where(self._lower_bad & (v < self._lo), (self._lo - v) / self._lo_den, 0.0)
+            up    = np.where(self._upper_bad & (v > self._hi), (v - self._hi) / self._hi_den, 0.0)
+            S     = np.where(avail, np.clip(np.maximum(np.maximum(0.0, low), up), 0.0, 1.0), 0.0)
+            half  = np.where(present, np.clip(X, 0.0, 1.0) * 0.5, 0.0)
+            br    = X[:, self._col[self.blink_key]]
+            blink = np.where((br < self.blink_range[0]) | (br > self.blink_range[1]), self.blink_score, 0.0)
+            gate  = present[:, self._col[self.blink_key]]
+
+            n_dom = len(self.domains)
+            out = {"probability": np.zeros((n, n_dom)), "confidence": np.zeros((n, n_dom)),
+                   "level": np.zeros((n, n_dom), dtype=np.int8), "known": np.zeros((n, n_dom), bool),
+                   "missing": [], "floor_hits": []}
+            for j, d in enumerate(self.domains):
+                raw, comp, known, missing = self._domain(self._plain[j], S, avail, half, present, blink)
+                if self._blinked[j] is not None:
+                    b_raw, b_comp, b_known, b_missing = self._domain(self._blinked[j], S, avail,
+                                                                     half, present, blink)
+                    raw, comp, known = (np.where(gate, x, y) for x, y in
+                                        ((b_raw, raw), (b_comp, comp), (b_known, known)))
+                    missing = np.concatenate([missing & ~gate[:, None], b_missing & gate[:, None]], axis=1)
+                raw, hits = self._floors(d, raw, X, present, labels)
+
+                level = np.where(raw < 0.3, 1, np.where(raw < 0.6, 2, 3))
+                out["level"][:, j]       = np.where(known, level, 0)
+                out["probability"][:, j] = np.where(known, np.clip(raw, 0.0, 1.0), 0.0)
+                out["confidence"][:, j]  = np.where(known, np.clip(comp * (1.0 - raw * 0.1), 0.0, 1.0), 0.0)
+                out["known"][:, j]       = known
+                out["missing"].append(missing)
+                out["floor_hits"].append(hits & known[:, None])
+
+            # Wellness: mean probability of the known domains, in domain order
+            acc, cnt = np.zeros(n), np.zeros(n, dtype=np.int64)
+            for j in range(n_dom):
+                acc = acc + np.where(out["known"][:, j], out["probability"][:, j], 0.0)
+                cnt += out["known"][:, j]
+            completeness = present[:, self._critical].sum(axis=1) / len(self.critical)
+            base = (1.0 - acc / cnt) * 100.0
+            out["wellness"] = np.where(cnt > 0, np.clip(base * (0.5 + 0.5 * completeness), 0.0, 100.0), 50.0)
+            out["completeness_pct"] = completeness * 100.0
+        return out
+
+    @staticmethod
+    def _domain(var: _Variant, S, avail, half, present, blink):
+        n   = len(S)
+        num = np.zeros(n); den = np.zeros(n); cnt = np.zeros(n, dtype=np.int64)
+        missing = np.zeros((n, len(var.kind)), dtype=bool)
+        for p, (c, kind, w, dw) in enumerate(zip(var.col, var.kind, var.score_w, var.den_w)):
+            if kind == KIND_REF:
+                s, a = S[:, c] * w, avail[:, c]
+            elif kind == KIND_HALF:
+                s, a = half[:, c] * w, present[:, c]
+            elif kind == KIND_BLINK:
+                s, a = blink, np.ones(n, dtype=bool)
+            else:
+                s, a = np.zeros(n), np.zeros(n, dtype=bool)
+            num = num + s
+            den = den + np.where(a, dw, 0.0)
+            cnt += a
+            missing[:, p] = ~a & (kind != KIND_BLINK)
+        raw = num / np.maximum(den, 1e-6)
+        return raw, cnt / len(var.kind), cnt > 0, missing
+
+    def _floors(self, d: Dict, raw, X, present, labels):
+        floors = d.get("floors", ())
+        hits   = np.zeros((len(raw), len(floors)), dtype=bool)
+        for i, f in enumerate(floors):
+            if f["test"] == "equals":
+                col = labels.get(f["key"])
+                hit = np.zeros(len(raw), dtype=bool) if col is None else (col == f["value"]).astype(bool)
+            else:
+                c   = self._col[f["key"]]
+                hit = present[:, c] & (X[:, c] < f["value"])
+            raw = np.where(hit & (f["floor"] > raw), f["floor"], raw)    # max(raw, floor)
+            hits[:, i] = hit
+        return raw, hits
+
+    def reports(self, rows: Sequence[Dict]) -> List[Dict]:
+        """Score `rows` as a table and return one stratify_risk() dict per row."""
+        sc  = self.score(*self.table(rows))
+        out = []
+        for i in range(len(rows)):
+            signals = []
+            for j, d in enumerate(self.domains):
+                flags = [f for f, m in zip(self.flag_names[j], sc["missing"][j][i]) if m]
+                if not sc["known"][i, j]:
+                    signals.append({
+                        "domain": d["domain"], "label": d["label"], "risk_level": "unknown",
+                        "probability": 0.0, "confidence_score": 0.0,
+                        "uncertainty_flags": flags + ["insufficient_data"],
+                        "contributing_biomarkers": [],
+                    })
+                    continue
+                flags += [f["flag"] for f, hit in zip(d.get("floors", ()), sc["floor_hits"][j][i])
+                          if hit and f["flag"]]
+                signals.append({
+                    "domain":                  d["domain"],
+                    "label":                   d["label"],
+                    "risk_level":              LEVELS[sc["level"][i, j]],
+                    "probability":             float(sc["probability"][i, j]),
+                    "confidence_score":        float(sc["confidence"][i, j]),
+                    "uncertainty_flags":       flags,
+                    "contributing_biomarkers": list(d["contributing"]),
+                })
+            out.append({
+                "signals":                signals,
+                "overall_wellness_score": float(sc["wellness"][i]),
+                "data_completeness_pct":  float(sc["completeness_pct"][i]),
+            })
+        return out
+
+
+# ── Hot-reloaded singleton ─────────────────────────────────────────────────
+
+_engine:  Optional[RiskEngine] = None
+_mtime:   Optional[int] = None
+_checked = 0.0
+
+def get_risk_engine() -> RiskEngine:
+    """Compiled engine for RISK_MODEL_PATH; recompiled when the file's mtime changes."""
+    global _engine, _mtime, _checked
+    now = time.monotonic()
+    if _engine is not None and now - _checked < RISK_MODEL_CHECK_SEC:
+        return _engine
+    _checked = now
+    try:
+        mtime = RISK_MODEL_PATH.stat().st_mtime_ns
+    except OSError:
+        mtime = None
+    if _engine is None or mtime != _mtime:
+        _mtime = mtime                       # a broken file is not retried until it changes again
+        try:
+            _engine = RiskEngine(load_model(RISK_MODEL_PATH))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            if _engine is None:
+                raise
+            print(f"⚠️  risk model reload failed, keeping {_engine.tag}: {e}")
+    return _engine
+
+
+def stratify_risk_batch(rows: Sequence[Dict]) -> List[Dict]:
+    """stratify_risk() over many biomarker dicts at once."""
+    return get_risk_engine().reports(rows)
@@ -8,15 +8,17 @@ All heavy objects are created inside the class constructor (lazy, per-session).
 
 from __future__ import annotations
 
-import collections
 from typing import Dict, List, Optional, Tuple
 
 import cv2
 import numpy as np
 from scipy import signal as sp_signal
 
+from clock import WallClock
+from resampler import ANALYSIS_RATE_HZ, UniformResampler, butter_ba
+
 # ── Constants ──────────────────────────────────────────────────────────────
-BUFFER_SIZE = 300       # max frames (~10 s at 30 fps) — enforced by deque maxlen
+BUFFER_SIZE = 300       # max frames (~10 s at 30 fps) — sets the resampler window
 MIN_FRAMES  = 90        # need ~3 s before first HR estimate
 FPS_DEFAULT = 30.0
 
@@ -45,7 +47,7 @@ def _bandpass(data: np.ndarray, low: float, high: float,
     hi  = min(high / nyq, 1.0 - 1e-4)
     if lo >= hi or len(data) < order * 3:
         return data
-    b, a = sp_signal.butter(order, [lo, hi], btype="band")
+    b, a = butter_ba(order, (lo, hi), "band")
     return sp_signal.filtfilt(b, a, data)
 
 
@@ -157,15 +159,16 @@ def compute_skin_texture(frame: np.ndarray, landmarks) -> Dict:
 class rPPGExtractor:
     """
     Stateful per-session rPPG processor.
-    BUFFER_SIZE deques automatically drop oldest frames — no memory leak.
+    ROI means go through a sliding-window resampler (BUFFER_SIZE frames worth
+    of time) and all filtering runs on the fixed ANALYSIS_RATE_HZ grid.
     """
 
-    def __init__(self, buffer_size: int = BUFFER_SIZE, fps: float = FPS_DEFAULT):
-        self.fps         = fps
-        self._buf_r: collections.deque = collections.deque(maxlen=buffer_size)
-        self._buf_g: collections.deque = collections.deque(maxlen=buffer_size)
-        self._buf_b: collections.deque = collections.deque(maxlen=buffer_size)
-        self._buf_ts: collections.deque = collections.deque(maxlen=buffer_size)
+    def __init__(self, buffer_size: int = BUFFER_SIZE, fps: float = FPS_DEFAULT,
+                 clock=None):
+        self.fps         = ANALYSIS_RATE_HZ
+        self._clock      = clock or WallClock()
+        self._rgb = UniformResampler(3, rate_hz=ANALYSIS_RATE_HZ,
+                                     window_sec=buffer_size / fps, nominal_hz=fps)
         self._frame_n   = 0
         self._update_every = 15         # recompute every N frames
         # Cached results
@@ -181,16 +184,17 @@ class rPPGExtractor:
                       timestamp_ms: float = 0.0) -> Dict:
         h, w = frame.shape[:2]
         self._frame_n += 1
+        timestamp_ms = self._clock.stamp_ms(timestamp_ms)
 
         roi = compute_forehead_roi(landmarks, h, w)
         if roi:
             x1, y1, x2, y2 = roi
             patch = frame[y1:y2, x1:x2]
             if patch.size > 0:
-                self._buf_b.append(float(np.mean(patch[:, :, 0])))
-                self._buf_g.append(float(np.mean(patch[:, :, 1])))
-                self._buf_r.append(float(np.mean(patch[:, :, 2])))
-                self._buf_ts.append(timestamp_ms)
+                self._rgb.push(timestamp_ms,
+                               float(np.mean(patch[:, :, 2])),
+                               float(np.mean(patch[:, :, 1])),
+                               float(np.mean(patch[:, :, 0])))
 
         if self._frame_n % self._update_every == 0:
             self._recompute()
@@ -198,20 +202,11 @@ class rPPGExtractor:
         return self._snapshot()
 
     def _recompute(self):
-        n = len(self._buf_g)
-        if n < MIN_FRAMES:
+        if len(self._rgb) < MIN_FRAMES:
             return
 
-        g  = np.array(self._buf_g)
-        r  = np.array(self._buf_r)
-        b  = np.array(self._buf_b)
-
-        # Refine fps from timestamps
-        if len(self._buf_ts) >= 2:
-            ts  = np.array(self._buf_ts)
-            dt  = np.median(np.diff(ts)) / 1000.0
-            if dt > 0:
-                self.fps = float(np.clip(1.0 / dt, 5.0, 60.0))
+        # Uniform grid at the analysis rate, whatever the frame jitter
+        _, (r, g, b) = self._rgb.resample()
 
         # CHROM rPPG — more robust to illumination than raw green channel
         raw = sp_signal.detrend(3.0 * r - 2.0 * g)
@@ -252,8 +247,7 @@ class rPPGExtractor:
         }
 
     def reset(self):
-        self._buf_r.clear(); self._buf_g.clear()
-        self._buf_b.clear(); self._buf_ts.clear()
+        self._rgb.clear()
         self._frame_n = 0; self._filtered = []
         self._hr = self._sdnn = self._rmssd = self._rr = self._spo2 = None
         self._quality = 0.0
@@ -0,0 +1,85 @@
+"""
+runtime_monitor.py
+Event-loop health and process resource counters, reported by /health.
+
+A background task sleeps for a fixed interval and measures how late it wakes
+up: that overshoot is time the loop spent blocked in synchronous work (frame
+decoding, MediaPipe, librosa). Overshoots above STALL_MS count as stalls.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import os
+import resource
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+PROBE_INTERVAL_SEC = 0.1
+STALL_MS           = 100.0
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size; falls back to the peak where /proc is absent."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024.0 if peak else None       # KiB on Linux
+
+
+class EventLoopMonitor:
+    def __init__(self, interval: float = PROBE_INTERVAL_SEC):
+        self.interval = interval
+        self._lags: collections.deque = collections.deque(maxlen=600)   # ≈60 s
+        self._max_lag = 0.0
+        self._stalls  = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            t = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max((time.perf_counter() - t - self.interval) * 1000.0, 0.0)
+            self._lags.append(lag)
+            self._max_lag = max(self._max_lag, lag)
+            if lag >= STALL_MS:
+                self._stalls += 1
+
+    def snapshot(self) -> Dict:
+        lags = np.fromiter(self._lags, float) if self._lags else np.zeros(1)
+        return {
+            "loop_lag_ms_p50":  float(np.percentile(lags, 50)),
+            "loop_lag_ms_p99":  float(np.percentile(lags, 99)),
+            "loop_lag_ms_max":  self._max_lag,
+            "loop_stalls":      self._stalls,
+            "cpu_sec":          time.process_time(),
+            "rss_mb":           _rss_mb(),
+            "pid":              os.getpid(),
+        }
+
+
+_monitor: Optional[EventLoopMonitor] = None
+
+def get_runtime_monitor() -> EventLoopMonitor:
+    global _monitor
+    if _monitor is None:
+        _monitor = EventLoopMonitor()
+    return _monitor
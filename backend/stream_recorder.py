@@ -0,0 +1,164 @@
+"""
+stream_recorder.py
+Capture of /api/v1/analyze-stream sessions into a compact on-disk container.
+
+Enable with STREAM_RECORD_DIR. Each WebSocket connection is written to its own
+`.nvrec` file, which tools/replay.py can play back against a new build.
+
+Container layout
+────────────────
+  MAGIC  b"NVREC1\\n"
+  record := kind:1B  meta_len:u32  blob_len:u32  meta(JSON utf-8)  blob
+    kind b"I"  inbound message  — meta = payload without frame_b64 (+ recv_ms),
+                                  blob = raw JPEG/PNG bytes (base64-decoded)
+    kind b"O"  outbound message — meta = reply JSON (+ proc_ms), blob empty
+
+Frames are stored as decoded image bytes (25 % smaller than base64); the JSON
+metadata is tiny, so the container is about the size of the raw frames.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import os
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+MAGIC   = b"NVREC1\n"
+_HEADER = struct.Struct("<cII")
+
+STREAM_RECORD_DIR = os.getenv("STREAM_RECORD_DIR", "")
+
+
+# ─────────────────────────────────────────────
+#  Writer
+# ─────────────────────────────────────────────
+
+class StreamRecorder:
+    """Append-only writer for one session recording."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._f: Optional[BinaryIO] = open(self.path, "wb")
+        self._f.write(MAGIC)
+        self._t0 = time.perf_counter()
+
+    def _write(self, kind: bytes, meta: Dict, blob: bytes = b""):
+        if self._f is None:
+            return
+        m = json.dumps(meta, separators=(",", ":")).encode()
+        self._f.write(_HEADER.pack(kind, len(m), len(blob)))
+        self._f.write(m)
+        self._f.write(blob)
+
+    def record_inbound(self, payload: Dict):
+        meta = {k: v for k, v in payload.items() if k != "frame_b64"}
+        meta["recv_ms"] = (time.perf_counter() - self._t0) * 1000.0
+        frame_b64 = payload.get("frame_b64") or ""
+        if "," in frame_b64:
+            meta["frame_prefix"], frame_b64 = frame_b64.split(",", 1)
+        try:
+            blob = base64.b64decode(frame_b64)
+        except Exception:
+            blob, meta["frame_b64_invalid"] = b"", True
+        self._write(b"I", meta, blob)
+
+    def record_outbound(self, reply: Dict, proc_ms: Optional[float] = None):
+        meta = dict(reply)
+        if proc_ms is not None:
+            meta["proc_ms"] = proc_ms
+        self._write(b"O", meta)
+
+    def close(self):
+        if self._f is not None:
+            self._f.close()
+            self._f = None
+
+
+class RecordingWebSocket:
+    """
+    Transparent WebSocket proxy used by analyze_stream when recording.
+    Inbound text frames and outbound JSON replies are captured in order;
+    proc_ms is the server time from receiving a message to replying to it.
+    """
+
+    def __init__(self, websocket, recorder: StreamRecorder):
+        self._ws  = websocket
+        self._rec = recorder
+        self._recv_at: Optional[float] = None
+
+    async def receive_text(self) -> str:
+        raw = await self._ws.receive_text()
+        self._recv_at = time.perf_counter()
+        try:
+            self._rec.record_inbound(json.loads(raw))
+        except Exception:
+            pass
+        return raw
+
+    async def send_json(self, data, *args, **kwargs):
+        proc_ms = None
+        if self._recv_at is not None:
+            proc_ms = (time.perf_counter() - self._recv_at) * 1000.0
+            self._recv_at = None
+        try:
+            self._rec.record_outbound(data, proc_ms)
+        except Exception:
+            pass
+        await self._ws.send_json(data, *args, **kwargs)
+
+    async def close(self, *args, **kwargs):
+        self._rec.close()
+        await self._ws.close(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._ws, name)
+
+
+def open_session_recorder(directory: str = STREAM_RECORD_DIR) -> Optional[StreamRecorder]:
+    """New recorder in `directory`, or None when recording is disabled."""
+    if not directory:
+        return None
+    name = f"{int(time.time())}_{uuid.uuid4().hex[:8]}.nvrec"
+    return StreamRecorder(Path(directory) / name)
+
+
+# ─────────────────────────────────────────────
+#  Reader
+# ─────────────────────────────────────────────
+
+def iter_records(path: Path) -> Iterator[Tuple[bytes, Dict, bytes]]:
+    """Yield (kind, meta, blob); a truncated trailing record is ignored."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a stream recording")
+        while True:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                return
+            kind, mlen, blen = _HEADER.unpack(head)
+            meta, blob = f.read(mlen), f.read(blen)
+            if len(meta) < mlen or len(blob) < blen:
+                return
+            yield kind, json.loads(meta), blob
+
+
+def load_recording(path: Path) -> Tuple[List[Dict], List[Dict]]:
+    """
+    (inbound payloads with frame_b64 restored, outbound replies) in order.
+    """
+    inbound, outbound = [], []
+    for kind, meta, blob in iter_records(path):
+        if kind == b"I":
+            b64 = base64.b64encode(blob).decode()
+            prefix = meta.pop("frame_prefix", None)
+            meta["frame_b64"] = f"{prefix},{b64}" if prefix else b64
+            inbound.append(meta)
+        elif kind == b"O":
+            outbound.append(meta)
+    return inbound, outbound
@@ -0,0 +1,5 @@
+"""
+tools
+Operational command-line tools for the Neuro-Vitals backend.
+Run from backend/ with `python -m tools.<name> --help`.
+"""
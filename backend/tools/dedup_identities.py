@@ -0,0 +1,183 @@
+"""
+tools/dedup_identities.py
+Offline duplicate-identity merge for the identity store.
+
+match_or_create() enrols a new face_id whenever the best similarity misses
+MATCH_THRESHOLD, so the store collects several ids for one person. This job
+finds them and folds each group into one identity:
+
+  1. Similarity: the (N, D) unit rows are compared tile by tile
+     (--block × --block matrix products over the upper triangle), so peak
+     memory is one tile, not N².
+  2. Clustering: pairs ≥ --threshold are linked into connected components
+     (scipy.sparse.csgraph). Single linkage can chain strangers through
+     intermediates, so a member whose similarity to its cluster's centroid
+     is below the threshold is split back out as its own identity.
+  3. Merge: the member seen most often survives (ties → oldest). Its centroid
+     becomes the seen_count-weighted mean of the members. seen_count is
+     summed, created_at / last_seen take the min / max, and profiles are
+     overlaid oldest → most recently seen.
+  4. Remap: every merged-away id maps to its survivor. The table is written
+     to --remap (default <store>/remap-<generation>.json) and stored as
+     aliases in the store itself, so old face_ids keep resolving.
+
+The result is committed as a new store generation (identity_store.py), so a
+crash leaves the old one intact. Run it with the server stopped: a running
+server would compact its own in-memory copy over the result.
+
+Usage (from backend/)
+─────────────────────
+  python -m tools.dedup_identities --dry-run                  # report only
+  python -m tools.dedup_identities --store /tmp/neuro_vitals_ids.store --threshold 0.9
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
+
+from identity_manager import EMB_DIM, MATCH_THRESHOLD
+from identity_store import IDENTITY_STORE_DIR, IdentityStore
+
+DEFAULT_BLOCK = 4096            # rows per tile side → 64 MiB float32 tile
+
+
+def similar_pairs(emb: np.ndarray, threshold: float,
+                  block: int = DEFAULT_BLOCK) -> Tuple[np.ndarray, np.ndarray]:
+    """(i, j) with i < j and cosine ≥ threshold, from upper-triangle tiles."""
+    n = len(emb)
+    rows: List[np.ndarray] = []
+    cols: List[np.ndarray] = []
+    for i0 in range(0, n, block):
+        a = emb[i0 : i0 + block]
+        for j0 in range(i0, n, block):
+            tile = a @ emb[j0 : j0 + block].T
+            if j0 == i0:
+                tile = np.triu(tile, k=1)          # diagonal tile: each pair once, no self-pairs
+            i, j = np.nonzero(tile >= threshold)
+            rows.append(i + i0); cols.append(j + j0)
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(rows), np.concatenate(cols)
+
+
+def cluster(emb: np.ndarray, weights: np.ndarray, threshold: float,
+            block: int = DEFAULT_BLOCK) -> np.ndarray:
+    """Cluster label per row; members far from their cluster centroid get their own label."""
+    n    = len(emb)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64)
+    i, j = similar_pairs(emb, threshold, block)
+    graph = coo_matrix((np.ones(len(i), dtype=np.int8), (i, j)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    n_labels = int(labels.max(initial=-1)) + 1
+    cent = np.zeros((n_labels, emb.shape[1]))
+    np.add.at(cent, labels, emb * weights[:, None])
+    cent /= np.linalg.norm(cent, axis=1, keepdims=True) + 1e-9
+    sims  = np.einsum("ij,ij->i", emb, cent[labels])
+    sizes = np.bincount(labels)
+    loose = (sizes[labels] > 1) & (sims < threshold)
+    labels[loose] = n_labels + np.arange(int(loose.sum()))
+    return labels
+
+
+def merge(ids: List[str], emb: np.ndarray, records: Dict[str, Dict],
+          labels: np.ndarray) -> Tuple[List[str], np.ndarray, Dict[str, Dict], Dict[str, str]]:
+    """Fold each cluster into its survivor → (ids, unit rows, records, remap old → survivor)."""
+    order = np.argsort(labels, kind="stable")
+    cuts  = np.flatnonzero(np.diff(labels[order])) + 1
+    out_ids: List[str] = []
+    out_emb = np.empty((len(cuts) + 1 if len(ids) else 0, emb.shape[1]), dtype=np.float32)
+    out_rec: Dict[str, Dict] = {}
+    remap:   Dict[str, str]  = {}
+    for k, members in enumerate(np.split(order, cuts) if len(ids) else []):
+        recs = [records[ids[m]] for m in members]
+        seen = np.array([r.get("seen_count", 1) for r in recs], dtype=np.float64)
+        best = min(range(len(members)),
+                   key=lambda x: (-seen[x], recs[x].get("created_at", 0.0)))
+        fid  = ids[members[best]]
+        row  = (emb[members] * seen[:, None]).sum(axis=0)
+        out_emb[k] = row / (np.linalg.norm(row) + 1e-9)
+
+        profile: Dict = {}
+        for r in sorted(recs, key=lambda r: r.get("last_seen", 0.0)):
+            profile.update(r.get("profile", {}))
+        out_rec[fid] = {
+            "seen_count": int(seen.sum()),
+            "created_at": min(r.get("created_at", 0.0) for r in recs),
+            "last_seen":  max(r.get("last_seen", 0.0) for r in recs),
+            "profile":    profile,
+        }
+        out_ids.append(fid)
+        for m in members:
+            if ids[m] != fid:
+                remap[ids[m]] = fid
+    return out_ids, out_emb, out_rec, remap
+
+
+def dedup(store: IdentityStore, threshold: float, block: int = DEFAULT_BLOCK,
+          dry_run: bool = False, remap_path: Optional[Path] = None) -> Dict:
+    t = time.perf_counter()
+    ids, emb, records = store.load(EMB_DIM)
+    seen   = np.array([records[f].get("seen_count", 1) for f in ids], dtype=np.float64)
+    labels = cluster(emb, seen, threshold, block)
+    new_ids, new_emb, new_rec, remap = merge(ids, emb, records, labels)
+    sizes  = np.bincount(labels) if len(labels) else np.zeros(1, dtype=np.int64)
+    report = {
+        "identities_before": len(ids),
+        "identities_after":  len(new_ids),
+        "merged_away":       len(remap),
+        "clusters_merged":   int(np.sum(sizes > 1)),
+        "largest_cluster":   int(sizes.max()),
+        "threshold":         threshold,
+        "seconds":           round(time.perf_counter() - t, 2),
+        "dry_run":           dry_run,
+    }
+    if dry_run or not remap:
+        return report
+
+    # Re-point existing aliases whose target was merged away (no alias chains)
+    aliases = {old: remap.get(new, new) for old, new in store.aliases.items()}
+    aliases.update(remap)
+    store.aliases = aliases
+    store.compact(new_ids, new_emb, new_rec)
+    remap_path = remap_path or store.dir / f"remap-{store.generation}.json"
+    remap_path.write_text(json.dumps(remap, indent=1))
+    report["generation"] = store.generation
+    report["remap"]      = str(remap_path)
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--store", type=Path, default=IDENTITY_STORE_DIR, help="IDENTITY_STORE_DIR")
+    ap.add_argument("--threshold", type=float, default=MATCH_THRESHOLD)
+    ap.add_argument("--block", type=int, default=DEFAULT_BLOCK, help="tile side in rows")
+    ap.add_argument("--remap", type=Path, default=None, help="remap table output (JSON)")
+    ap.add_argument("--dry-run", action="store_true", help="report clusters, write nothing")
+    args = ap.parse_args(argv)
+
+    if not (args.store / "meta.json").exists():
+        print(f"no identity store at {args.store}", file=sys.stderr)
+        return 1
+    store = IdentityStore(args.store, legacy_path=None)
+    try:
+        report = dedup(store, args.threshold, args.block, args.dry_run, args.remap)
+    finally:
+        store.close()
+    print(json.dumps(report, indent=1))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
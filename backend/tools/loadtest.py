@@ -0,0 +1,316 @@
+"""
+tools/loadtest.py
+Concurrent WebSocket load generator for /api/v1/analyze-stream.
+
+Each simulated client calls POST /api/v1/identity/match (as the landing page
+does), then streams frames at a fixed rate over its own WebSocket. Frames are
+synthetic face-like images or the frames of a stream_recorder recording.
+Everything runs on localhost; by default a private uvicorn instance of
+main:app is started with a throwaway identity store.
+
+Usage (from backend/)
+─────────────────────
+  python -m tools.loadtest --sessions 8 --fps 30 --duration 20
+  python -m tools.loadtest --ramp 1,2,4,8,16           # find the saturation point
+  python -m tools.loadtest --url http://127.0.0.1:8000 --recording rec.nvrec
+
+Reported per run: reply-matched frame lag (send → live reply, p50/p95/p99),
+dropped frames (no reply before the drain timeout), server event-loop lag and
+stalls, and server CPU / RSS sampled from /health.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+MAX_LAG_P95_MS  = 250.0      # "sustainable" thresholds for --ramp
+MAX_DROPPED_PCT = 1.0
+
+
+# ─────────────────────────────────────────────
+#  Frame sources
+# ─────────────────────────────────────────────
+
+def synthetic_frames(n: int = 30, w: int = 640, h: int = 480, seed: int = 0) -> List[str]:
+    """Face-like test images (skin ellipse, eyes, mouth) with a moving offset + noise."""
+    import cv2
+    rng, out = np.random.default_rng(seed), []
+    for i in range(n):
+        img = np.full((h, w, 3), (60, 60, 70), np.uint8)
+        cx  = w // 2 + int(10 * np.sin(2 * np.pi * i / n))
+        cy  = h // 2
+        cv2.ellipse(img, (cx, cy), (110, 145), 0, 0, 360, (140, 170, 215), -1)
+        for dx in (-45, 45):
+            cv2.ellipse(img, (cx + dx, cy - 35), (22, 10), 0, 0, 360, (250, 250, 250), -1)
+            cv2.circle(img, (cx + dx, cy - 35), 7, (40, 30, 20), -1)
+        cv2.ellipse(img, (cx, cy + 70), (40, 12), 0, 0, 360, (90, 90, 170), -1)
+        img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+        ok, jpg = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, 80])
+        out.append("data:image/jpeg;base64," + base64.b64encode(jpg.tobytes()).decode())
+    return out
+
+
+def recorded_frames(path: Path) -> List[str]:
+    from stream_recorder import load_recording
+    inbound, _ = load_recording(path)
+    return [p["frame_b64"] for p in inbound if p.get("frame_b64")]
+
+
+# ─────────────────────────────────────────────
+#  Local server
+# ─────────────────────────────────────────────
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_local_server(workdir: str) -> subprocess.Popen:
+    port = _free_port()
+    env  = {**os.environ,
+            "IDENTITY_STORE_PATH": str(Path(workdir) / "ids.json"),
+            "IDENTITY_STORE_DIR":  str(Path(workdir) / "ids.store"),
+            "STREAM_RECORD_DIR":   ""}
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app",
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=Path(__file__).resolve().parent.parent, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    proc.base_url = f"http://127.0.0.1:{port}"
+    return proc
+
+
+async def wait_healthy(base_url: str, timeout: float = 60.0):
+    import httpx
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(f"{base_url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"server at {base_url} did not become healthy")
+
+
+# ─────────────────────────────────────────────
+#  Simulated client
+# ─────────────────────────────────────────────
+
+async def run_client(idx: int, base_url: str, frames: List[str], fps: float,
+                     duration: float, modules: List[str], drain: float) -> Dict:
+    import httpx
+    import websockets
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        r = await client.post(f"{base_url}/api/v1/identity/match",
+                              json={"frame_b64": frames[idx % len(frames)]})
+        r.raise_for_status()
+        session_id = r.json()["session_id"]
+
+    ws_url  = base_url.replace("http", "ws", 1) + "/api/v1/analyze-stream"
+    n_total = int(duration * fps)
+    sent: Dict[int, float] = {}
+    lags: List[float] = []
+    decode_failed = 0
+
+    async with websockets.connect(ws_url, max_size=None) as ws:
+        t0 = time.perf_counter()
+
+        async def sender():
+            for i in range(n_total):
+                delay = t0 + i / fps - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                sent[i] = time.perf_counter()
+                await ws.send(json.dumps({
+                    "frame_b64":    frames[(idx + i) % len(frames)],
+                    "frame_index":  i,
+                    "timestamp_ms": time.time() * 1000.0,
+                    "module":       modules[i % len(modules)],
+                    "modules":      modules,
+                    "session_id":   session_id,
+                }))
+
+        async def receiver():
+            nonlocal decode_failed
+            while len(lags) + decode_failed < n_total:
+                msg = json.loads(await ws.recv())
+                if msg.get("status") != "processing":
+                    return
+                i = msg.get("frame_index")
+                if i in sent:
+                    lags.append((time.perf_counter() - sent.pop(i)) * 1000.0)
+                if msg.get("warning") == "frame_decode_failed":
+                    decode_failed += 1
+
+        sending   = asyncio.create_task(sender())
+        receiving = asyncio.create_task(receiver())
+        await sending
+        try:
+            await asyncio.wait_for(receiving, timeout=drain)
+        except asyncio.TimeoutError:
+            pass
+        elapsed = time.perf_counter() - t0
+
+    return {"sent": n_total, "replied": len(lags), "decode_failed": decode_failed,
+            "lags": lags, "reply_fps": len(lags) / elapsed if elapsed > 0 else 0.0}
+
+
+async def sample_server(base_url: str, stop: asyncio.Event, every: float = 1.0) -> List[Dict]:
+    import httpx
+    samples = []
+    async with httpx.AsyncClient(timeout=10.0) as client:
+        while not stop.is_set():
+            try:
+                r = await client.get(f"{base_url}/health")
+                samples.append({"t": time.perf_counter(), **r.json().get("runtime", {})})
+            except Exception:
+                pass
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=every)
+            except asyncio.TimeoutError:
+                pass
+    return samples
+
+
+# ─────────────────────────────────────────────
+#  Run + report
+# ─────────────────────────────────────────────
+
+async def run_load(base_url: str, sessions: int, frames: List[str], fps: float,
+                   duration: float, modules: List[str], drain: float = 10.0) -> Dict:
+    stop    = asyncio.Event()
+    sampler = asyncio.create_task(sample_server(base_url, stop))
+    results = await asyncio.gather(*[
+        run_client(i, base_url, frames, fps, duration, modules, drain)
+        for i in range(sessions)
+    ], return_exceptions=True)
+    stop.set()
+    samples = await sampler
+
+    ok     = [r for r in results if isinstance(r, dict)]
+    errors = [repr(r) for r in results if not isinstance(r, dict)]
+    lags   = np.concatenate([r["lags"] for r in ok]) if ok and any(r["lags"] for r in ok) else np.zeros(0)
+    sent   = sum(r["sent"] for r in ok)
+    dropped = sum(r["sent"] - r["replied"] - r["decode_failed"] for r in ok)
+
+    cpu_pct = []
+    for a, b in zip(samples, samples[1:]):
+        if b["t"] > a["t"] and "cpu_sec" in a and "cpu_sec" in b:
+            cpu_pct.append((b["cpu_sec"] - a["cpu_sec"]) / (b["t"] - a["t"]) * 100.0)
+    first, last = (samples[0], samples[-1]) if samples else ({}, {})
+    pct = (lambda q: float(np.percentile(lags, q)) if lags.size else None)
+
+    report = {
+        "sessions":        sessions,
+        "target_fps":      fps,
+        "duration_sec":    duration,
+        "client_errors":   errors,
+        "frames_sent":     sent,
+        "frames_dropped":  dropped,
+        "dropped_pct":     100.0 * dropped / sent if sent else 0.0,
+        "decode_failed":   sum(r["decode_failed"] for r in ok),
+        "reply_fps_min":   min((r["reply_fps"] for r in ok), default=0.0),
+        "reply_fps_mean":  float(np.mean([r["reply_fps"] for r in ok])) if ok else 0.0,
+        "lag_ms_p50":      pct(50),
+        "lag_ms_p95":      pct(95),
+        "lag_ms_p99":      pct(99),
+        "loop_lag_ms_max": last.get("loop_lag_ms_max"),
+        "loop_stalls":     (last.get("loop_stalls", 0) - first.get("loop_stalls", 0)) if samples else None,
+        "cpu_pct_mean":    float(np.mean(cpu_pct)) if cpu_pct else None,
+        "cpu_pct_max":     float(np.max(cpu_pct)) if cpu_pct else None,
+        "rss_mb_max":      max((s.get("rss_mb") or 0.0 for s in samples), default=None),
+    }
+    report["sustainable"] = (not errors and report["dropped_pct"] <= MAX_DROPPED_PCT
+                             and report["lag_ms_p95"] is not None
+                             and report["lag_ms_p95"] <= MAX_LAG_P95_MS)
+    return report
+
+
+def _print_report(r: Dict):
+    f = lambda v, spec=".1f": "—" if v is None else format(v, spec)
+    print(f"sessions {r['sessions']:3d} @ {r['target_fps']:.0f} fps | "
+          f"reply fps min {f(r['reply_fps_min'])} mean {f(r['reply_fps_mean'])} | "
+          f"lag p50/p95/p99 {f(r['lag_ms_p50'])}/{f(r['lag_ms_p95'])}/{f(r['lag_ms_p99'])} ms | "
+          f"dropped {r['frames_dropped']} ({f(r['dropped_pct'], '.2f')}%) | "
+          f"stalls {r['loop_stalls']} max loop lag {f(r['loop_lag_ms_max'])} ms | "
+          f"cpu {f(r['cpu_pct_mean'])}% (max {f(r['cpu_pct_max'])}) rss {f(r['rss_mb_max'])} MB | "
+          f"{'OK' if r['sustainable'] else 'SATURATED'}")
+    for e in r["client_errors"][:3]:
+        print(f"    client error: {e}")
+
+
+async def _amain(args) -> int:
+    frames  = recorded_frames(args.recording) if args.recording else synthetic_frames()
+    modules = args.modules.split(",")
+    counts  = [int(c) for c in args.ramp.split(",")] if args.ramp else [args.sessions]
+
+    proc, tmp = None, None
+    base_url  = args.url
+    if base_url is None:
+        tmp  = tempfile.TemporaryDirectory()
+        proc = start_local_server(tmp.name)
+        base_url = proc.base_url
+    try:
+        await wait_healthy(base_url)
+        reports = []
+        for n in counts:
+            r = await run_load(base_url, n, frames, args.fps, args.duration, modules)
+            reports.append(r)
+            if args.json:
+                print(json.dumps(r))
+            else:
+                _print_report(r)
+            if args.ramp and not r["sustainable"]:
+                break
+        if args.ramp and not args.json:
+            ok = [r["sessions"] for r in reports if r["sustainable"]]
+            print(f"max sustainable sessions: {max(ok) if ok else 0}")
+        return 0
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            tmp.cleanup()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sessions", type=int, default=4)
+    ap.add_argument("--ramp", help="comma-separated session counts; stops at saturation")
+    ap.add_argument("--fps", type=float, default=30.0)
+    ap.add_argument("--duration", type=float, default=20.0,
+                    help="seconds per session (server closes sessions at 60 s)")
+    ap.add_argument("--modules", default="face", help="e.g. face or face,body")
+    ap.add_argument("--recording", type=Path, help="stream frames from a .nvrec file")
+    ap.add_argument("--url", help="existing server, e.g. http://127.0.0.1:8000")
+    ap.add_argument("--json", action="store_true", help="one JSON report per line")
+    args = ap.parse_args(argv)
+    if args.duration >= 60:
+        ap.error("--duration must be < 60 s (sessions auto-close at 60 s)")
+    return asyncio.run(_amain(args))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
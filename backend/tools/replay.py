@@ -0,0 +1,294 @@
+"""
+tools/replay.py
+Replay a recorded analyze-stream session (stream_recorder.py) against the
+current build and report throughput, per-frame latency and metric drift.
+
+Usage (from backend/)
+─────────────────────
+  python -m tools.replay rec.nvrec                      # in-process, max speed
+  python -m tools.replay rec.nvrec --speed 1            # real time
+  python -m tools.replay rec.nvrec --speed 4 \\
+      --url ws://127.0.0.1:8000/api/v1/analyze-stream   # running uvicorn
+  python -m tools.replay rec.nvrec --max-p95-ms 40 --max-drift 0.05   # CI gate
+
+In-process mode drives main._process_and_reply directly on a FrameClock
+session, so the metrics are independent of the replay speed. Session-end
+identity confirmation runs against a throwaway identity store, never the
+server's IDENTITY_STORE_DIR. Exit status is 1 when a --max-* gate fails.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import contextlib
+import json
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from stream_recorder import load_recording
+
+# Reply keys that legitimately differ between runs
+IGNORED_KEYS = {"session_id", "elapsed_sec", "frames_processed", "frame_index", "proc_ms",
+                "pose_latency_ms", "status", "warning"}
+
+
+# ─────────────────────────────────────────────
+#  Pacing
+# ─────────────────────────────────────────────
+
+def _schedule(inbound: List[Dict], speed: float) -> List[Optional[float]]:
+    """Send offsets in seconds from replay start; None = as fast as possible."""
+    if speed <= 0 or not inbound:
+        return [None] * len(inbound)
+    ts = [float(p.get("timestamp_ms") or p.get("recv_ms") or 0.0) for p in inbound]
+    return [(t - ts[0]) / 1000.0 / speed for t in ts]
+
+
+async def _wait_until(t0: float, offset: Optional[float]):
+    if offset is not None:
+        delay = t0 + offset - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+def _fresh_session_ids(inbound: List[Dict]) -> List[Dict]:
+    sid = f"replay-{uuid.uuid4()}"
+    return [{**p, "session_id": sid} for p in inbound]
+
+
+# ─────────────────────────────────────────────
+#  Drivers
+# ─────────────────────────────────────────────
+
+class _Collector:
+    """Stands in for the WebSocket in in-process mode."""
+    def __init__(self):
+        self.replies: List[Dict] = []
+
+    async def send_json(self, data):
+        self.replies.append(data)
+
+
+@contextlib.contextmanager
+def _scratch_identity_store():
+    """Swap get_identity_manager() onto a temporary store for the duration."""
+    import identity_manager
+
+    saved = identity_manager._manager
+    with tempfile.TemporaryDirectory(prefix="replay-ids-") as tmp:
+        mgr = identity_manager._manager = identity_manager.IdentityManager(Path(tmp) / "ids.store",
+                                                                           legacy_path=None)
+        try:
+            yield mgr
+        finally:
+            identity_manager._manager = saved
+            mgr._db.close()
+
+
+async def replay_inprocess(inbound: List[Dict], speed: float
+                           ) -> Tuple[List[Dict], List[float], float]:
+    with _scratch_identity_store():
+        return await _replay_inprocess(inbound, speed)
+
+
+async def _replay_inprocess(inbound: List[Dict], speed: float
+                            ) -> Tuple[List[Dict], List[float], float]:
+    import main
+    from clock import FrameClock
+
+    first   = inbound[0]
+    modules = first.get("modules", [first.get("module", "face")])
+    session = main._new_session(first["session_id"], modules, face_id=None,
+                                clock=FrameClock())
+    clock   = session["clock"]
+    clock.observe(first.get("timestamp_ms"))
+    start   = clock.now()
+
+    ws, lat = _Collector(), []
+    sched   = _schedule(inbound, speed)
+    t0      = time.perf_counter()
+    for i, (payload, offset) in enumerate(zip(inbound, sched)):
+        await _wait_until(t0, offset)
+        if i:                                   # the first frame was observed above
+            clock.observe(payload.get("timestamp_ms"))
+        t = time.perf_counter()
+        await main._process_and_reply(ws, payload, session, start)
+        lat.append((time.perf_counter() - t) * 1000.0)
+        if clock.now() - start >= 60.0:
+            break
+    ws.replies.append(main._build_final_payload(session, clock.now() - start))
+    wall = time.perf_counter() - t0
+    main._close_analyzers(main.SESSION_STORE.pop(session["session_id"]))
+    return ws.replies, lat, wall
+
+
+async def replay_remote(inbound: List[Dict], url: str, speed: float,
+                        drain_timeout: float = 10.0
+                        ) -> Tuple[List[Dict], List[float], float]:
+    import websockets
+
+    replies, lat = [], []
+    pending: collections.deque = collections.deque()
+    sched = _schedule(inbound, speed)
+
+    async with websockets.connect(url, max_size=None) as ws:
+        t0 = time.perf_counter()
+
+        async def sender():
+            for payload, offset in zip(inbound, sched):
+                await _wait_until(t0, offset)
+                pending.append(time.perf_counter())
+                await ws.send(json.dumps(payload))
+
+        async def receiver():
+            answered = 0
+            while answered < len(inbound):
+                msg = json.loads(await ws.recv())
+                replies.append(msg)
+                if msg.get("status") in ("test_complete", "error"):
+                    return
+                answered += 1
+                if pending:
+                    lat.append((time.perf_counter() - pending.popleft()) * 1000.0)
+
+        sending   = asyncio.create_task(sender())
+        receiving = asyncio.create_task(receiver())
+        await asyncio.wait({sending, receiving}, return_when=asyncio.FIRST_COMPLETED)
+        if receiving.done():
+            sending.cancel()        # server ended the session early
+        else:
+            try:
+                await asyncio.wait_for(receiving, timeout=drain_timeout)
+            except asyncio.TimeoutError:
+                pass                # unanswered frames show up as missing latencies
+        wall = time.perf_counter() - t0
+    return replies, lat, wall
+
+
+# ─────────────────────────────────────────────
+#  Reporting
+# ─────────────────────────────────────────────
+
+def _numeric(d: Dict) -> Dict[str, float]:
+    return {k: float(v) for k, v in d.items()
+            if k not in IGNORED_KEYS and isinstance(v, (int, float))
+            and not isinstance(v, bool)}
+
+
+def metric_drift(recorded: List[Dict], replayed: List[Dict]) -> Dict[str, Dict]:
+    """
+    Per-key drift between recorded and replayed replies, paired in order.
+    rel = |a - b| / max(|a|, |b|, 1e-6); final biomarkers are compared too.
+    """
+    rec_live = [r for r in recorded if r.get("status") == "processing"]
+    rep_live = [r for r in replayed if r.get("status") == "processing"]
+    pairs = list(zip(rec_live, rep_live))
+    rec_fin = next((r for r in recorded if r.get("status") == "test_complete"), None)
+    rep_fin = next((r for r in replayed if r.get("status") == "test_complete"), None)
+    if rec_fin and rep_fin:
+        pairs.append(({f"final.{k}": v for k, v in rec_fin.get("biomarkers", {}).items()},
+                      {f"final.{k}": v for k, v in rep_fin.get("biomarkers", {}).items()}))
+
+    acc: Dict[str, List[Tuple[float, float]]] = collections.defaultdict(list)
+    for a, b in pairs:
+        na, nb = _numeric(a), _numeric(b)
+        for k in na.keys() & nb.keys():
+            diff = abs(na[k] - nb[k])
+            acc[k].append((diff, diff / max(abs(na[k]), abs(nb[k]), 1e-6)))
+    out = {}
+    for k, vals in sorted(acc.items()):
+        d = np.array(vals)
+        out[k] = {"mean_abs": float(d[:, 0].mean()), "max_abs": float(d[:, 0].max()),
+                  "max_rel": float(d[:, 1].max()), "n": len(vals)}
+    return out
+
+
+def latency_stats(lat: List[float]) -> Dict[str, Optional[float]]:
+    if not lat:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+    p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99),
+            "max_ms": float(np.max(lat))}
+
+
+def _recorded_latency(outbound: List[Dict]) -> List[float]:
+    return [r["proc_ms"] for r in outbound
+            if r.get("status") == "processing" and r.get("proc_ms") is not None]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0],
+                                 formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("recording", type=Path)
+    ap.add_argument("--speed", type=float, default=0.0,
+                    help="1 = real time, N = N× faster, 0 = as fast as possible")
+    ap.add_argument("--url", help="replay against a running server instead of in-process")
+    ap.add_argument("--max-p95-ms", type=float, help="fail if p95 latency exceeds this")
+    ap.add_argument("--max-drift", type=float,
+                    help="fail if any metric's max relative drift exceeds this")
+    ap.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = ap.parse_args(argv)
+
+    inbound, outbound = load_recording(args.recording)
+    if not inbound:
+        print("recording has no inbound frames", file=sys.stderr)
+        return 2
+    inbound = _fresh_session_ids(inbound)
+
+    if args.url:
+        replies, lat, wall = asyncio.run(replay_remote(inbound, args.url, args.speed))
+    else:
+        replies, lat, wall = asyncio.run(replay_inprocess(inbound, args.speed))
+
+    drift = metric_drift(outbound, replies)
+    worst = max((v["max_rel"] for v in drift.values()), default=0.0)
+    report = {
+        "recording":      str(args.recording),
+        "mode":           "remote" if args.url else "in-process",
+        "speed":          args.speed,
+        "frames":         len(lat),
+        "wall_sec":       wall,
+        "frames_per_sec": len(lat) / wall if wall > 0 else None,
+        "latency":        latency_stats(lat),
+        "recorded_latency": latency_stats(_recorded_latency(outbound)),
+        "max_rel_drift":  worst,
+        "drift":          drift,
+    }
+
+    failed = []
+    p95 = report["latency"]["p95_ms"]
+    if args.max_p95_ms is not None and p95 is not None and p95 > args.max_p95_ms:
+        failed.append(f"p95 {p95:.1f} ms > {args.max_p95_ms} ms")
+    if args.max_drift is not None and worst > args.max_drift:
+        failed.append(f"max drift {worst:.4f} > {args.max_drift}")
+    report["failed"] = failed
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        l, rl = report["latency"], report["recorded_latency"]
+        fmt = lambda v: "—" if v is None else f"{v:7.1f}"
+        print(f"{report['mode']} replay of {report['recording']} @ speed {args.speed or 'max'}")
+        print(f"  frames        {report['frames']}  in {wall:.2f} s  "
+              f"({report['frames_per_sec'] or 0:.1f} fps)")
+        print(f"  latency ms    p50 {fmt(l['p50_ms'])}  p95 {fmt(l['p95_ms'])}  p99 {fmt(l['p99_ms'])}")
+        print(f"  recorded ms   p50 {fmt(rl['p50_ms'])}  p95 {fmt(rl['p95_ms'])}  p99 {fmt(rl['p99_ms'])}")
+        print(f"  max rel drift {worst:.4f}")
+        for k, v in drift.items():
+            if v["max_rel"] > 1e-6:
+                print(f"    {k:32s} max_abs {v['max_abs']:.4g}  max_rel {v['max_rel']:.4f}")
+        for f in failed:
+            print(f"  FAIL: {f}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
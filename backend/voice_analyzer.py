@@ -10,6 +10,8 @@ Biomarkers:
   - F0 stats   : mean/std fundamental frequency
   - Speech rate: syllables per second
   - Pause ratio: fraction of silent segments
+  - Spectral   : MFCC stats, spectral tilt, CPP, formant proxies, voiced
+                 segments (voice_features.FeatureBank, one FFT per voiced frame)
 
 Libraries: librosa + scipy (no parselmouth – avoids native compilation on Render).
 """
@@ -17,12 +19,15 @@ Libraries: librosa + scipy (no parselmouth – avoids native compilation on Rend
 from __future__ import annotations
 
 import io
+import os
 import struct
-from typing import Dict, List, Optional, Tuple
+import warnings
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import librosa
 import numpy as np
 import soundfile as sf
+import soxr
 from scipy import signal as sp_signal
 from scipy.interpolate import interp1d
 
@@ -31,6 +36,7 @@ from scipy.interpolate import interp1d
 #  Constants
 # ─────────────────────────────────────────────
 
+ANALYZER_VERSION  = "4"          # bump when the reported metrics change (invalidates voice_cache)
 SAMPLE_RATE       = 22_050       # target SR after resampling
 F0_MIN_HZ         = 65.0        # lowest plausible F0 (male bass)
 F0_MAX_HZ         = 525.0       # highest plausible F0 (female soprano)
@@ -38,6 +44,20 @@ SILENCE_THRESHOLD = 0.015       # RMS below this → silence frame
 SILENCE_FRAME_LEN = 0.025       # 25 ms frames for silence detection
 HNR_MIN_DB        = -10.0
 HNR_MAX_DB        =  40.0
+HNR_WINDOW_PERIODS = 4.5        # analysis window = 4.5 periods of F0_MIN (Boersma 1993)
+HNR_LAG_TOLERANCE  = 0.2        # search ±20 % around each frame's F0 period
+HNR_BATCH_FRAMES   = 256        # frames per FFT batch (bounds peak memory)
+F0_FRAME_LENGTH   = 2048
+F0_HOP_LENGTH     = 256         # F0 frame i is centred on sample i * F0_HOP_LENGTH
+F0_BACKEND        = os.getenv("VOICE_F0_BACKEND", "pyin")   # "pyin" (accurate) | "yin" (fast)
+YIN_THRESHOLD     = 0.10        # first CMNDF dip below this is the period (de Cheveigné 2002)
+YIN_MAX_APERIODICITY = 0.25     # CMNDF at the chosen lag above this → unvoiced
+YIN_MIN_LEVEL_DB  = -35.0       # frames this far below the loudest frame → unvoiced
+YIN_MEDIAN_FRAMES = 5           # median window for octave-jump correction
+YIN_MIN_RUN       = 3           # shorter voiced runs are dropped as spurious
+YIN_BATCH_FRAMES  = 512         # frames per FFT batch (bounds peak memory)
+DECODE_BLOCK_SEC  = 2.0         # soundfile read size for the streaming resampler
+RESAMPLE_QUALITY  = "HQ"        # soxr preset (librosa.load's default resampler)
 
 
 # ─────────────────────────────────────────────
@@ -46,43 +66,137 @@ HNR_MAX_DB        =  40.0
 
 def load_audio_bytes(audio_bytes: bytes, target_sr: int = SAMPLE_RATE) -> Tuple[np.ndarray, int]:
     """
-    Load audio from raw bytes (WAV / OGG / FLAC / MP3 via librosa).
-    Resamples to target_sr and converts to mono.
+    Decode audio bytes to float32 mono at target_sr.
+    WAV / FLAC / OGG (and MP3 on libsndfile ≥ 1.1) are read via soundfile in
+    blocks straight into a streaming polyphase resampler, so the full-rate clip
+    is never held in memory; librosa is only used for containers libsndfile
+    cannot open (e.g. WebM/M4A).
     """
-    buf = io.BytesIO(audio_bytes)
     try:
-        y, sr = librosa.load(buf, sr=target_sr, mono=True)
+        return _decode_soundfile(io.BytesIO(audio_bytes), target_sr), target_sr
     except Exception:
-        # Fallback: try soundfile first, then manual PCM
-        buf.seek(0)
         try:
-            y_raw, sr_raw = sf.read(buf)
-            if y_raw.ndim > 1:
-                y_raw = y_raw.mean(axis=1)
-            y = librosa.resample(y_raw.astype(np.float32), orig_sr=sr_raw, target_sr=target_sr)
-            sr = target_sr
+            y, sr = librosa.load(io.BytesIO(audio_bytes), sr=None, mono=True, dtype=np.float32)
         except Exception as e:
             raise ValueError(f"Cannot decode audio: {e}") from e
-    return y.astype(np.float64), sr
+    return resample_audio(y, sr, target_sr), target_sr
+
+
+def resample_audio(y: np.ndarray, orig_sr: int, target_sr: int) -> np.ndarray:
+    """float32 polyphase resampling (soxr); a no-op when the rates already match."""
+    if orig_sr == target_sr or len(y) == 0:
+        return y
+    return soxr.resample(y, orig_sr, target_sr, quality=RESAMPLE_QUALITY)
+
+
+def _decode_soundfile(source, target_sr: int) -> np.ndarray:
+    with sf.SoundFile(source) as f:
+        if f.samplerate == target_sr and f.channels == 1:
+            return f.read(dtype="float32")
+        out = np.empty(int(max(f.frames, 0) * target_sr / f.samplerate) + 64, dtype=np.float32)
+        pos = 0
+        for y in iter_audio_blocks(f, target_sr):
+            out, pos = _append(out, pos, y)
+        return out[:pos]
+
+
+def iter_audio_blocks(f: sf.SoundFile, target_sr: int = SAMPLE_RATE,
+                      block_sec: float = DECODE_BLOCK_SEC) -> Iterator[np.ndarray]:
+    """float32 mono blocks at target_sr, decoded and resampled incrementally."""
+    rs = None
+    if f.samplerate != target_sr:
+        rs = soxr.ResampleStream(f.samplerate, target_sr, 1, dtype="float32",
+                                 quality=RESAMPLE_QUALITY)
+    for block in f.blocks(blocksize=int(block_sec * f.samplerate),
+                          dtype="float32", always_2d=True):
+        y = _to_mono(block)
+        yield rs.resample_chunk(y) if rs is not None else y
+    if rs is not None:
+        yield rs.resample_chunk(np.zeros(0, np.float32), last=True)
+
+
+def _to_mono(block: np.ndarray) -> np.ndarray:
+    y = block[:, 0].copy()
+    for c in range(1, block.shape[1]):      # column adds: far faster than mean(axis=1)
+        y += block[:, c]
+    if block.shape[1] > 1:
+        y *= 1.0 / block.shape[1]
+    return y
+
+
+def _append(out: np.ndarray, pos: int, y: np.ndarray) -> Tuple[np.ndarray, int]:
+    """Copy y into a preallocated buffer; grows only if the header under-reported length."""
+    if pos + len(y) > len(out):
+        out = np.concatenate([out[:pos], np.empty(max(len(y), pos // 2), dtype=out.dtype)])
+    out[pos : pos + len(y)] = y
+    return out, pos + len(y)
 
 
 # ─────────────────────────────────────────────
-#  F0 extraction (YIN algorithm via librosa)
+#  Framing (shared by all energy features)
 # ─────────────────────────────────────────────
 
-def extract_f0(y: np.ndarray, sr: int) -> np.ndarray:
+def frame_signal(y: np.ndarray, frame_len: int, hop: int) -> np.ndarray:
     """
-    Extract frame-wise F0 using pyin (probabilistic YIN).
-    Returns array of F0 values in Hz (NaN for unvoiced frames).
+    Read-only (n_frames, frame_len) strided view — no copy.
+    Frames start at 0, hop, 2·hop, … < len(y) - frame_len.
     """
+    n = max(0, -(-(len(y) - frame_len) // hop)) if hop > 0 else 0
+    return np.lib.stride_tricks.as_strided(
+        y, shape=(n, frame_len), strides=(y.strides[0] * hop, y.strides[0]),
+        writeable=False)
+
+
+def frame_rms(frames: np.ndarray) -> np.ndarray:
+    """RMS of every frame in one vectorised call (einsum avoids a squared copy)."""
+    if frames.shape[0] == 0:
+        return np.empty(0)
+    return np.sqrt(np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / frames.shape[1])
+
+
+def energy_frames(y: np.ndarray, sr: int) -> Tuple[np.ndarray, int]:
+    """25 ms RMS series (50 % overlap) shared by MPT, pause ratio and speech rate."""
+    frame_len = int(SILENCE_FRAME_LEN * sr)
+    hop       = frame_len // 2
+    return frame_rms(frame_signal(y, frame_len, hop)), hop
+
+
+def longest_run(mask: np.ndarray) -> int:
+    """Length of the longest run of True values."""
+    edges  = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends   = np.flatnonzero(edges == -1)
+    return int((ends - starts).max()) if len(starts) else 0
+
+
+# ─────────────────────────────────────────────
+#  F0 extraction (pyin via librosa, or vectorised YIN)
+# ─────────────────────────────────────────────
+
+def extract_f0(y: np.ndarray, sr: int, backend: Optional[str] = None) -> np.ndarray:
+    """
+    Extract frame-wise F0 with the configured backend (VOICE_F0_BACKEND).
+    Returns array of F0 values in Hz (NaN for unvoiced frames); frame i is
+    centred on sample i * F0_HOP_LENGTH for every backend.
+    """
+    backend = backend or F0_BACKEND
+    if backend == "pyin":
+        return _f0_pyin(y, sr)
+    if backend == "yin":
+        return _f0_yin(y, sr)
+    raise ValueError(f"Unknown F0 backend: {backend!r}")
+
+
+def _f0_pyin(y: np.ndarray, sr: int) -> np.ndarray:
+    """pyin (probabilistic YIN + Viterbi) — most accurate, slowest."""
     try:
         f0, voiced_flag, _ = librosa.pyin(
             y,
             fmin=F0_MIN_HZ,
             fmax=F0_MAX_HZ,
             sr=sr,
-            frame_length=2048,
-            hop_length=256,
+            frame_length=F0_FRAME_LENGTH,
+            hop_length=F0_HOP_LENGTH,
         )
         # Keep only voiced frames
         f0_voiced = f0.copy()
@@ -92,6 +206,112 @@ def extract_f0(y: np.ndarray, sr: int) -> np.ndarray:
         return np.array([np.nan])
 
 
+def _yin_cmndf(frames: np.ndarray, win: int, max_lag: int) -> np.ndarray:
+    """
+    Cumulative mean normalised difference d'(τ), τ = 0..max_lag, for a batch
+    of frames (n, win + max_lag). The difference function is expanded as
+    E(0) + E(τ) − 2·r(τ): r via one FFT cross-correlation, E via cumsum.
+    """
+    n_fft = 1 << int(np.ceil(np.log2(frames.shape[1] + win)))
+    X = np.fft.rfft(frames, n_fft)
+    H = np.fft.rfft(frames[:, :win], n_fft)
+    r = np.fft.irfft(X * np.conj(H), n_fft)[:, :max_lag + 1]
+
+    cs   = np.concatenate([np.zeros((len(frames), 1)), np.cumsum(frames ** 2, axis=1)], axis=1)
+    lags = np.arange(max_lag + 1)
+    energy = cs[:, lags + win] - cs[:, lags]
+    d = np.maximum(energy[:, :1] + energy - 2.0 * r, 0.0)
+
+    cmndf = np.ones_like(d)
+    cmndf[:, 1:] = d[:, 1:] * lags[1:] / np.maximum(np.cumsum(d[:, 1:], axis=1), 1e-12)
+    return cmndf
+
+
+def _drop_short_runs(voiced: np.ndarray, min_run: int) -> np.ndarray:
+    edges  = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends   = np.flatnonzero(edges == -1)
+    keep   = voiced.copy()
+    for s, e in zip(starts[ends - starts < min_run], ends[ends - starts < min_run]):
+        keep[s:e] = False
+    return keep
+
+
+def yin_geometry(sr: int) -> Tuple[int, int, int, int]:
+    """(min_lag, max_lag, integration window, frame length) for YIN at `sr`."""
+    min_lag = max(int(sr / F0_MAX_HZ), 2)
+    max_lag = int(np.ceil(sr / F0_MIN_HZ)) + 1
+    win     = F0_FRAME_LENGTH // 2
+    return min_lag, max_lag, win, win + max_lag
+
+
+def yin_frames(frames: np.ndarray, sr: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Raw YIN estimates for frames of yin_geometry(sr) length:
+    (period in samples, aperiodicity, RMS level). Voicing is decided later
+    by yin_voicing, which needs the whole contour.
+    """
+    min_lag, max_lag, win, _ = yin_geometry(sr)
+    n      = len(frames)
+    period = np.full(n, np.nan)
+    aper   = np.ones(n)
+    level  = np.zeros(n)
+    for s in range(0, n, YIN_BATCH_FRAMES):
+        batch  = np.asarray(frames[s : s + YIN_BATCH_FRAMES], dtype=np.float64)
+        rows   = np.arange(len(batch))
+        cmndf  = _yin_cmndf(batch, win, max_lag)
+        seg    = cmndf[:, min_lag - 1 : max_lag + 1]          # one lag of margin each side
+        mid    = seg[:, 1:-1]
+        dips   = (mid < seg[:, :-2]) & (mid <= seg[:, 2:]) & (mid < YIN_THRESHOLD)
+        k      = np.where(dips.any(axis=1), dips.argmax(axis=1), mid.argmin(axis=1)) + 1
+        a, b, c = seg[rows, k - 1], seg[rows, k], seg[rows, k + 1]
+        denom  = a - 2 * b + c
+        shift  = np.divide(0.5 * (a - c), denom, out=np.zeros_like(denom),
+                           where=np.abs(denom) > 1e-12)        # flat / silent frames → 0
+        period[s : s + len(batch)] = (k + min_lag - 1) + np.clip(shift, -1.0, 1.0)
+        aper[s : s + len(batch)]   = b
+        level[s : s + len(batch)]  = frame_rms(batch[:, :win])
+    return period, aper, level
+
+
+def yin_voicing(period: np.ndarray, aper: np.ndarray, level: np.ndarray,
+                sr: int) -> np.ndarray:
+    """
+    F0 contour (NaN = unvoiced) from raw YIN estimates: aperiodicity + level
+    voicing, then a median filter that only replaces octave jumps, so
+    cycle-to-cycle perturbation (jitter) is preserved.
+    """
+    f0 = sr / period
+    level_db = 20.0 * np.log10(level + 1e-12)
+    voiced = ((aper < YIN_MAX_APERIODICITY)
+              & (level_db > level_db.max(initial=-240.0) + YIN_MIN_LEVEL_DB)
+              & (f0 >= F0_MIN_HZ) & (f0 <= F0_MAX_HZ))
+    f0[~voiced] = np.nan
+
+    # Octave-jump correction: replace only values > 20 % off the local median
+    pad = YIN_MEDIAN_FRAMES // 2
+    windows = np.lib.stride_tricks.sliding_window_view(
+        np.pad(f0, pad, constant_values=np.nan), YIN_MEDIAN_FRAMES)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)     # all-NaN windows
+        med = np.nanmedian(windows, axis=1)
+    jump = np.abs(f0 / med - 1.0) > 0.2
+    f0[jump] = med[jump]
+
+    f0[~_drop_short_runs(~np.isnan(f0), YIN_MIN_RUN)] = np.nan
+    return f0
+
+
+def _f0_yin(y: np.ndarray, sr: int) -> np.ndarray:
+    """Vectorised YIN over centred frames (batched FFT difference function)."""
+    *_, length = yin_geometry(sr)
+    n     = 1 + len(y) // F0_HOP_LENGTH
+    half  = length // 2
+    y_pad = np.pad(y.astype(np.float64), (half, half + F0_HOP_LENGTH))
+    view  = np.lib.stride_tricks.sliding_window_view(y_pad, length)[::F0_HOP_LENGTH][:n]
+    return yin_voicing(*yin_frames(view, sr), sr)
+
+
 # ─────────────────────────────────────────────
 #  Jitter
 # ─────────────────────────────────────────────
@@ -124,28 +344,27 @@ def compute_shimmer(y: np.ndarray, sr: int, f0: np.ndarray) -> Optional[float]:
 
     Uses peak amplitude at each F0-derived period boundary.
     """
+    period = shimmer_period(sr, f0)
+    if period is None:
+        return None
+    # Local RMS per cycle (non-overlapping period-length frames)
+    return shimmer_from_amps(frame_rms(frame_signal(y, period, period)))
+
+
+def shimmer_period(sr: int, f0: np.ndarray) -> Optional[int]:
+    """Mean F0 period in samples (the shimmer frame length), None if too few voiced frames."""
     f0_clean = f0[~np.isnan(f0)]
     if len(f0_clean) < 5:
         return None
-
-    # Estimate mean period in samples
     mean_period_samples = int(sr / np.mean(f0_clean))
-    if mean_period_samples < 2:
-        return None
+    return mean_period_samples if mean_period_samples >= 2 else None
 
-    # Extract local RMS per cycle
-    hop   = mean_period_samples
-    amps  = []
-    for i in range(0, len(y) - hop, hop):
-        chunk = y[i : i + hop]
-        rms   = float(np.sqrt(np.mean(chunk ** 2)))
-        if rms > 1e-6:
-            amps.append(rms)
 
+def shimmer_from_amps(amps: np.ndarray) -> Optional[float]:
+    amps = amps[amps > 1e-6]
     if len(amps) < 3:
         return None
 
-    amps = np.array(amps)
     diffs    = np.abs(np.diff(amps))
     shimmer  = np.mean(diffs) / np.mean(amps) * 100.0
     return float(np.clip(shimmer, 0.0, 20.0))
@@ -155,67 +374,93 @@ def compute_shimmer(y: np.ndarray, sr: int, f0: np.ndarray) -> Optional[float]:
 #  HNR (Harmonics-to-Noise Ratio)
 # ─────────────────────────────────────────────
 
+def _hnr_frames(y: np.ndarray, sr: int, centers: np.ndarray,
+                f0_hz: np.ndarray) -> np.ndarray:
+    """
+    Per-frame HNR (dB) at the given sample centres, NaN where aperiodic.
+
+    Each Hann-windowed frame's autocorrelation is computed via FFT and divided
+    by the window's own autocorrelation (Boersma 1993), then the peak is taken
+    within ±HNR_LAG_TOLERANCE of that frame's F0 period. Cost is
+    O(frames · nfft log nfft) — linear in audio length.
+    """
+    win_len = int(HNR_WINDOW_PERIODS * sr / F0_MIN_HZ)
+    nfft    = 1 << int(np.ceil(np.log2(2 * win_len)))      # no circular wrap
+    max_lag = min(int(sr / F0_MIN_HZ * (1 + HNR_LAG_TOLERANCE)) + 2, win_len - 1)
+    window  = np.hanning(win_len)
+    r_w     = np.fft.irfft(np.abs(np.fft.rfft(window, nfft)) ** 2)[:max_lag + 1]
+    r_w    /= r_w[0]
+
+    half   = win_len // 2
+    y_pad  = np.pad(y, (half, win_len - half))
+    frames = np.lib.stride_tricks.sliding_window_view(y_pad, win_len)   # zero-copy
+    lags   = np.arange(max_lag + 1)
+    out    = np.full(len(centers), np.nan)
+
+    for s in range(0, len(centers), HNR_BATCH_FRAMES):
+        idx = slice(s, s + HNR_BATCH_FRAMES)
+        x   = frames[centers[idx]].astype(np.float64)
+        x  -= x.mean(axis=1, keepdims=True)
+        x  *= window
+        r   = np.fft.irfft(np.abs(np.fft.rfft(x, nfft, axis=1)) ** 2, nfft, axis=1)[:, :max_lag + 1]
+        r0  = r[:, :1]
+        ok  = r0[:, 0] > 1e-12
+        r   = r / np.where(r0 > 1e-12, r0, 1.0) / r_w
+
+        period = sr / f0_hz[idx]
+        lo = np.floor(period * (1 - HNR_LAG_TOLERANCE))[:, None]
+        hi = np.ceil(period * (1 + HNR_LAG_TOLERANCE))[:, None]
+        band = (lags >= np.maximum(lo, 2)) & (lags <= np.minimum(hi, max_lag - 1))
+        k    = np.argmax(np.where(band, r, -np.inf), axis=1)
+        rows = np.arange(len(k))
+        # Parabolic refinement of the peak height
+        a, b, c = r[rows, k - 1], r[rows, k], r[rows, k + 1]
+        denom   = a - 2 * b + c
+        peak    = b - np.divide(0.125 * (a - c) ** 2, denom, out=np.zeros_like(denom),
+                                where=np.abs(denom) > 1e-12)    # flat / silent frames → b
+        peak    = np.clip(peak, 0.0, 1.0 - 1e-6)
+        ok     &= band.any(axis=1) & (peak > 0)
+        hnr     = 10.0 * np.log10(np.where(ok, peak, 0.5) / (1.0 - np.where(ok, peak, 0.5)))
+        out[idx] = np.where(ok, np.clip(hnr, HNR_MIN_DB, HNR_MAX_DB), np.nan)
+    return out
+
+
 def compute_hnr(y: np.ndarray, sr: int, f0: np.ndarray) -> Optional[float]:
     """
-    HNR estimation via autocorrelation method.
-    HNR(dB) = 10 * log10(r_max / (1 - r_max))
-    where r_max is the normalised autocorrelation at the fundamental period.
+    HNR (dB) averaged over voiced frames, Praat/Boersma style.
+    Per frame: HNR = 10 * log10(r_max / (1 - r_max)), where r_max is the
+    window-corrected normalised autocorrelation peak near that frame's period.
     """
     f0_clean = f0[~np.isnan(f0)]
     if len(f0_clean) < 5 or len(y) < sr * 0.1:
         return None
 
-    mean_f0 = float(np.mean(f0_clean))
-    lag      = int(sr / mean_f0)
-    if lag <= 0 or lag >= len(y):
-        return None
-
-    # Normalised autocorrelation
-    y_norm = y - np.mean(y)
-    acf    = np.correlate(y_norm, y_norm, mode="full")
-    acf    = acf[len(acf) // 2 :]        # take positive lags
-    acf   /= acf[0] + 1e-9               # normalise
-
-    if lag >= len(acf):
-        return None
-
-    r = float(np.clip(acf[lag], -1.0, 1.0 - 1e-6))
-    if r <= 0:
+    voiced  = np.flatnonzero(~np.isnan(f0))
+    centers = voiced * F0_HOP_LENGTH
+    keep    = centers < len(y)
+    hnr     = _hnr_frames(y, sr, centers[keep], f0[voiced[keep]])
+    hnr     = hnr[~np.isnan(hnr)]
+    if len(hnr) == 0:
         return None
-
-    hnr = 10.0 * np.log10(r / (1.0 - r))
-    return float(np.clip(hnr, HNR_MIN_DB, HNR_MAX_DB))
+    return float(np.clip(np.mean(hnr), HNR_MIN_DB, HNR_MAX_DB))
 
 
 # ─────────────────────────────────────────────
 #  Maximum Phonation Time
 # ─────────────────────────────────────────────
 
-def compute_mpt(y: np.ndarray, sr: int) -> float:
+def compute_mpt(y: np.ndarray, sr: int,
+                energy: Optional[Tuple[np.ndarray, int]] = None) -> float:
     """
     Maximum Phonation Time: duration of the longest continuous voiced segment.
-    Uses short-time energy thresholding and F0-based voicing.
+    Uses short-time energy thresholding. `energy` is a precomputed
+    energy_frames(y, sr) result.
     """
-    frame_len = int(SILENCE_FRAME_LEN * sr)
-    hop       = frame_len // 2
-    rms_frames = []
-    for i in range(0, len(y) - frame_len, hop):
-        rms_frames.append(float(np.sqrt(np.mean(y[i : i + frame_len] ** 2))))
-
-    if not rms_frames:
+    rms_frames, hop = energy if energy is not None else energy_frames(y, sr)
+    if len(rms_frames) == 0:
         return 0.0
 
-    voiced     = np.array(rms_frames) > SILENCE_THRESHOLD
-    # Find longest run
-    max_run    = 0
-    current    = 0
-    for v in voiced:
-        if v:
-            current += 1
-            max_run  = max(max_run, current)
-        else:
-            current = 0
-
+    max_run = longest_run(rms_frames > SILENCE_THRESHOLD)
     return float(max_run * hop / sr)
 
 
@@ -223,17 +468,16 @@ def compute_mpt(y: np.ndarray, sr: int) -> float:
 #  Speech rate & pause ratio
 # ─────────────────────────────────────────────
 
-def compute_speech_rate(y: np.ndarray, sr: int) -> Tuple[Optional[float], float]:
+def compute_speech_rate(y: Optional[np.ndarray], sr: int,
+                        energy: Optional[Tuple[np.ndarray, int]] = None,
+                        duration: Optional[float] = None,
+                        ) -> Tuple[Optional[float], float]:
     """
     Estimate speech rate (syllables/sec) via energy envelope peaks.
-    Also returns pause ratio (fraction of silent frames).
+    Also returns pause ratio (fraction of silent frames). With a precomputed
+    `energy` and `duration` the samples themselves are not needed (y=None).
     """
-    frame_len  = int(SILENCE_FRAME_LEN * sr)
-    hop        = frame_len // 2
-    rms_frames = np.array([
-        float(np.sqrt(np.mean(y[i : i + frame_len] ** 2)))
-        for i in range(0, len(y) - frame_len, hop)
-    ])
+    rms_frames, hop = energy if energy is not None else energy_frames(y, sr)
     if len(rms_frames) == 0:
         return None, 1.0
 
@@ -244,7 +488,7 @@ def compute_speech_rate(y: np.ndarray, sr: int) -> Tuple[Optional[float], float]
     smooth = sp_signal.savgol_filter(rms_frames, 5, 2)
     peaks, _ = sp_signal.find_peaks(smooth, distance=int(0.1 * sr / hop))
     voiced_peaks = peaks[voiced_mask[peaks]]
-    duration = len(y) / sr
+    duration = len(y) / sr if duration is None else duration
     speech_rate = float(len(voiced_peaks) / duration) if duration > 0 else None
     return speech_rate, pause_ratio
 
@@ -259,6 +503,7 @@ def analyze_voice(audio_bytes: bytes) -> Dict:
     Accepts raw audio bytes (WAV / OGG / FLAC).
     Returns a dict compatible with VoiceMetrics Pydantic model.
     """
+    from voice_features import compute_feature_bank   # imports this module's constants
     try:
         y, sr = load_audio_bytes(audio_bytes)
     except ValueError as e:
@@ -273,8 +518,9 @@ def analyze_voice(audio_bytes: bytes) -> Dict:
     jitter     = compute_jitter(f0)
     shimmer    = compute_shimmer(y, sr, f0)
     hnr        = compute_hnr(y, sr, f0)
-    mpt        = compute_mpt(y, sr)
-    speech_rate, pause_ratio = compute_speech_rate(y, sr)
+    energy     = energy_frames(y, sr)
+    mpt        = compute_mpt(y, sr, energy)
+    speech_rate, pause_ratio = compute_speech_rate(y, sr, energy)
 
     f0_mean = float(np.mean(f0_clean)) if len(f0_clean) > 0 else None
     f0_std  = float(np.std(f0_clean))  if len(f0_clean) > 1 else None
@@ -289,4 +535,6 @@ def analyze_voice(audio_bytes: bytes) -> Dict:
         "speech_rate_syl_per_sec": speech_rate,
         "pause_ratio":             pause_ratio,
         "audio_duration_sec":      len(y) / sr,
+        "f0_backend":              F0_BACKEND,
+        **compute_feature_bank(y, sr, f0),
     }
@@ -0,0 +1,140 @@
+"""
+voice_cache.py
+Content-addressed cache of voice analysis results.
+
+Mobile clients retry uploads on flaky networks, so the same clip is often
+analysed two or three times. Results are keyed by the SHA-256 of the upload
+plus everything that changes the output (analyzer version, F0 backend, target
+sample rate, whole-clip vs block-wise path), so a repeat upload is answered
+without touching the worker pool.
+
+  VOICE_CACHE_SIZE   in-memory LRU entries                 (default 256; 0 disables)
+  VOICE_CACHE_DIR    optional on-disk tier, one JSON file per key (unset → memory only)
+
+The disk tier survives restarts and is shared by processes on the same volume.
+Entries are written atomically (temp file + os.replace); a version bump simply
+stops matching old files, which can be deleted at leisure. put() is called
+from the event loop, so there the disk write runs in a thread (flush() awaits
+the outstanding ones); without a running loop it writes inline.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional
+
+from voice_analyzer import ANALYZER_VERSION, F0_BACKEND, SAMPLE_RATE
+
+VOICE_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE", "256"))
+VOICE_CACHE_DIR  = os.getenv("VOICE_CACHE_DIR", "")
+
+
+class VoiceResultCache:
+    def __init__(self, max_entries: int = VOICE_CACHE_SIZE, directory: str = VOICE_CACHE_DIR):
+        self.max_entries = max(0, max_entries)
+        self.directory   = Path(directory) if directory else None
+        self._lru: collections.OrderedDict = collections.OrderedDict()
+        self._counts = collections.Counter()
+        self._writes: set = set()          # in-flight disk writes (asyncio tasks)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(digest: str, chunked: bool = False) -> str:
+        """Cache key for an upload digest under the current analyzer settings."""
+        params = f"v{ANALYZER_VERSION}|{F0_BACKEND}|{SAMPLE_RATE}|{'blocks' if chunked else 'whole'}"
+        return hashlib.sha256(f"{digest}|{params}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict]:
+        metrics = self._lru.get(key)
+        if metrics is not None:
+            self._lru.move_to_end(key)
+            self._counts["hits"] += 1
+            return dict(metrics)
+        metrics = self._read_disk(key)
+        if metrics is not None:
+            self._remember(key, metrics)
+            self._counts["disk_hits"] += 1
+            return dict(metrics)
+        self._counts["misses"] += 1
+        return None
+
+    def put(self, key: str, metrics: Dict):
+        if key in self._lru:
+            return
+        self._remember(key, dict(metrics))
+        self._counts["stored"] += 1
+        if self.directory is None:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write_disk(key, metrics)
+            return
+        task = loop.create_task(asyncio.to_thread(self._write_disk, key, dict(metrics)))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def flush(self):
+        """Wait for the disk writes put() started."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _remember(self, key: str, metrics: Dict):
+        if self.max_entries == 0:
+            return
+        self._lru[key] = metrics
+        while len(self._lru) > self.max_entries:
+            self._lru.popitem(last=False)
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _read_disk(self, key: str) -> Optional[Dict]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key: str, metrics: Dict):
+        if self.directory is None:
+            return
+        path, tmp = self._path(key), None
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "w") as f:
+                json.dump(metrics, f, default=float)
+            os.replace(tmp, path)
+        except (OSError, TypeError, ValueError):
+            self._counts["disk_errors"] += 1
+            if tmp is not None and os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def stats(self) -> Dict:
+        lookups = self._counts["hits"] + self._counts["disk_hits"] + self._counts["misses"]
+        return {
+            "entries":     len(self._lru),
+            "max_entries": self.max_entries,
+            "disk":        str(self.directory) if self.directory is not None else None,
+            **{k: self._counts[k] for k in ("hits", "disk_hits", "misses", "stored", "disk_errors")},
+            "hit_rate":    (self._counts["hits"] + self._counts["disk_hits"]) / lookups if lookups else None,
+        }
+
+
+_cache: Optional[VoiceResultCache] = None
+
+def get_voice_cache() -> VoiceResultCache:
+    global _cache
+    if _cache is None:
+        _cache = VoiceResultCache()
+    return _cache
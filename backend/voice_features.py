@@ -0,0 +1,194 @@
+"""
+voice_features.py
+Spectral feature bank computed from one set of short-time spectra per clip.
+
+Every voiced F0 frame (frame i centred on sample i · F0_HOP_LENGTH) is
+transformed once; all features below are derived from that shared power
+spectrum, so they add only a few ms to an analysis dominated by F0 tracking:
+
+  MFCC stats      : mean / std of 13 MFCCs (40-band mel, log-power, DCT-II)
+  Spectral tilt   : slope of the long-term average spectrum, dB / octave (100–5000 Hz)
+  CPP             : cepstral peak prominence (Hillenbrand 1994), dB
+  Formant proxies : F1 / F2 from LPC roots; the LPC autocorrelation is the inverse
+                    FFT of the pre-emphasised 0–5.5 kHz part of the shared power
+                    spectrum (i.e. LPC at 11 kHz, as Praat resamples for formants)
+  Voiced segments : count, mean / std duration and voiced fraction of the F0 track
+
+FeatureBank only accumulates running sums, so the batch pipeline can feed the
+whole clip at once while voice_stream feeds the same frames piecewise.
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+import librosa
+import numpy as np
+from scipy.fft import dct
+
+from voice_analyzer import F0_HOP_LENGTH, F0_MAX_HZ, F0_MIN_HZ
+
+N_MELS          = 40
+N_MFCC          = 13
+TILT_BAND_HZ    = (100.0, 5000.0)
+FORMANT_CEILING_HZ = 5500.0     # LPC sees 0 – ceiling only (5 formants for adult voices)
+FORMANT_MIN_HZ  = 90.0          # LPC roots below this are spectral tilt, not formants
+FORMANT_MAX_BW_HZ = 400.0       # wider roots are not resonances
+PRE_EMPHASIS    = 0.97
+CPP_TREND_FROM  = 0.001         # trend line fitted from 1 ms quefrency upwards
+BANK_BATCH_FRAMES = 512         # frames per FFT batch (bounds peak memory)
+MIN_VOICED_FRAMES = 5
+_EPS            = 1e-12
+
+
+def bank_n_fft(sr: int) -> int:
+    """Frame length: the cepstrum must resolve the longest pitch period (F0_MIN_HZ)."""
+    return 1 << int(np.ceil(np.log2(2 * sr / F0_MIN_HZ)))
+
+
+class FeatureBank:
+    def __init__(self, sr: int):
+        self.sr     = sr
+        self.n_fft  = n = bank_n_fft(sr)
+        self.window = np.hanning(n)
+        self._mel   = librosa.filters.mel(sr=sr, n_fft=n, n_mels=N_MELS).astype(np.float64)
+        freqs       = np.fft.rfftfreq(n, 1.0 / sr)
+
+        self._q_lo   = max(int(sr / F0_MAX_HZ), 2)
+        self._q_hi   = min(int(np.ceil(sr / F0_MIN_HZ)), n // 2 - 1)
+        q_trend      = np.arange(max(int(CPP_TREND_FROM * sr), 1), n // 2)
+        self._q_trend = q_trend
+        self._trend  = np.linalg.pinv(np.stack([q_trend, np.ones_like(q_trend)], axis=1))
+        self._lpc_bins  = min(int(FORMANT_CEILING_HZ * n / sr), n // 2)
+        self._lpc_sr    = 2.0 * self._lpc_bins * sr / n
+        self._lpc_order = 2 + int(self._lpc_sr // 1000)           # 2 poles per kHz + 2
+        lpc_freqs    = freqs[: self._lpc_bins + 1]
+        self._pre    = np.abs(1.0 - PRE_EMPHASIS * np.exp(-2j * np.pi * lpc_freqs / self._lpc_sr)) ** 2
+        self._tilt   = np.flatnonzero((freqs >= TILT_BAND_HZ[0]) & (freqs <= TILT_BAND_HZ[1]))
+        self._freqs  = freqs
+
+        self.frames  = 0
+        self._mfcc   = np.zeros(N_MFCC); self._mfcc_sq = np.zeros(N_MFCC)
+        self._ltas   = np.zeros(len(freqs))
+        self._cpp    = 0.0
+        self._f1_sum = 0.0; self._f1_n = 0
+        self._f2_sum = 0.0; self._f2_sq = 0.0; self._f2_n = 0
+
+    def add(self, y: np.ndarray, centers: np.ndarray):
+        """Accumulate the frames centred at `centers` (samples of y, zero-padded)."""
+        if len(centers) == 0:
+            return
+        n, half = self.n_fft, self.n_fft // 2
+        y_pad  = np.pad(y, (half, n - half))
+        frames = np.lib.stride_tricks.sliding_window_view(y_pad, n)      # zero-copy
+        for s in range(0, len(centers), BANK_BATCH_FRAMES):
+            self._add_batch(frames[centers[s : s + BANK_BATCH_FRAMES]].astype(np.float64))
+
+    def _add_batch(self, x: np.ndarray):
+        n    = self.n_fft
+        x   -= x.mean(axis=1, keepdims=True)
+        x   *= self.window
+        spec = np.abs(np.fft.rfft(x, axis=1)) ** 2                        # shared power spectrum
+
+        log_mel = 10.0 * np.log10(np.maximum(spec @ self._mel.T, 1e-10))
+        mfcc    = dct(log_mel, type=2, norm="ortho", axis=1)[:, :N_MFCC]
+        self._mfcc    += mfcc.sum(axis=0)
+        self._mfcc_sq += (mfcc ** 2).sum(axis=0)
+        self._ltas    += spec.sum(axis=0)
+
+        ceps = np.fft.irfft(np.log(spec + _EPS), n, axis=1)
+
+        # CPP: power-cepstrum peak in the pitch range above its linear trend
+        p_db  = 20.0 * np.log10(np.abs(ceps[:, : n // 2]) + _EPS)
+        slope, icpt = (p_db[:, self._q_trend] @ self._trend.T).T
+        k     = self._q_lo + np.argmax(p_db[:, self._q_lo : self._q_hi + 1], axis=1)
+        peak  = p_db[np.arange(len(k)), k]
+        self._cpp += float(np.sum(peak - (slope * k + icpt)))
+
+        # Formant proxies: lowest two narrow LPC resonances per frame
+        r        = np.fft.irfft(spec[:, : self._lpc_bins + 1] * self._pre, 2 * self._lpc_bins, axis=1)
+        formants = _lpc_formants(r, self._lpc_order, self._lpc_sr)
+        f1, f2   = formants[:, 0], formants[:, 1]
+        f1, f2   = f1[np.isfinite(f1)], f2[np.isfinite(f2)]
+        self._f1_sum += float(f1.sum()); self._f1_n += len(f1)
+        self._f2_sum += float(f2.sum()); self._f2_sq += float((f2 ** 2).sum()); self._f2_n += len(f2)
+
+        self.frames += len(x)
+
+    def result(self, f0: np.ndarray) -> Dict:
+        """Feature dict (VoiceMetrics keys); spectral fields None below MIN_VOICED_FRAMES."""
+        out = voiced_segment_stats(f0, self.sr)
+        m   = self.frames
+        if m < MIN_VOICED_FRAMES:
+            return {**out, "mfcc_mean": None, "mfcc_std": None,
+                    "spectral_tilt_db_per_oct": None, "cpp_db": None,
+                    "f1_proxy_hz": None, "f2_proxy_hz": None, "f2_proxy_std_hz": None}
+
+        mfcc_mean = self._mfcc / m
+        mfcc_std  = np.sqrt(np.maximum(self._mfcc_sq / m - mfcc_mean ** 2, 0.0))
+        ltas_db   = 10.0 * np.log10(self._ltas[self._tilt] / m + _EPS)
+        tilt      = np.polyfit(np.log2(self._freqs[self._tilt]), ltas_db, 1)[0]
+        f2_mean   = self._f2_sum / self._f2_n if self._f2_n else None
+        return {
+            **out,
+            "mfcc_mean":                [float(v) for v in mfcc_mean],
+            "mfcc_std":                 [float(v) for v in mfcc_std],
+            "spectral_tilt_db_per_oct": float(tilt),
+            "cpp_db":                   self._cpp / m,
+            "f1_proxy_hz":              self._f1_sum / self._f1_n if self._f1_n else None,
+            "f2_proxy_hz":              f2_mean,
+            "f2_proxy_std_hz":          (float(np.sqrt(max(self._f2_sq / self._f2_n - f2_mean ** 2, 0.0)))
+                                         if self._f2_n > 1 else None),
+        }
+
+
+def _lpc_formants(r: np.ndarray, order: int, sr: float) -> np.ndarray:
+    """
+    (frames, 2) lowest two formant frequencies (NaN if absent) from per-frame
+    autocorrelations: batched Levinson–Durbin, then eigenvalues of the
+    companion matrices give the LPC roots.
+    """
+    m   = len(r)
+    a   = np.zeros((m, order + 1)); a[:, 0] = 1.0
+    err = r[:, 0] * (1.0 + 1e-9) + _EPS                 # white-noise correction
+    for i in range(1, order + 1):
+        k = -np.einsum("ij,ij->i", a[:, :i], r[:, i:0:-1]) / err
+        a[:, 1 : i + 1] += k[:, None] * a[:, i - 1 :: -1][:, :i]
+        err *= 1.0 - k ** 2
+    comp = np.zeros((m, order, order))
+    comp[:, 0, :] = -a[:, 1:]
+    comp[:, np.arange(1, order), np.arange(order - 1)] = 1.0
+    roots = np.linalg.eigvals(comp)
+    freq  = np.angle(roots) * sr / (2 * np.pi)
+    bw    = -np.log(np.abs(roots) + _EPS) * sr / np.pi
+    freq  = np.where((roots.imag > 0) & (freq > FORMANT_MIN_HZ) & (bw < FORMANT_MAX_BW_HZ),
+                     freq, np.inf)
+    out   = np.sort(freq, axis=1)[:, :2]
+    out[~np.isfinite(out)] = np.nan
+    return out
+
+
+def voiced_centers(f0: np.ndarray, n_samples: int) -> np.ndarray:
+    """Sample centres of the voiced F0 frames that lie inside the clip."""
+    centers = np.flatnonzero(~np.isnan(f0)) * F0_HOP_LENGTH
+    return centers[centers < n_samples]
+
+
+def voiced_segment_stats(f0: np.ndarray, sr: int) -> Dict:
+    """Runs of consecutive voiced F0 frames: count, duration mean / std, voiced fraction."""
+    voiced = ~np.isnan(f0)
+    edges  = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+    runs   = (np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)) * F0_HOP_LENGTH / sr
+    return {
+        "voiced_fraction":         float(voiced.mean()) if len(voiced) else None,
+        "voiced_segment_count":    int(len(runs)),
+        "voiced_segment_mean_sec": float(runs.mean()) if len(runs) else None,
+        "voiced_segment_std_sec":  float(runs.std())  if len(runs) > 1 else None,
+    }
+
+
+def compute_feature_bank(y: np.ndarray, sr: int, f0: np.ndarray) -> Dict:
+    """FeatureBank over every voiced frame of an in-memory clip."""
+    bank = FeatureBank(sr)
+    bank.add(y, voiced_centers(f0, len(y)))
+    return bank.result(f0)
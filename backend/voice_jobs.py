@@ -0,0 +1,273 @@
+"""
+voice_jobs.py
+Bounded process-pool queue for voice analysis.
+
+librosa decoding, resampling and F0 tracking are CPU-bound and hold the GIL,
+so running analyze_voice inside an async route stalls every WebSocket on the
+loop. Jobs run in worker processes instead; the event loop only awaits them.
+
+  VOICE_WORKERS          worker processes            (default 2)
+  VOICE_QUEUE_LIMIT      jobs queued + running        (default 16; beyond → rejected)
+  VOICE_JOB_TIMEOUT_SEC  per-job wall-clock limit     (default 60)
+
+A job that times out is reported as "timeout"; if it had not started it is
+cancelled, otherwise its worker finishes it in the background and the result
+is discarded. Such an overrunning job keeps its queue slot (and its temp file)
+until the worker really lets go, so the limit keeps bounding the pool.
+
+Jobs take either the upload bytes or, for long recordings, the path of a temp
+file that is analysed block by block (voice_stream.analyze_voice_file) and
+deleted when the job ends. Submitting with a `key` already in flight (a client
+retrying an upload) joins the running job instead of starting another.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import multiprocessing
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+VOICE_WORKERS         = int(os.getenv("VOICE_WORKERS", "2"))
+VOICE_QUEUE_LIMIT     = int(os.getenv("VOICE_QUEUE_LIMIT", "16"))
+VOICE_JOB_TIMEOUT_SEC = float(os.getenv("VOICE_JOB_TIMEOUT_SEC", "60"))
+JOB_RETENTION_SEC     = 600        # finished jobs stay pollable this long
+LATENCY_WINDOW        = 200        # jobs kept for latency percentiles
+
+
+# ─────────────────────────────────────────────
+#  Worker side (runs in the pool processes)
+# ─────────────────────────────────────────────
+
+def _warm_worker():
+    import voice_analyzer  # noqa: F401  – pay librosa/scipy import cost once per worker
+
+
+def _run_analysis(audio: Union[bytes, str]) -> Tuple[Dict, float]:
+    from voice_analyzer import analyze_voice
+    from voice_stream import analyze_voice_file
+    t = time.perf_counter()
+    metrics = analyze_voice_file(audio) if isinstance(audio, str) else analyze_voice(audio)
+    return metrics, (time.perf_counter() - t) * 1000.0
+
+
+# ─────────────────────────────────────────────
+#  Queue (event-loop side)
+# ─────────────────────────────────────────────
+
+class VoiceJobQueue:
+    def __init__(self, workers: int = VOICE_WORKERS, limit: int = VOICE_QUEUE_LIMIT,
+                 timeout_sec: float = VOICE_JOB_TIMEOUT_SEC):
+        self.workers     = max(1, workers)
+        self.limit       = max(1, limit)
+        self.timeout_sec = timeout_sec
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._jobs: Dict[str, Dict] = {}
+        self._inflight: Dict[str, Dict] = {}
+        self._active = 0
+        self._overrunning = 0              # timed-out jobs whose worker is still busy
+        self._counts = collections.Counter()
+        self._latency_ms: collections.deque = collections.deque(maxlen=LATENCY_WINDOW)
+        self._run_ms:     collections.deque = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def start(self):
+        if self._pool is None:
+            # spawn: forking a process that already runs MediaPipe threads is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_worker,
+            )
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def submit(self, audio: Union[bytes, str],
+               on_result: Optional[Callable[[Dict], None]] = None,
+               key: Optional[str] = None) -> Optional[Dict]:
+        """
+        Queue a job for upload bytes or a temp-file path (the queue owns and
+        deletes the file). None when the queue is full.
+        """
+        self.start()
+        self._prune()
+        pending = self._inflight.get(key) if key is not None else None
+        if pending is not None:
+            if on_result is not None:
+                pending["_callbacks"].append(on_result)
+            self._counts["coalesced"] += 1
+            _discard(audio)
+            return pending
+        if self._active >= self.limit:
+            self._counts["rejected"] += 1
+            _discard(audio)
+            return None
+        job = {
+            "job_id":       str(uuid.uuid4()),
+            "status":       "queued",
+            "submitted_at": time.time(),
+            "queue_ms":     None,
+            "run_ms":       None,
+            "result":       None,
+            "detail":       None,
+            "cached":       False,
+            "_key":         key,
+            "_callbacks":   [on_result] if on_result is not None else [],
+        }
+        self._jobs[job["job_id"]] = job
+        if key is not None:
+            self._inflight[key] = job
+        self._active += 1
+        self._counts["submitted"] += 1
+        try:
+            future = self._pool.submit(_run_analysis, audio)
+        except BrokenProcessPool:
+            # A worker died (OOM, segfault in a codec): replace the pool once
+            self.stop(); self.start()
+            future = self._pool.submit(_run_analysis, audio)
+        job["_future"] = future
+        job["_task"] = asyncio.get_running_loop().create_task(
+            self._await(job, future, audio if isinstance(audio, str) else None))
+        return job
+
+    def resolved(self, metrics: Dict) -> Dict:
+        """Record an already-known result (cache hit) as a finished job."""
+        self._prune()
+        now = time.time()
+        job = {
+            "job_id":       str(uuid.uuid4()),
+            "status":       "done",
+            "submitted_at": now,
+            "queue_ms":     0.0,
+            "run_ms":       0.0,
+            "result":       metrics,
+            "detail":       None,
+            "cached":       True,
+            "finished_at":  now,
+        }
+        self._jobs[job["job_id"]] = job
+        self._counts["cached"] += 1
+        return job
+
+    async def _await(self, job: Dict, future, path: Optional[str]):
+        t0 = time.perf_counter()
+        overrun = False
+        try:
+            metrics, run_ms = await asyncio.wait_for(asyncio.wrap_future(future),
+                                                     self.timeout_sec)
+        except asyncio.TimeoutError:
+            overrun = not future.cancel()       # cancel only works if not yet started
+            job["status"], job["detail"] = "timeout", f"exceeded {self.timeout_sec:g} s"
+            self._counts["timeout"] += 1
+        except Exception as e:
+            job["status"], job["detail"] = "failed", str(e) or type(e).__name__
+            self._counts["failed"] += 1
+        else:
+            total_ms = (time.perf_counter() - t0) * 1000.0
+            job["run_ms"], job["queue_ms"] = run_ms, max(total_ms - run_ms, 0.0)
+            self._latency_ms.append(total_ms)
+            self._run_ms.append(run_ms)
+            if "error" in metrics:
+                job["status"], job["detail"] = "failed", metrics["error"]
+                self._counts["failed"] += 1
+            else:
+                job["status"], job["result"] = "done", metrics
+                self._counts["done"] += 1
+                for callback in job["_callbacks"]:
+                    callback(metrics)
+        finally:
+            if self._inflight.get(job["_key"]) is job:
+                del self._inflight[job["_key"]]
+            job["finished_at"] = time.time()
+            if overrun:
+                # The worker is still busy with it: release the slot when it finishes
+                self._overrunning += 1
+                loop = asyncio.get_running_loop()
+                future.add_done_callback(
+                    lambda _: _call_soon(loop, self._release, path, True))
+            else:
+                self._release(path)
+
+    def _release(self, path: Optional[str], overrun: bool = False):
+        self._active -= 1
+        if overrun:
+            self._overrunning -= 1
+        if path is not None:
+            _discard(path)
+
+    def has_capacity(self) -> bool:
+        return self._active < self.limit
+
+    async def wait(self, job: Dict) -> Dict:
+        if "_task" in job:
+            await asyncio.shield(job["_task"])
+        return job
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        job = self._jobs.get(job_id)
+        if job is not None and job["status"] == "queued" and job["_future"].running():
+            job["status"] = "running"
+        return job
+
+    def _prune(self):
+        horizon = time.time() - JOB_RETENTION_SEC
+        for jid in [j for j, job in self._jobs.items()
+                    if job.get("finished_at", float("inf")) < horizon]:
+            del self._jobs[jid]
+
+    def stats(self) -> Dict:
+        def pct(d, q):
+            return float(np.percentile(np.fromiter(d, float), q)) if d else None
+        return {
+            "workers":        self.workers,
+            "queue_limit":    self.limit,
+            "timeout_sec":    self.timeout_sec,
+            "active":         self._active,
+            "queue_depth":    max(self._active - self.workers, 0),
+            "overrunning":    self._overrunning,
+            **{k: self._counts[k] for k in
+               ("submitted", "done", "failed", "timeout", "rejected", "cached", "coalesced")},
+            "latency_ms_p50": pct(self._latency_ms, 50),
+            "latency_ms_p95": pct(self._latency_ms, 95),
+            "run_ms_p50":     pct(self._run_ms, 50),
+            "run_ms_p95":     pct(self._run_ms, 95),
+        }
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, fn: Callable, *args):
+    """Run fn on `loop` from a pool thread; dropped if the loop has closed."""
+    try:
+        loop.call_soon_threadsafe(fn, *args)
+    except RuntimeError:
+        pass
+
+
+def _discard(audio: Union[bytes, str]):
+    if isinstance(audio, str):
+        try:
+            os.unlink(audio)
+        except OSError:
+            pass
+
+
+def public_job(job: Dict) -> Dict:
+    """Job fields safe to return to clients (drops internal handles)."""
+    return {k: v for k, v in job.items() if not k.startswith("_")}
+
+
+_queue: Optional[VoiceJobQueue] = None
+
+def get_voice_jobs() -> VoiceJobQueue:
+    global _queue
+    if _queue is None:
+        _queue = VoiceJobQueue()
+    return _queue
@@ -0,0 +1,469 @@
+"""
+voice_stream.py
+Incremental voice biomarkers: /api/v1/voice/stream and long-file analysis.
+
+Audio is analysed block by block as it arrives:
+
+  • 25 ms energy frames        → live pause ratio and MPT
+  • YIN F0 frames (centred)    → live F0; raw estimates kept for final voicing
+  • per-frame HNR              → computed once a frame's window is complete
+
+Everything that needs the whole recording (YIN voicing against the loudest
+frame, octave-jump correction, jitter, shimmer at the mean period, speech-rate
+peaks) is cheap O(frames) work done in finish(), so the final report follows
+the last chunk within milliseconds. The live stream uses the YIN backend —
+pyin's Viterbi pass cannot run frame by frame. With f0_backend="pyin" (long
+files under the default VOICE_F0_BACKEND) the final F0 comes from pyin run
+over overlapping PYIN_BLOCK_SEC windows instead (_BlockPyin), and HNR frames
+whose F0 differs from YIN's are recomputed in the replay pass. The report
+names the tracker in f0_backend.
+
+With keep_audio=False only a few analysis windows of samples are retained, so
+memory is bounded by the per-frame feature arrays (≈ 100 bytes per 12 ms)
+regardless of duration; finish() then re-reads the audio once (`replay`) for
+shimmer, the voice_features bank and HNR frames whose F0 changed in voicing.
+analyze_voice_file uses this for long uploads, with either backend.
+"""
+
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterable, Optional
+
+import numpy as np
+import soundfile as sf
+
+from voice_analyzer import (
+    F0_BACKEND,
+    F0_HOP_LENGTH,
+    F0_MAX_HZ,
+    F0_MIN_HZ,
+    HNR_MAX_DB,
+    HNR_MIN_DB,
+    HNR_WINDOW_PERIODS,
+    SAMPLE_RATE,
+    SILENCE_FRAME_LEN,
+    SILENCE_THRESHOLD,
+    YIN_MAX_APERIODICITY,
+    _f0_pyin,
+    _hnr_frames,
+    analyze_voice,
+    compute_jitter,
+    compute_mpt,
+    compute_speech_rate,
+    frame_rms,
+    iter_audio_blocks,
+    longest_run,
+    shimmer_from_amps,
+    shimmer_period,
+    yin_frames,
+    yin_geometry,
+    yin_voicing,
+)
+from voice_features import BANK_BATCH_FRAMES, FeatureBank
+
+STREAM_FORMATS   = {"s16le": np.dtype("<i2"), "f32le": np.dtype("<f4")}
+MIN_SAMPLE_RATE  = 8_000
+MAX_SAMPLE_RATE  = 48_000
+MAX_STREAM_SEC   = 120.0        # hard cap on buffered audio per WebSocket stream
+LIVE_F0_FRAMES   = 20           # live F0 = median of the last N candidate frames
+HNR_BATCH        = 256          # stale HNR frames per _hnr_frames call
+PYIN_BLOCK_SEC   = 30.0         # pyin core window for long files
+PYIN_MARGIN_SEC  = 1.0          # context either side of a core window, trimmed after
+
+Replay = Callable[[], Iterable[np.ndarray]]
+
+
+class _SampleWindow:
+    """
+    Append-only sample store addressed by global index. Samples before
+    trim()'s cut-off are discarded, so a window that is trimmed as frames
+    complete stays a few analysis windows long.
+    """
+
+    def __init__(self, capacity: int):
+        self._buf = np.zeros(capacity, dtype=np.float32)
+        self.base = 0           # global index of self._buf[0]
+        self.n    = 0           # samples appended so far
+
+    def append(self, x: np.ndarray):
+        need = self.n + len(x) - self.base
+        if need > len(self._buf):
+            grown = np.zeros(max(need, 2 * len(self._buf)), dtype=np.float32)
+            grown[: self.n - self.base] = self._buf[: self.n - self.base]
+            self._buf = grown
+        self._buf[self.n - self.base : need] = x
+        self.n += len(x)
+
+    def trim(self, keep_from: int):
+        drop = min(max(keep_from, 0), self.n) - self.base
+        if drop <= 0:
+            return
+        live = self.n - self.base - drop
+        self._buf[:live] = self._buf[drop : drop + live]
+        self.base += drop
+
+    def samples(self, lo: int, hi: int) -> np.ndarray:
+        """float64 copy of samples [lo, hi), zero-padded outside [0, n)."""
+        a, b = max(lo, 0), max(min(hi, self.n), max(lo, 0))
+        if a < self.base:
+            raise RuntimeError("samples already discarded")
+        seg = self._buf[a - self.base : b - self.base].astype(np.float64)
+        return np.pad(seg, (a - lo, max(hi - b, 0)))
+
+
+class _BlockPyin:
+    """
+    pyin F0 over a sample stream in overlapping windows: each PYIN_BLOCK_SEC
+    core is tracked with PYIN_MARGIN_SEC of real signal either side (so the
+    Viterbi pass and the frames near the cut see context) and only the core's
+    frames are kept. Frames are centred on i * F0_HOP_LENGTH like the
+    whole-signal call; memory is one window of samples.
+    """
+
+    def __init__(self, sr: int):
+        self.sr     = sr
+        self.core   = int(PYIN_BLOCK_SEC * sr) // F0_HOP_LENGTH * F0_HOP_LENGTH
+        self.margin = int(PYIN_MARGIN_SEC * sr) // F0_HOP_LENGTH * F0_HOP_LENGTH
+        self._audio = _SampleWindow(self.core + 2 * self.margin)
+        self._next  = 0                    # next frame to emit
+        self._f0    = []
+
+    def push(self, x: np.ndarray):
+        self._audio.append(x)
+        while self._audio.n >= self._next * F0_HOP_LENGTH + self.core + self.margin:
+            self._emit(self.core // F0_HOP_LENGTH)
+
+    def finish(self) -> np.ndarray:
+        total = 1 + self._audio.n // F0_HOP_LENGTH
+        while self._next < total:
+            self._emit(min(self.core // F0_HOP_LENGTH, total - self._next))
+        return np.concatenate(self._f0) if self._f0 else np.empty(0)
+
+    def _emit(self, count: int):
+        start = self._next * F0_HOP_LENGTH
+        lo    = max(start - self.margin, 0)
+        hi    = min(start + count * F0_HOP_LENGTH + self.margin, self._audio.n)
+        f0    = _f0_pyin(self._audio.samples(lo, hi).astype(np.float32), self.sr)
+        first = (start - lo) // F0_HOP_LENGTH
+        keep  = np.full(count, np.nan)
+        got   = f0[first : first + count]
+        keep[: len(got)] = got
+        self._f0.append(keep)
+        self._next += count
+        self._audio.trim(self._next * F0_HOP_LENGTH - self.margin)
+
+
+class StreamingVoiceAnalyzer:
+    """
+    Accumulates audio and keeps per-frame features up to date.
+    push() / push_samples() return a small live snapshot; finish() returns the
+    same dict shape as voice_analyzer.analyze_voice.
+    """
+
+    def __init__(self, sample_rate: int, fmt: str = "s16le", channels: int = 1,
+                 keep_audio: bool = True, max_sec: Optional[float] = MAX_STREAM_SEC,
+                 f0_backend: str = "yin"):
+        if not MIN_SAMPLE_RATE <= sample_rate <= MAX_SAMPLE_RATE:
+            raise ValueError(f"sample_rate must be {MIN_SAMPLE_RATE}–{MAX_SAMPLE_RATE} Hz")
+        if fmt not in STREAM_FORMATS:
+            raise ValueError(f"format must be one of {sorted(STREAM_FORMATS)}")
+        if channels < 1:
+            raise ValueError("channels must be ≥ 1")
+        if f0_backend not in ("yin", "pyin"):
+            raise ValueError(f"Unknown F0 backend: {f0_backend!r}")
+        self.sr         = int(sample_rate)
+        self.dtype      = STREAM_FORMATS[fmt]
+        self.channels   = int(channels)
+        self.keep_audio = keep_audio
+        self.max_sec    = max_sec
+        self._scale     = 1.0 / 32768.0 if fmt == "s16le" else 1.0
+        self._partial   = b""                               # bytes of an incomplete sample
+        self._audio     = _SampleWindow(self.sr * (10 if keep_audio else 2))
+        self.f0_backend = f0_backend
+        # pyin: final F0 from block-wise pyin; YIN still drives live F0 and provisional HNR
+        self._pyin      = _BlockPyin(self.sr) if f0_backend == "pyin" else None
+
+        # Energy framing (same geometry as voice_analyzer.energy_frames)
+        self._e_len = int(SILENCE_FRAME_LEN * self.sr)
+        self._e_hop = self._e_len // 2
+        self._rms   = []                                    # list of arrays
+        self._e_next = 0                                    # next energy frame index
+        self._silent = 0
+        self._e_total = 0
+        self._run = self._best_run = 0
+
+        # YIN frames, centred on i * F0_HOP_LENGTH
+        *_, self._y_len = yin_geometry(self.sr)
+        self._y_half  = self._y_len // 2
+        self._y_next  = 0
+        self._period, self._aper, self._level = [], [], []
+
+        # HNR per F0 frame (NaN where not a candidate), with the F0 it used
+        self._h_win   = int(HNR_WINDOW_PERIODS * self.sr / F0_MIN_HZ)
+        self._h_half  = self._h_win // 2
+        self._h_next  = 0
+        self._hnr_f0, self._hnr_db = [], []
+
+    # ── Ingest ─────────────────────────────────────────────────────────────
+
+    @property
+    def duration_sec(self) -> float:
+        return self._audio.n / self.sr
+
+    def push(self, chunk: bytes) -> Dict:
+        """Raw PCM bytes in the configured format; interleaved channels are averaged."""
+        data = self._partial + chunk
+        frame_bytes = self.dtype.itemsize * self.channels
+        cut = len(data) - len(data) % frame_bytes
+        self._partial = data[cut:]
+        x = np.frombuffer(data[:cut], dtype=self.dtype).astype(np.float32) * self._scale
+        if self.channels > 1:
+            x = x.reshape(-1, self.channels).mean(axis=1)
+        return self.push_samples(x)
+
+    def push_samples(self, x: np.ndarray) -> Dict:
+        """float32 mono samples at self.sr."""
+        if self.max_sec is not None and self._audio.n + len(x) > self.max_sec * self.sr:
+            raise ValueError(f"Stream exceeds {self.max_sec:.0f} s")
+        self._audio.append(x)
+        if self._pyin is not None:
+            self._pyin.push(x)
+        self._update_energy()
+        self._update_f0()
+        self._update_hnr()
+        if not self.keep_audio:
+            self._audio.trim(min(self._e_next * self._e_hop,
+                                 self._y_next * F0_HOP_LENGTH - self._y_half,
+                                 self._h_next * F0_HOP_LENGTH - self._h_half))
+        return self.live()
+
+    # ── Incremental features ──────────────────────────────────────────────
+
+    def _update_energy(self):
+        # Frames whose samples are all present: start + len ≤ n
+        last = (self._audio.n - self._e_len) // self._e_hop
+        if last < self._e_next:
+            return
+        seg = self._audio.samples(self._e_next * self._e_hop, last * self._e_hop + self._e_len)
+        rms = frame_rms(np.lib.stride_tricks.sliding_window_view(seg, self._e_len)[::self._e_hop])
+        self._rms.append(rms)
+        self._e_next = last + 1
+
+        voiced = rms > SILENCE_THRESHOLD
+        self._silent  += int((~voiced).sum())
+        self._e_total += len(rms)
+        # Longest voiced run, carried across chunks
+        if voiced.all():
+            self._run += len(voiced)
+        else:
+            lead = int(np.argmin(voiced))
+            self._best_run = max(self._best_run, self._run + lead, longest_run(voiced))
+            self._run = len(voiced) - 1 - int(np.flatnonzero(~voiced)[-1])
+        self._best_run = max(self._best_run, self._run)
+
+    def _update_f0(self, final: bool = False):
+        n = self._audio.n
+        if final:
+            last = n // F0_HOP_LENGTH                         # 1 + n // hop frames in total
+        else:
+            last = (n + self._y_half - self._y_len) // F0_HOP_LENGTH
+        if last < self._y_next:
+            return
+        # Frames y_next..last of the centre-padded signal, from a local slice
+        seg = self._audio.samples(self._y_next * F0_HOP_LENGTH - self._y_half,
+                                  last * F0_HOP_LENGTH - self._y_half + self._y_len)
+        view = np.lib.stride_tricks.sliding_window_view(seg, self._y_len)[::F0_HOP_LENGTH]
+        period, aper, level = yin_frames(view, self.sr)
+        self._period.append(period); self._aper.append(aper); self._level.append(level)
+        self._y_next = last + 1
+
+    def _update_hnr(self, final: bool = False):
+        """HNR for provisional voiced frames whose analysis window is complete."""
+        last = self._y_next - 1
+        if not final:
+            last = min((self._audio.n + self._h_half - self._h_win) // F0_HOP_LENGTH, last)
+        if last < self._h_next:
+            return
+        period = np.concatenate(self._period)[self._h_next : last + 1]
+        aper   = np.concatenate(self._aper)[self._h_next : last + 1]
+        f0     = self.sr / period
+        f0[~((aper < YIN_MAX_APERIODICITY) & (f0 >= F0_MIN_HZ) & (f0 <= F0_MAX_HZ))] = np.nan
+        hnr    = np.full(len(f0), np.nan)
+        cand   = np.flatnonzero(~np.isnan(f0))
+        if len(cand):
+            hnr[cand] = self._hnr_at(cand + self._h_next, f0[cand], self._audio)
+        self._hnr_f0.append(f0); self._hnr_db.append(hnr)
+        self._h_next = last + 1
+
+    def _hnr_at(self, frames: np.ndarray, f0: np.ndarray, audio: _SampleWindow) -> np.ndarray:
+        """_hnr_frames on the local slice covering `frames` (identical to a full-signal call)."""
+        out = np.empty(len(frames))
+        for s in range(0, len(frames), HNR_BATCH):
+            centers = frames[s : s + HNR_BATCH] * F0_HOP_LENGTH
+            lo = max(int(centers[0]) - self._h_half, 0)
+            hi = min(int(centers[-1]) - self._h_half + self._h_win, audio.n)
+            out[s : s + HNR_BATCH] = _hnr_frames(audio.samples(lo, hi), self.sr,
+                                                 centers - lo, f0[s : s + HNR_BATCH])
+        return out
+
+    # ── Reports ────────────────────────────────────────────────────────────
+
+    def live(self) -> Dict:
+        f0_live = None
+        if self._period:
+            tail_p = np.concatenate(self._period[-4:])[-LIVE_F0_FRAMES:]
+            tail_a = np.concatenate(self._aper[-4:])[-LIVE_F0_FRAMES:]
+            cand = self.sr / tail_p[tail_a < YIN_MAX_APERIODICITY]
+            cand = cand[(cand >= F0_MIN_HZ) & (cand <= F0_MAX_HZ)]
+            f0_live = float(np.median(cand)) if len(cand) else None
+        return {
+            "duration_sec": self.duration_sec,
+            "f0_hz":        f0_live,
+            "pause_ratio":  self._silent / self._e_total if self._e_total else None,
+            "mpt_sec":      self._best_run * self._e_hop / self.sr,
+        }
+
+    def finish(self, replay: Optional[Replay] = None) -> Dict:
+        """
+        Final biomarkers; same keys as analyze_voice. Without keep_audio,
+        `replay()` must yield the same samples again (one sequential pass).
+        """
+        sr, n = self.sr, self._audio.n
+        if n < sr * 0.5:
+            return {"error": "Audio too short (need ≥ 0.5 s)"}
+        if not self.keep_audio and replay is None:
+            raise ValueError("finish() needs replay when keep_audio=False")
+
+        self._update_f0(final=True)
+        self._update_hnr(final=True)
+        if self._pyin is not None:
+            f0 = self._pyin.finish()
+        else:
+            f0 = yin_voicing(np.concatenate(self._period), np.concatenate(self._aper),
+                             np.concatenate(self._level), sr)
+        f0_clean = f0[~np.isnan(f0)]
+
+        # Batch framing drops a frame that ends exactly at the last sample
+        rms = np.concatenate(self._rms) if self._rms else np.empty(0)
+        rms = rms[: len(range(0, n - self._e_len, self._e_hop))]
+        energy = (rms, self._e_hop)
+        speech_rate, pause_ratio = compute_speech_rate(None, sr, energy, duration=n / sr)
+
+        # Voiced frames whose provisional HNR used a different F0 (octave fix, pyin)
+        voiced = np.flatnonzero(~np.isnan(f0))
+        voiced = voiced[voiced * F0_HOP_LENGTH < n]
+        hnr_f0 = np.concatenate(self._hnr_f0)
+        hnr_db = np.concatenate(self._hnr_db)
+        stale  = voiced[hnr_f0[voiced] != f0[voiced]]
+        period = shimmer_period(sr, f0)
+        bank   = FeatureBank(sr)
+
+        if self.keep_audio:
+            if len(stale):
+                hnr_db[stale] = self._hnr_at(stale, f0[stale], self._audio)
+            self._bank_at(bank, voiced * F0_HOP_LENGTH, self._audio)
+            amps = None
+            if period is not None:
+                n_amp = len(range(0, n - period, period))
+                amps  = frame_rms(self._audio.samples(0, n_amp * period).reshape(n_amp, period))
+        else:
+            amps = self._replay_pass(replay, period, stale, f0, hnr_db, bank, voiced * F0_HOP_LENGTH)
+
+        return {
+            "jitter_pct":              compute_jitter(f0),
+            "shimmer_pct":             shimmer_from_amps(amps) if amps is not None else None,
+            "hnr_db":                  self._mean_hnr(hnr_db[voiced]) if len(voiced) >= 5 else None,
+            "mpt_sec":                 compute_mpt(None, sr, energy),
+            "f0_mean_hz":              float(np.mean(f0_clean)) if len(f0_clean) > 0 else None,
+            "f0_std_hz":               float(np.std(f0_clean))  if len(f0_clean) > 1 else None,
+            "speech_rate_syl_per_sec": speech_rate,
+            "pause_ratio":             pause_ratio,
+            "audio_duration_sec":      n / sr,
+            "f0_backend":              self.f0_backend,
+            **bank.result(f0),
+        }
+
+    @staticmethod
+    def _bank_at(bank: FeatureBank, centers: np.ndarray, audio: _SampleWindow):
+        """FeatureBank.add on local slices, in the batches a full-signal call would use."""
+        half = bank.n_fft // 2
+        for s in range(0, len(centers), BANK_BATCH_FRAMES):
+            c  = centers[s : s + BANK_BATCH_FRAMES]
+            lo = int(c[0]) - half
+            bank.add(audio.samples(lo, int(c[-1]) - half + bank.n_fft), c - lo)
+
+    def _replay_pass(self, replay: Replay, period: Optional[int], stale: np.ndarray,
+                     f0: np.ndarray, hnr_db: np.ndarray, bank: FeatureBank,
+                     centers: np.ndarray) -> Optional[np.ndarray]:
+        """
+        Second sequential read for the whole-clip steps — period-length RMS for
+        shimmer, the feature bank and HNR of stale frames — through a small
+        rolling window.
+        """
+        half  = bank.n_fft // 2
+        n     = self._audio.n
+        n_amp = len(range(0, n - period, period)) if period is not None else 0
+        win   = _SampleWindow(self.sr * 2)
+        amps, a_next, s_next = [], 0, 0
+        ends  = stale * F0_HOP_LENGTH - self._h_half + self._h_win     # window end per frame
+        b_ends, b_next = centers - half + bank.n_fft, 0
+        for x in replay():
+            win.append(x[: max(n - win.n, 0)])
+            if period is not None:
+                last = min(win.n // period, n_amp)
+                if last > a_next:
+                    seg = win.samples(a_next * period, last * period)
+                    amps.append(frame_rms(seg.reshape(-1, period)))
+                    a_next = last
+            ready = int(np.searchsorted(ends, win.n, side="right")) if win.n < n else len(stale)
+            if ready > s_next:
+                idx = stale[s_next:ready]
+                hnr_db[idx] = self._hnr_at(idx, f0[idx], win)
+                s_next = ready
+            ready = int(np.searchsorted(b_ends, win.n, side="right")) if win.n < n else len(centers)
+            if ready > b_next:
+                self._bank_at(bank, centers[b_next:ready], win)
+                b_next = ready
+            win.trim(min(a_next * period if period is not None else win.n,
+                         stale[s_next] * F0_HOP_LENGTH - self._h_half
+                         if s_next < len(stale) else win.n,
+                         centers[b_next] - half if b_next < len(centers) else win.n))
+        if period is None:
+            return None
+        return np.concatenate(amps) if amps else np.empty(0)
+
+    @staticmethod
+    def _mean_hnr(hnr: np.ndarray) -> Optional[float]:
+        hnr = hnr[~np.isnan(hnr)]
+        if len(hnr) == 0:
+            return None
+        return float(np.clip(np.mean(hnr), HNR_MIN_DB, HNR_MAX_DB))
+
+
+# ─────────────────────────────────────────────
+#  Long recordings (bounded memory)
+# ─────────────────────────────────────────────
+
+def analyze_voice_file(path: str, sr: int = SAMPLE_RATE) -> Dict:
+    """
+    analyze_voice for a file on disk with memory bounded regardless of
+    duration: decode → resample → StreamingVoiceAnalyzer block by block, plus
+    one replay pass. F0 uses VOICE_F0_BACKEND; pyin runs per overlapping
+    window (_BlockPyin). Containers libsndfile cannot open fall back to the
+    in-memory analyze_voice.
+    """
+    try:
+        sf.info(path)
+    except Exception:
+        with open(path, "rb") as fh:
+            return analyze_voice(fh.read())
+
+    def blocks():
+        with sf.SoundFile(path) as f:
+            yield from iter_audio_blocks(f, sr)
+
+    analyzer = StreamingVoiceAnalyzer(sr, fmt="f32le", keep_audio=False, max_sec=None,
+                                      f0_backend=F0_BACKEND)
+    for x in blocks():
+        analyzer.push_samples(x)
+    return analyzer.finish(replay=blocks)